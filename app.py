@@ -1,20 +1,20 @@
 import os
 import sys
 import logging
-import cv2
-import numpy as np
-import tensorflow as tf
-import joblib
-import json
-from flask_cors import cross_origin
+import multiprocessing
+from tempfile import SpooledTemporaryFile
 from flask_bcrypt import Bcrypt
 from pymongo import MongoClient
-from flask import Flask, request, jsonify
+from bson.objectid import ObjectId
+from flask import Blueprint, Flask, Request, current_app, request, jsonify
 from flask_cors import CORS
 from cart_routes import cart_bp
-from products_routes import products_bp
-from weather.routes import weather_bp
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+from products_routes import products_bp, products_col
+from product_listing import (
+    ListingError, list_products, thumbnail_response, thumbnail_fields, parse_price, name_keywords,
+    start_index_build
+)
+from weather.routes import weather_bp, start_prewarm
 
 # =====================================================
 # PATH SETUP
@@ -22,8 +22,15 @@ from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, BASE_DIR)
 
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Uploads are decoded in memory; anything above the spool size goes to a
+# temp file and requests above the content limit are rejected with 413
+MAX_UPLOAD_BYTES = int(float(os.environ.get("PLANT_MAX_UPLOAD_MB", 256)) * 1024 * 1024)
+UPLOAD_SPOOL_BYTES = int(float(os.environ.get("PLANT_UPLOAD_SPOOL_MB", 8)) * 1024 * 1024)
+
+# Marketplace-only pods can skip the plant disease routes entirely
+PLANT_ENABLED = os.environ.get("PLANT_ENABLED", "1") == "1"
+# Load and warm the plant disease models in the background at startup
+PLANT_WARMUP = os.environ.get("PLANT_WARMUP", "0") == "1"
 
 # =====================================================
 # LOGGING SETUP
@@ -37,13 +44,14 @@ logger = logging.getLogger(__name__)
 # =====================================================
 # FLASK APP
 # =====================================================
-app = Flask(__name__)
-CORS(app)
-bcrypt = Bcrypt(app)
+class SpoolingRequest(Request):
+    """Keeps uploaded files in memory up to UPLOAD_SPOOL_BYTES"""
 
-app.register_blueprint(weather_bp, url_prefix="/api")
-app.register_blueprint(cart_bp, url_prefix="/api")
-app.register_blueprint(products_bp, url_prefix="/api")
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode="rb+")
+
+core_bp = Blueprint("core", __name__)
+bcrypt = Bcrypt()
 
 #database 
 client = MongoClient("mongodb://localhost:27017/")
@@ -53,25 +61,19 @@ products = db["products"]
 cart_collection = db["carts"]
 
 
-# =====================================================
-# IMPORT WEATHER MODULE
-# =====================================================
-
-@app.route('/api/weather/forecast', methods=['POST'])
-@cross_origin()
-def forecast_weather():
-    data = request.json
-    # Process forecast data here
-    return jsonify({"forecast": "sunny"})
-
-@app.route("/api/products/update/<id>", methods=["PUT"])
+@core_bp.route("/api/products/update/<id>", methods=["PUT"])
 def update_product(id):
     data = request.json
 
+    try:
+        price = parse_price(data["price"], required=True)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     products.update_one(
         {"_id": ObjectId(id)},
         {"$set": {
-            "price": data["price"],
+            "price": price,
             "quantity": data["quantity"],
             "category": data["category"],
             "location": data["location"]
@@ -81,7 +83,7 @@ def update_product(id):
     return jsonify({"message": "Product updated successfully"})
 
 
-@app.route("/api/register", methods=["POST"])
+@core_bp.route("/api/register", methods=["POST"])
 def register():
     data = request.json
 
@@ -105,7 +107,7 @@ def register():
 
     return jsonify({"message": "Registration successful"})
 
-@app.route("/api/login", methods=["POST"])
+@core_bp.route("/api/login", methods=["POST"])
 def login():
     data = request.json
 
@@ -124,105 +126,46 @@ def login():
     else:
         return jsonify({"message": "Invalid credentials"}), 401
     
-@app.route("/api/products/add", methods=["POST"])
+@core_bp.route("/api/products/add", methods=["POST"])
 def add_product():
     data = request.json
 
+    try:
+        price = parse_price(data["price"], required=True)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     product = {
         "name": data["name"],
-        "price": data["price"],
+        "name_keywords": name_keywords(data["name"]),
+        "price": price,
         "quantity": data["quantity"],
         "location": data["location"],
         "image": data["image"],  # base64
-        "farmer": data["farmer"]
+        "farmer": data["farmer"],
+        **thumbnail_fields(data["image"])
     }
 
     products.insert_one(product)
     return jsonify({"message": "Product added successfully"})
 
-@app.route("/api/products", methods=["GET"])
+@core_bp.route("/api/products", methods=["GET"])
 def get_products():
-    product_list = []
-
-    for p in products.find():
-        p["_id"] = str(p["_id"])  # Mongo ObjectId fix
-        product_list.append(p)
-
-    return jsonify(product_list)
-
-
-# =====================================================
-# PLANT DISEASE MODEL PATHS
-# =====================================================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.join(BASE_DIR, "plant_disease")
-
-CNN_MODEL_PATH = os.path.join(MODEL_DIR, "plant_disease_classifier.h5")
-SVM_MODEL_PATH = os.path.join(MODEL_DIR, "svm_classifier.pkl")
-SCALER_PATH = os.path.join(MODEL_DIR, "svm_scaler.pkl")
-SEVERITY_MODEL_PATH = os.path.join(MODEL_DIR, "severity_regressor.pkl")
-
-AGRI_KNOWLEDGE_PATH = os.path.join(MODEL_DIR,"agri_knowledge.json")
-CLASS_INDICES_PATH = os.path.join(MODEL_DIR,"class_indices.json")
-
-IMG_SIZE = (224, 224)
-CONF_THRESHOLD = 0.5
-
-# =====================================================
-# LOAD PLANT DISEASE MODELS
-# =====================================================
-logger.info("🌿 Loading plant disease models...")
-
-cnn_model = tf.keras.models.load_model(CNN_MODEL_PATH, compile=False)
-svm = joblib.load(SVM_MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
-
-print("🔍 Checking model path:", CNN_MODEL_PATH)
-print("📁 Exists:", os.path.exists(CNN_MODEL_PATH))
-
-
-severity_model = None
-if os.path.exists(SEVERITY_MODEL_PATH):
-    severity_model = joblib.load(SEVERITY_MODEL_PATH)
-
-feature_extractor = tf.keras.Model(
-    inputs=cnn_model.input,
-    outputs=cnn_model.get_layer("feature_layer").output
-)
-
-logger.info("✅ Plant disease models loaded")
-
-# =====================================================
-# LOAD JSON DATA
-# =====================================================
-with open(AGRI_KNOWLEDGE_PATH) as f:
-    agri_knowledge = json.load(f)
-
-with open(CLASS_INDICES_PATH) as f:
-    class_indices = json.load(f)
+    # Paginated, without the base64 images; see product_listing for the parameters
+    try:
+        return jsonify(list_products(products, request.args))
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
 
-index_to_class = {v: k for k, v in class_indices.items()}
+@core_bp.route("/api/products/<id>/thumbnail", methods=["GET"])
+def get_product_thumbnail(id):
+    return thumbnail_response(products, id, request)
 
-# =====================================================
-# UTIL FUNCTIONS
-# =====================================================
-def preprocess_image(img):
-    img = cv2.resize(img, IMG_SIZE)
-    img = preprocess_input(img)
-    img = np.expand_dims(img, axis=0)
-    return img
-
-def severity_label(percent):
-    if percent >= 80:
-        return "High"
-    elif percent >= 60:
-        return "Moderate"
-    return "Low"
 
 # =====================================================
 # HEALTH CHECK
 # =====================================================
-@app.route("/api/health", methods=["GET"])
+@core_bp.route("/api/health", methods=["GET"])
 def health():
     return jsonify({
         "status": "OK",
@@ -230,66 +173,72 @@ def health():
     })
 
 # =====================================================
-# WEATHER PREDICTION API
-# =====================================================
-@app.route('/api/weather/predict', methods=['POST'])
-def predict_weather():
-    data = request.json
-    # process data
-    return jsonify({"prediction": "rain"})
-# =====================================================
-# PLANT DISEASE DETECTION API
+# READINESS CHECK
 # =====================================================
-@app.route("/api/plant/detect", methods=["POST"])
-def detect_plant_disease():
-    try:
-        if "image" not in request.files:
-            return jsonify({"error": "No image uploaded"}), 400
-
-        file = request.files["image"]
-        path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(path)
-
-        img = cv2.imread(path)
-        if img is None:
-            return jsonify({"error": "Invalid image"}), 400
-
-        img_input = preprocess_image(img)
-
-        # Feature extraction
-        features = feature_extractor.predict(img_input, verbose=0)
-        features_scaled = scaler.transform(features)
+@core_bp.route("/api/ready", methods=["GET"])
+def ready():
+    """
+    Unlike /api/health this reports whether the pod should take traffic.
+    With warm-up enabled it stays 503 until the plant models are loaded.
+    """
+    if not current_app.config["PLANT_ENABLED"]:
+        return jsonify({"ready": True, "plant_models": "disabled"})
 
-        # SVM prediction
-        probs = svm.predict_proba(features_scaled)[0]
-        class_id = int(np.argmax(probs))
-        confidence = float(probs[class_id])
+    from plant_routes import inference_state
 
-        if confidence < CONF_THRESHOLD:
-            return jsonify({"error": "Leaf not detected clearly"}), 400
-
-        disease = index_to_class[class_id]
-        remedy = agri_knowledge[disease]["remedy"]
-        fertilizer = agri_knowledge[disease]["fertilizer"]
-
-        severity_percent = confidence * 100
-        if severity_model:
-            severity_percent = float(severity_model.predict(features)[0])
-
-        response = {
-            "disease": disease.replace("___", " - "),
-            "severity": round(severity_percent, 1),
-            "severity_level": severity_label(severity_percent),
-            "fertilizer": fertilizer,
-            "remedy": remedy,
-            "confidence": round(confidence * 100, 2)
-        }
-
-        return jsonify(response)
-
-    except Exception as e:
-        logger.exception("Plant disease detection error")
-        return jsonify({"error": str(e)}), 500
+    models = inference_state()
+    is_ready = models["state"] != "failed" and (
+        not current_app.config["PLANT_WARMUP"] or models["warmed"]
+    )
+    return jsonify({"ready": is_ready, "plant_models": models}), 200 if is_ready else 503
+
+# =====================================================
+# APPLICATION FACTORY
+# =====================================================
+def create_app(plant_enabled=None, warmup=None):
+    """
+    Build the Flask app. Plant disease models are not loaded here; they
+    load on the first detection request, or in the background right away
+    when warm-up is enabled.
+
+    Args:
+        plant_enabled: Register the plant disease routes (default PLANT_ENABLED)
+        warmup: Start background model warm-up (default PLANT_WARMUP)
+    """
+    plant_enabled = PLANT_ENABLED if plant_enabled is None else plant_enabled
+    warmup = PLANT_WARMUP if warmup is None else warmup
+
+    app = Flask(__name__)
+    app.request_class = SpoolingRequest
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+    app.config["PLANT_ENABLED"] = plant_enabled
+    app.config["PLANT_WARMUP"] = plant_enabled and warmup
+    CORS(app)
+    bcrypt.init_app(app)
+
+    app.register_blueprint(weather_bp, url_prefix="/api")
+    app.register_blueprint(cart_bp, url_prefix="/api")
+    app.register_blueprint(products_bp, url_prefix="/api")
+    app.register_blueprint(core_bp)
+
+    if plant_enabled:
+        # Imported here so marketplace-only pods never build the plant serving stack
+        from plant_routes import plant_bp, start_warm_up
+        app.register_blueprint(plant_bp, url_prefix="/api")
+
+        # Spawned inference workers re-import this module; only the server warms up
+        if warmup and multiprocessing.parent_process() is None:
+            start_warm_up()
+
+    # Dawn pre-warm of weather caches (WEATHER_PREWARM) and the marketplace
+    # indexes, server process only
+    if multiprocessing.parent_process() is None:
+        start_prewarm()
+        start_index_build(products, products_col)
+
+    return app
+
+app = create_app()
 
 # =====================================================
 # START SERVER
@@ -0,0 +1,146 @@
+"""
+Cache Store Module
+Size- and age-bounded key/value stores shared by the prediction and weather caches.
+MemoryStore lives inside one process, SqliteStore is a file that several
+worker processes can share.
+"""
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class MemoryStore:
+    """
+    In-process LRU store with a hard TTL.
+
+    Args:
+        max_entries: Least recently used entries are evicted beyond this
+        ttl_seconds: Entries older than this are never returned
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, stored_at) or None when missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl_seconds:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SqliteStore:
+    """
+    On-disk LRU store backed by SQLite, safe to share between processes.
+    Values must be JSON serializable.
+
+    Args:
+        path: SQLite database file
+        max_entries: Least recently used entries are evicted beyond this
+        ttl_seconds: Entries older than this are never returned
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, stored_at) or None when missing or expired"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), stored_at if stored_at is not None else now, now)
+        )
+
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def make_store(kind: str, path: str = "", max_entries: int = 1024, ttl_seconds: float = 3600):
+    """Build a store from config, `kind` is 'memory' or 'disk'"""
+    if kind == "disk":
+        return SqliteStore(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if kind == "memory":
+        return MemoryStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unknown cache store: {kind}")
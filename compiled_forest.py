@@ -0,0 +1,269 @@
+"""
+Compiled Forest Module
+Flattens a trained sklearn RandomForestClassifier / ExtraTreesClassifier
+into plain NumPy arrays and scores many rows at once by walking every tree
+in lockstep, without sklearn's per-call overhead or unpickling.
+
+Files for a compiled model with prefix `models/rain_rf_compiled`:
+
+    rain_rf_compiled.json                    classes, n_features, max_depth, version
+    rain_rf_compiled.<version>.<array>.npy   feature, threshold, left, right, value, roots
+
+The .npy arrays are memory-mapped on load, so worker processes share them.
+Every save writes a new version of the arrays and swaps the .json last, so
+re-exporting while the server runs never rewrites a file it has mapped;
+the previous version is kept for loads that are in progress.
+
+CLI (export + parity and latency check against the pickle):
+    python compiled_forest.py models/rain_rf.pkl --check
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import logging
+import argparse
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+class CompiledForest:
+    """
+    All trees in one set of node arrays. Leaves point to themselves, so a
+    fixed `max_depth` steps take every row to its leaf in every tree.
+
+    Args:
+        feature: (nodes,) feature index tested at each node (0 at leaves)
+        threshold: (nodes,) go left when x[feature] <= threshold
+        left, right: (nodes,) child node indices
+        value: (nodes, classes) class probabilities at the leaves
+        roots: (trees,) root node index of each tree
+        classes: Class labels, in predict_proba column order
+        max_depth: Deepest leaf over all trees
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 classes, n_features: int, max_depth: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "CompiledForest":
+        if not hasattr(forest, "estimators_") or not hasattr(forest, "classes_"):
+            raise TypeError(f"Expected a fitted forest classifier, got {type(forest).__name__}")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(n)
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, own, tree.children_left) + offset)
+            rights.append(np.where(leaf, own, tree.children_right) + offset)
+
+            # Weighted leaf counts -> per-tree class probabilities, as
+            # DecisionTreeClassifier.predict_proba normalises them
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1, keepdims=True)
+            values.append(np.divide(value, totals, out=np.zeros_like(value), where=totals > 0))
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        index_dtype = np.int32 if offset < 2 ** 31 else np.int64
+        feature_dtype = np.int16 if forest.n_features_in_ < 2 ** 15 else np.int32
+        return cls(
+            np.concatenate(features).astype(feature_dtype),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(lefts).astype(index_dtype),
+            np.concatenate(rights).astype(index_dtype),
+            np.concatenate(values).astype(np.float64),
+            np.asarray(roots, dtype=index_dtype),
+            forest.classes_,
+            forest.n_features_in_,
+            max_depth
+        )
+
+    def predict_proba(self, X) -> np.ndarray:
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+
+        rows = np.arange(len(X))[:, None]
+        nodes = np.repeat(self.roots[None], len(X), axis=0)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def save(self, prefix: str):
+        """
+        Write the arrays under a fresh version, then atomically replace the
+        .json that points at them. The previous version's arrays are kept,
+        since a load() elsewhere may have read the old .json but not yet
+        mapped them; versions older than that are pruned.
+        """
+        previous = None
+        if self.exists(prefix):
+            try:
+                with open(f"{prefix}.json") as f:
+                    previous = json.load(f).get("version")
+            except (OSError, ValueError):
+                pass
+
+        version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        for name in ARRAYS:
+            np.save(_array_path(prefix, name, version), getattr(self, name))
+
+        tmp = f"{prefix}.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "classes": self.classes_.tolist(),
+                "n_features": self.n_features_in_,
+                "max_depth": self.max_depth,
+                "nodes": int(len(self.feature)),
+                "trees": int(len(self.roots)),
+                "version": version
+            }, f, indent=2)
+        os.replace(tmp, f"{prefix}.json")
+
+        keep = {_array_path(prefix, name, v) for v in (version, previous) for name in ARRAYS}
+        for path in glob.glob(f"{glob.escape(prefix)}.*.npy"):
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                # e.g. still mapped on Windows; the next save tries again
+                logger.warning(f"⚠️ Could not remove old forest array {path}: {e}")
+
+    @classmethod
+    def load(cls, prefix: str, mmap_mode: Optional[str] = "r") -> "CompiledForest":
+        with open(f"{prefix}.json") as f:
+            meta = json.load(f)
+        version = meta.get("version")
+        arrays = {name: np.load(_array_path(prefix, name, version), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(classes=meta["classes"], n_features=meta["n_features"],
+                   max_depth=meta["max_depth"], **arrays)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(f"{prefix}.json")
+
+
+def _array_path(prefix: str, name: str, version: Optional[str] = None) -> str:
+    # Exports from before versioning have no version in their .json
+    return f"{prefix}.{version}.{name}.npy" if version else f"{prefix}.{name}.npy"
+
+
+def compiled_prefix(model_path: str) -> str:
+    """models/rain_rf.pkl -> models/rain_rf_compiled"""
+    return os.path.splitext(model_path)[0] + "_compiled"
+
+
+# =====================================================
+# PARITY + LATENCY CHECK
+# =====================================================
+def check(forest, compiled: CompiledForest, rows: np.ndarray, runs: int = 200) -> Dict:
+    """Max |predict_proba difference| and single-row / batch timings"""
+    expected = forest.predict_proba(rows)
+    actual = compiled.predict_proba(rows)
+
+    def single_row_ms(fn):
+        timings = []
+        for row in rows[:runs]:
+            t0 = time.perf_counter()
+            fn(row[None])
+            timings.append((time.perf_counter() - t0) * 1000)
+        return round(float(np.median(timings)), 3)
+
+    def batch_rows_per_s(fn):
+        t0 = time.perf_counter()
+        fn(rows)
+        return round(len(rows) / (time.perf_counter() - t0), 1)
+
+    return {
+        "rows": len(rows),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "same_argmax": float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        "sklearn_row_ms_p50": single_row_ms(forest.predict_proba),
+        "compiled_row_ms_p50": single_row_ms(compiled.predict_proba),
+        "sklearn_batch_rows_per_s": batch_rows_per_s(forest.predict_proba),
+        "compiled_batch_rows_per_s": batch_rows_per_s(compiled.predict_proba)
+    }
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Compile a pickled sklearn forest to NumPy arrays")
+    parser.add_argument("model", help="Pickled RandomForestClassifier, e.g. models/rain_rf.pkl")
+    parser.add_argument("--out", help="Output prefix (default: <model>_compiled)")
+    parser.add_argument("--check", action="store_true", help="Parity and latency against the pickle")
+    parser.add_argument("--rows", type=int, default=2000, help="Random rows for --check")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    forest = joblib.load(args.model)
+    pickle_load_s = time.perf_counter() - t0
+
+    compiled = CompiledForest.from_sklearn(forest)
+    prefix = args.out or compiled_prefix(args.model)
+    compiled.save(prefix)
+    print(f"✅ Compiled {len(compiled.roots)} trees, {len(compiled.feature)} nodes "
+          f"({compiled.nbytes() / 1e6:.1f} MB) -> {prefix}.*")
+
+    if not args.check:
+        return
+
+    t0 = time.perf_counter()
+    compiled = CompiledForest.load(prefix)
+    mmap_load_s = time.perf_counter() - t0
+
+    # Standard-normal rows match the scaled feature space the forest was trained in
+    rows = np.random.default_rng(0).standard_normal((args.rows, compiled.n_features_in_)).astype(np.float32)
+    result = check(forest, compiled, rows)
+    result.update({"pickle_load_s": round(pickle_load_s, 3), "mmap_load_s": round(mmap_load_s, 4)})
+    print(json.dumps(result, indent=2))
+
+    ok = result["max_abs_diff"] <= args.tolerance
+    faster = result["compiled_row_ms_p50"] < result["sklearn_row_ms_p50"]
+    print(f"{'✅' if ok else '❌'} parity (max |Δ| {result['max_abs_diff']:.2e} <= {args.tolerance})")
+    print(f"{'✅' if faster else '❌'} single-row latency "
+          f"({result['compiled_row_ms_p50']} ms vs {result['sklearn_row_ms_p50']} ms)")
+    if not (ok and faster):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
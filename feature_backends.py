@@ -0,0 +1,127 @@
+"""
+Feature Extractor Backends
+Runs the CNN up to `feature_layer` on a preprocessed (N, 224, 224, 3) batch
+and returns (N, 256) float32 features.
+
+    keras   plant_disease_classifier.h5 through TensorFlow (default)
+    tflite  feature_extractor.tflite through tflite_runtime, or tf.lite if
+            only full TensorFlow is installed
+    onnx    feature_extractor.onnx through onnxruntime
+
+The tflite and onnx files are produced by plant_disease/export_extractor.py.
+"""
+import os
+import threading
+import numpy as np
+
+BACKENDS = ("keras", "tflite", "onnx")
+
+CNN_FILE = "plant_disease_classifier.h5"
+TFLITE_FILE = "feature_extractor.tflite"
+ONNX_FILE = "feature_extractor.onnx"
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, cnn_model):
+        import tensorflow as tf
+
+        self.cnn_model = cnn_model
+        self.model = tf.keras.Model(
+            inputs=cnn_model.input,
+            outputs=cnn_model.get_layer("feature_layer").output
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "KerasBackend":
+        import tensorflow as tf
+        return cls(tf.keras.models.load_model(path, compile=False))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter. The interpreter is not thread-safe and is resized
+    to each incoming batch size, so calls are serialised with a lock.
+    """
+    name = "tflite"
+
+    def __init__(self, path: str, num_threads: int = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch):
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input["quantization"]
+        return np.clip(np.round(batch / scale + zero_point),
+                       np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+
+    def _dequantize(self, out):
+        if out.dtype == np.float32:
+            return out
+        scale, zero_point = self._output["quantization"]
+        return (out.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if len(batch) != self._batch_size:
+                shape = [len(batch)] + list(self._input["shape"][1:])
+                self.interpreter.resize_tensor_input(self._input["index"], shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = len(batch)
+
+            self.interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self.interpreter.invoke()
+            return self._dequantize(self.interpreter.get_tensor(self._output["index"])).copy()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+def load_backend(name: str, model_dir: str, num_threads: int = None):
+    """
+    Load a feature extractor backend by name.
+
+    Args:
+        name: One of BACKENDS
+        model_dir: Directory holding the model artifacts
+        num_threads: CPU threads for the tflite/onnx runtimes
+    """
+    if name == "keras":
+        return KerasBackend.load(os.path.join(model_dir, CNN_FILE))
+    if name == "tflite":
+        return TFLiteBackend(os.path.join(model_dir, TFLITE_FILE), num_threads=num_threads)
+    if name == "onnx":
+        return OnnxBackend(os.path.join(model_dir, ONNX_FILE), num_threads=num_threads)
+    raise ValueError(f"Unknown feature backend: {name} (expected one of {', '.join(BACKENDS)})")
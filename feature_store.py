@@ -0,0 +1,228 @@
+"""
+Feature Store Module
+Persists 256-d `feature_layer` embeddings keyed by image path and feature
+extractor version, so SVM / severity retraining reuses them instead of
+running the CNN again.
+
+Layout of one store version:
+
+    <root>/<model_version>/index.json        path -> (chunk, row, size, mtime)
+    <root>/<model_version>/chunk-00000.npy   float32 (rows, dim), memory-mapped
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMG_SIZE = (224, 224)
+FEATURE_DIM = 256
+INDEX_FILE = "index.json"
+# Bump when preprocess_bgr() changes; cached serving predictions are keyed by it
+PREPROCESS_VERSION = "rgb"
+
+
+def model_version(path: str) -> str:
+    """Content hash of a model file, used as the store version"""
+    h = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def preprocess_bgr(img: np.ndarray) -> np.ndarray:
+    """
+    OpenCV BGR image -> (224, 224, 3) float32 as the CNN saw it in training
+    (RGB, MobileNetV2 scaling). Serving uses the same function, so stored
+    embeddings match what the heads get at request time.
+    """
+    img = cv2.cvtColor(cv2.resize(img, IMG_SIZE), cv2.COLOR_BGR2RGB)
+    return img.astype(np.float32) / 127.5 - 1.0
+
+
+def load_rgb(path: str) -> Optional[np.ndarray]:
+    """preprocess_bgr() of an image file, or None if it cannot be decoded"""
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    return preprocess_bgr(img)
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class FeatureStore:
+    """
+    Append-only embedding store. Each add() writes a new .npy chunk, reads
+    memory-map the chunks so lookups never load the whole store.
+
+    An entry is stale (and reported by missing()) when the image's size or
+    mtime changed since it was embedded.
+
+    Args:
+        root: Folder holding one subfolder per model version
+        version: Feature extractor version, e.g. model_version(cnn_path)
+        dim: Embedding width
+    """
+
+    def __init__(self, root: str, version: str, dim: int = FEATURE_DIM):
+        self.root = root
+        self.version = version
+        self.dim = dim
+        self.path = os.path.join(root, version)
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._chunks = {}
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict:
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {"version": self.version, "dim": self.dim, "chunks": [], "entries": {}}
+        with open(index_path) as f:
+            index = json.load(f)
+        if index["dim"] != self.dim:
+            raise ValueError(f"Feature store {self.path} has dim {index['dim']}, expected {self.dim}")
+        return index
+
+    def _save_index(self):
+        # Written after the chunk, and swapped in atomically, so a crash
+        # never leaves entries pointing at a missing chunk
+        tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+    def _chunk(self, n: int) -> np.ndarray:
+        chunk = self._chunks.get(n)
+        if chunk is None:
+            name = self._index["chunks"][n]
+            chunk = self._chunks[n] = np.load(os.path.join(self.path, name), mmap_mode="r")
+        return chunk
+
+    def __len__(self):
+        return len(self._index["entries"])
+
+    def __contains__(self, path: str) -> bool:
+        return not self.missing([path])
+
+    def missing(self, paths: Sequence[str]) -> List[str]:
+        """Paths with no entry, or whose file changed since it was embedded"""
+        entries = self._index["entries"]
+        out = []
+        for path in paths:
+            try:
+                key, size, mtime = _file_key(path)
+            except OSError:
+                out.append(path)
+                continue
+            entry = entries.get(key)
+            if entry is None or entry[2] != size or entry[3] != mtime:
+                out.append(path)
+        return out
+
+    def add(self, paths: Sequence[str], features: np.ndarray):
+        """Store one embedding per path as a new chunk"""
+        features = np.asarray(features, dtype=np.float32)
+        if features.shape != (len(paths), self.dim):
+            raise ValueError(f"Expected features of shape ({len(paths)}, {self.dim}), got {features.shape}")
+        if not len(paths):
+            return
+
+        with self._lock:
+            n = len(self._index["chunks"])
+            name = f"chunk-{n:05d}.npy"
+            np.save(os.path.join(self.path, name), features)
+
+            self._index["chunks"].append(name)
+            for row, path in enumerate(paths):
+                key, size, mtime = _file_key(path)
+                self._index["entries"][key] = [n, row, size, mtime]
+            self._save_index()
+
+    def get(self, paths: Sequence[str]) -> np.ndarray:
+        """(len(paths), dim) embeddings, KeyError for any path not stored"""
+        entries = self._index["entries"]
+        out = np.empty((len(paths), self.dim), dtype=np.float32)
+
+        by_chunk = {}
+        for i, path in enumerate(paths):
+            entry = entries.get(os.path.abspath(path))
+            if entry is None:
+                raise KeyError(path)
+            by_chunk.setdefault(entry[0], ([], []))
+            by_chunk[entry[0]][0].append(i)
+            by_chunk[entry[0]][1].append(entry[1])
+
+        # One fancy-index gather per chunk
+        for n, (positions, rows) in by_chunk.items():
+            out[positions] = self._chunk(n)[rows]
+        return out
+
+    def extract(self, paths: Sequence[str], predict_fn: Callable[[np.ndarray], np.ndarray],
+                batch_size: int = 64, workers: int = 4, flush_every: int = 4096) -> Tuple[List[str], np.ndarray]:
+        """
+        Embed every path not yet in the store and return the embeddings of
+        all paths that could be decoded.
+
+        Images are decoded on `workers` threads while the previous batch is
+        in the model. New embeddings are flushed as a chunk every
+        `flush_every` rows, so an interrupted job resumes where it stopped.
+
+        Args:
+            paths: Image files
+            predict_fn: Preprocessed (N, 224, 224, 3) batch -> (N, dim) features
+            batch_size: Images per model call
+
+        Returns:
+            (decodable paths, (len, dim) float32 features) in input order
+        """
+        todo = self.missing(paths)
+        unreadable = set()
+
+        if todo:
+            logger.info(f"🌿 Extracting features for {len(todo)} of {len(paths)} images "
+                        f"(store {self.version}, {len(self)} cached)")
+            pending_paths, pending_feats = [], []
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+                next_images = pool.map(load_rgb, batches[0]) if batches else None
+
+                for b, batch_paths in enumerate(batches):
+                    images = list(next_images)
+                    if b + 1 < len(batches):
+                        next_images = pool.map(load_rgb, batches[b + 1])
+
+                    ok = [(p, img) for p, img in zip(batch_paths, images) if img is not None]
+                    unreadable.update(p for p, img in zip(batch_paths, images) if img is None)
+                    if not ok:
+                        continue
+
+                    feats = predict_fn(np.stack([img for _, img in ok]))
+                    pending_paths.extend(p for p, _ in ok)
+                    pending_feats.append(feats)
+
+                    if len(pending_paths) >= flush_every:
+                        self.add(pending_paths, np.vstack(pending_feats))
+                        pending_paths, pending_feats = [], []
+
+            if pending_paths:
+                self.add(pending_paths, np.vstack(pending_feats))
+
+        if unreadable:
+            logger.warning(f"⚠️ {len(unreadable)} images could not be decoded")
+
+        kept = [p for p in paths if p not in unreadable and os.path.exists(p)]
+        return kept, self.get(kept)
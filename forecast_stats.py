@@ -0,0 +1,285 @@
+"""
+Forecast Stats Module
+Columnar daily aggregation of OpenWeatherMap 5-day / 3-hour forecasts.
+
+All 3-hourly steps of one or many locations are flattened into NumPy
+columns once, grouped by (location, local day) and reduced with
+ufunc.reduceat, so a pre-warm or bulk job aggregates hundreds of payloads
+in one pass.
+
+For a single payload (the per-request forecast handler) NumPy's fixed
+overhead outweighs 40 steps, so one payload takes a plain-Python path.
+The benchmark asserts that both paths give identical output.
+
+Micro-benchmark against the previous dict-of-lists loop:
+    python forecast_stats.py --locations 1 10 100 500
+"""
+import time
+import json
+import argparse
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+DAY_NAMES = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+ICON_URL = "https://openweathermap.org/img/wn/{}@2x.png"
+ICON_PREFIX, ICON_SUFFIX = ICON_URL.split("{}")
+
+_main = itemgetter("main")
+_dt = itemgetter("dt")
+_temp = itemgetter("temp")
+_humidity = itemgetter("humidity")
+
+
+def _precipitation(step: Dict) -> float:
+    mm = step["rain"].get("3h", 0.0) if "rain" in step else 0.0
+    return mm + step["snow"].get("3h", 0.0) if "snow" in step else mm
+
+
+def _pop(step: Dict) -> float:
+    return step.get("pop", 0.0)
+
+
+def _icon(step: Dict) -> str:
+    return step["weather"][0]["icon"]
+
+
+def forecast_columns(payloads: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Flatten the `list` steps of every payload into columns: location index,
+    local day number, temperature, humidity, precipitation (mm), rain
+    probability (0-1) and icon
+    """
+    loc, ts, temp, humidity, precip, pop, icons = [], [], [], [], [], [], []
+    # map/itemgetter per column per payload, far cheaper than per-step appends
+    for i, payload in enumerate(payloads):
+        steps = payload["list"]
+        offset = (payload.get("city") or {}).get("timezone", 0)
+        mains = list(map(_main, steps))
+        loc.append(np.full(len(steps), i, dtype=np.int32))
+        ts.append(np.fromiter(map(_dt, steps), dtype=np.int64, count=len(steps)) + offset)
+        temp.extend(map(_temp, mains))
+        humidity.extend(map(_humidity, mains))
+        precip.extend(map(_precipitation, steps))
+        pop.extend(map(_pop, steps))
+        icons.extend(map(_icon, steps))
+
+    return {
+        "loc": np.concatenate(loc) if loc else np.empty(0, dtype=np.int32),
+        "day": (np.concatenate(ts) if ts else np.empty(0, dtype=np.int64)) // SECONDS_PER_DAY,
+        "temp": np.array(temp, dtype=np.float64),
+        "humidity": np.array(humidity, dtype=np.float64),
+        "precipitation": np.array(precip, dtype=np.float64),
+        "pop": np.array(pop, dtype=np.float64),
+        "icon": np.array(icons, dtype=object)
+    }
+
+
+def _round(value: float, decimals: int) -> float:
+    # Same multiply / rint / divide as np.round, so both paths agree exactly
+    scale = 10 ** decimals
+    return round(value * scale) / scale
+
+
+def _aggregate_one(payload: Dict, days: int) -> List[Dict]:
+    """aggregate_daily for one payload without NumPy"""
+    offset = (payload.get("city") or {}).get("timezone", 0)
+    groups = []
+    for step in payload["list"]:
+        day = (step["dt"] + offset) // SECONDS_PER_DAY
+        if not groups or groups[-1][0] != day:
+            if len(groups) == days:
+                break
+            groups.append((day, [], [], [], [], step))
+        _, temps, humidity, precip, pop, _ = groups[-1]
+        temps.append(step["main"]["temp"])
+        humidity.append(step["main"]["humidity"])
+        precip.append(_precipitation(step))
+        pop.append(_pop(step))
+
+    return [{
+        "day": str(DAY_NAMES[(day + EPOCH_WEEKDAY) % 7]),
+        "date": datetime.fromordinal(EPOCH_ORDINAL + day).strftime("%Y-%m-%d"),
+        "temp": round(sum(temps) / len(temps), 1),
+        "temp_min": _round(min(temps), 1),
+        "temp_max": _round(max(temps), 1),
+        "humidity": int(sum(humidity) / len(humidity)),
+        "precipitation": _round(sum(precip), 2),
+        "rain_probability": round(max(pop) * 100),
+        "icon": ICON_URL.format(_icon(first))
+    } for day, temps, humidity, precip, pop, first in groups]
+
+
+def aggregate_daily(payloads: Sequence[Dict], days: int = 7) -> List[List[Dict]]:
+    """
+    Daily summaries for each payload, in payload order.
+
+    Each day keeps the keys the forecast page already uses (day, temp,
+    humidity, icon) and adds date, temp_min, temp_max, precipitation and
+    rain_probability (highest 3-hourly chance, %).
+    """
+    if len(payloads) == 1:
+        return [_aggregate_one(payloads[0], days)]
+    return _aggregate_columnar(payloads, days)
+
+
+def _aggregate_columnar(payloads: Sequence[Dict], days: int) -> List[List[Dict]]:
+    out = [[] for _ in payloads]
+    cols = forecast_columns(payloads)
+    if not len(cols["loc"]):
+        return out
+
+    # Steps are time-ordered within a payload, so (location, day) groups
+    # are contiguous runs
+    key = cols["loc"].astype(np.int64) * 1_000_000 + cols["day"]
+    new_group = np.r_[True, key[1:] != key[:-1]]
+    starts = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+    counts = np.diff(np.r_[starts, len(key)])
+
+    # Only the first `days` days of each location
+    group_loc = cols["loc"][starts]
+    first_of_loc = np.r_[True, group_loc[1:] != group_loc[:-1]]
+    rank = np.arange(len(starts)) - np.maximum.accumulate(np.where(first_of_loc, np.arange(len(starts)), 0))
+    keep = rank < days
+
+    # bincount sums in index order, the same order as the sum() it replaces
+    temp_mean = np.bincount(group, weights=cols["temp"]) / counts
+    humidity = (np.bincount(group, weights=cols["humidity"]) / counts).astype(int)
+    temp_min = np.round(np.minimum.reduceat(cols["temp"], starts), 1)
+    temp_max = np.round(np.maximum.reduceat(cols["temp"], starts), 1)
+    precipitation = np.round(np.bincount(group, weights=cols["precipitation"]), 2)
+    rain_probability = np.round(np.maximum.reduceat(cols["pop"], starts) * 100).astype(int)
+
+    group_day = cols["day"][starts]
+    weekday = DAY_NAMES[(group_day + EPOCH_WEEKDAY) % 7]
+    dates = group_day.astype("datetime64[D]").astype(str)
+    icons = ICON_PREFIX + cols["icon"][starts] + ICON_SUFFIX
+
+    rows = zip(*(a[keep].tolist() for a in (
+        group_loc, weekday, dates, temp_mean, temp_min, temp_max, humidity, precipitation, rain_probability, icons
+    )))
+    for g_loc, day, date, t_mean, t_min, t_max, hum, rain_mm, rain_pct, icon in rows:
+        out[g_loc].append({
+            "day": day,
+            "date": date,
+            # Python round() to match the values the page showed before
+            "temp": round(t_mean, 1),
+            "temp_min": t_min,
+            "temp_max": t_max,
+            "humidity": hum,
+            "precipitation": rain_mm,
+            "rain_probability": rain_pct,
+            "icon": icon
+        })
+    return out
+
+
+# =====================================================
+# MICRO-BENCHMARK
+# =====================================================
+def daily_forecast_loop(payload: Dict, days: int = 7) -> List[Dict]:
+    """The previous per-payload aggregation, kept as the benchmark baseline"""
+    daily = {}
+    for item in payload["list"]:
+        date = item["dt_txt"].split(" ")[0]
+        if date not in daily:
+            daily[date] = {"temp": [], "humidity": [], "icon": item["weather"][0]["icon"]}
+        daily[date]["temp"].append(item["main"]["temp"])
+        daily[date]["humidity"].append(item["main"]["humidity"])
+
+    forecast = []
+    for date, values in list(daily.items())[:days]:
+        forecast.append({
+            "day": datetime.strptime(date, "%Y-%m-%d").strftime("%A"),
+            "temp": round(sum(values["temp"]) / len(values["temp"]), 1),
+            "humidity": int(sum(values["humidity"]) / len(values["humidity"])),
+            "icon": ICON_URL.format(values["icon"])
+        })
+    return forecast
+
+
+def synthetic_payload(rng: np.random.Generator, start: int, steps: int = 40) -> Dict:
+    """Forecast payload shaped like /data/2.5/forecast, UTC (timezone 0)"""
+    items = []
+    for k in range(steps):
+        dt = start + k * 3 * 3600
+        item = {
+            "dt": dt,
+            "dt_txt": datetime.utcfromtimestamp(dt).strftime("%Y-%m-%d %H:%M:%S"),
+            "main": {"temp": round(float(rng.normal(29, 4)), 2), "humidity": int(rng.integers(40, 100))},
+            "weather": [{"icon": rng.choice(["01d", "03d", "10d", "10n"])}],
+            "pop": round(float(rng.random()), 2)
+        }
+        if rng.random() < 0.3:
+            item["rain"] = {"3h": round(float(rng.exponential(2)), 2)}
+        items.append(item)
+    return {"list": items, "city": {"timezone": 0}}
+
+
+def benchmark(locations: int, repeat: int = 5, seed: int = 0) -> Dict:
+    rng = np.random.default_rng(seed)
+    start = 1_760_659_200  # a UTC midnight
+    payloads = [synthetic_payload(rng, start + int(rng.integers(0, 8)) * 3 * 3600) for _ in range(locations)]
+
+    def best_ms(fn):
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+        return min(timings)
+
+    loop_ms = best_ms(lambda: [daily_forecast_loop(p) for p in payloads])
+    columnar_ms = best_ms(lambda: aggregate_daily(payloads))
+
+    # The single-payload path must stay an exact copy of the columnar one
+    columnar = _aggregate_columnar(payloads, 7)
+    for i, payload in enumerate(payloads):
+        assert _aggregate_one(payload, 7) == columnar[i], f"single-payload aggregation differs for payload {i}"
+
+    # The shared keys must agree with the loop; means may differ by one
+    # rounding unit where summation order tips a .x5 boundary
+    loop = [daily_forecast_loop(p) for p in payloads]
+    pairs = [(a, b) for la, lb in zip(loop, columnar) for a, b in zip(la, lb)]
+    same_days = all(len(la) == len(lb) for la, lb in zip(loop, columnar)) and all(
+        (a["day"], a["icon"]) == (b["day"], b["icon"]) for a, b in pairs
+    )
+    max_temp_diff = max(abs(a["temp"] - b["temp"]) for a, b in pairs)
+    max_humidity_diff = max(abs(a["humidity"] - b["humidity"]) for a, b in pairs)
+
+    return {
+        "locations": locations,
+        "steps": locations * 40,
+        "loop_ms": round(loop_ms, 2),
+        "columnar_ms": round(columnar_ms, 2),
+        "speedup": round(loop_ms / columnar_ms, 2),
+        "same_days": same_days,
+        "max_temp_diff": round(max_temp_diff, 2),
+        "max_humidity_diff": max_humidity_diff
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark daily forecast aggregation")
+    parser.add_argument("--locations", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [benchmark(n, args.repeat) for n in args.locations]
+    print(f"{'locations':>9} {'steps':>7} {'loop ms':>9} {'columnar ms':>12} {'speedup':>8} "
+          f"{'same days':>10} {'max Δtemp':>10} {'max Δhum':>9}")
+    for r in results:
+        print(f"{r['locations']:>9} {r['steps']:>7} {r['loop_ms']:>9} {r['columnar_ms']:>12} {r['speedup']:>8} "
+              f"{str(r['same_days']):>10} {r['max_temp_diff']:>10} {r['max_humidity_diff']:>9}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
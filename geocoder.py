@@ -0,0 +1,265 @@
+"""
+Geocoder Module
+Local city-name index so repeat lookups never reach the OpenWeatherMap
+geocoding API. Preloaded from the bundled gazetteer (gazetteer_in.csv,
+Tamil Nadu districts and major Indian cities), and extended with every
+place upstream resolves, persisted to a JSON-lines backfill file.
+
+Names are matched after normalisation (case, accents, punctuation,
+"district"/"city" suffixes), then fuzzily for misspellings. Reverse
+lookups use a KD-tree over unit vectors, so nearest is by great-circle
+distance. Names upstream could not resolve are remembered for a while, so
+repeats do not spend geocoding quota.
+"""
+import os
+import csv
+import json
+import time
+import difflib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_PATH = os.environ.get("GEOCODE_GAZETTEER", os.path.join(BASE_DIR, "gazetteer_in.csv"))
+BACKFILL_PATH = os.environ.get("GEOCODE_BACKFILL_PATH", os.path.join(BASE_DIR, "geocode_backfill.jsonl"))
+FUZZY_CUTOFF = float(os.environ.get("GEOCODE_FUZZY_CUTOFF", 0.84))
+# Bounds on per-query memory: fuzzy match results and upstream misses
+FUZZY_MEMO_SIZE = int(os.environ.get("GEOCODE_FUZZY_MEMO_SIZE", 4096))
+MISS_CACHE_SIZE = int(os.environ.get("GEOCODE_MISS_CACHE_SIZE", 4096))
+MISS_TTL_SECONDS = float(os.environ.get("GEOCODE_MISS_TTL_HOURS", 24)) * 3600
+
+EARTH_RADIUS_KM = 6371.0
+NAME_SUFFIXES = (" district", " city", " town", " taluk")
+
+
+def normalize_name(name: str) -> str:
+    """'Tiruchirāppalli  District' -> 'tiruchirappalli'"""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    text = "".join(c if c.isalnum() else " " for c in text.lower())
+    text = " ".join(text.split())
+    for suffix in NAME_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[:-len(suffix)]
+    return text
+
+
+def _unit_vectors(coords: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class GeoIndex:
+    """
+    In-memory place index. Places are dicts shaped like get_coordinates()
+    results: {'lat', 'lon', 'name', 'state', 'country'}.
+
+    Args:
+        gazetteer_path: Bundled CSV (name, state, country, lat, lon, aliases)
+        backfill_path: JSON-lines file of places learned from upstream, or None
+        fuzzy_cutoff: difflib similarity (0-1) for a fuzzy name match
+        fuzzy_memo_size: Fuzzy match results kept (LRU)
+        miss_cache_size, miss_ttl_seconds: Names upstream did not know,
+            remembered (LRU) so they are not asked again until the TTL ends
+    """
+
+    def __init__(self, gazetteer_path: str = GAZETTEER_PATH, backfill_path: Optional[str] = BACKFILL_PATH,
+                 fuzzy_cutoff: float = FUZZY_CUTOFF, fuzzy_memo_size: int = FUZZY_MEMO_SIZE,
+                 miss_cache_size: int = MISS_CACHE_SIZE, miss_ttl_seconds: float = MISS_TTL_SECONDS):
+        self.backfill_path = backfill_path
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fuzzy_memo_size = fuzzy_memo_size
+        self.miss_cache_size = miss_cache_size
+        self.miss_ttl_seconds = miss_ttl_seconds
+
+        self._lock = threading.Lock()
+        self._places: List[Dict] = []
+        self._names: Dict[str, List[int]] = {}
+        self._fuzzy_memo: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._upstream_misses: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._tree = None
+        self._counts = {"exact_hits": 0, "fuzzy_hits": 0, "misses": 0, "backfilled": 0, "upstream_misses_skipped": 0}
+
+        if gazetteer_path and os.path.exists(gazetteer_path):
+            self._load_gazetteer(gazetteer_path)
+        if backfill_path and os.path.exists(backfill_path):
+            self._load_backfill(backfill_path)
+        logger.info(f"🗺️ Geocoding index: {len(self._places)} places, {len(self._names)} names")
+
+    def _load_gazetteer(self, path: str):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                aliases = [a for a in (row.get("aliases") or "").split("|") if a]
+                self._insert(row["name"], float(row["lat"]), float(row["lon"]),
+                             row.get("state", ""), row.get("country", "IN"), aliases)
+
+    def _load_backfill(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    p = json.loads(line)
+                    self._insert(p["name"], p["lat"], p["lon"], p.get("state", ""),
+                                 p.get("country", ""), p.get("aliases", []))
+                except (ValueError, KeyError):
+                    # A torn last line from a crash mid-append
+                    continue
+
+    def _insert(self, name, lat, lon, state="", country="", aliases=()) -> int:
+        idx = len(self._places)
+        self._places.append({
+            "lat": float(lat), "lon": float(lon), "name": name,
+            "state": state or "", "country": country or ""
+        })
+        for key in {normalize_name(n) for n in (name, *aliases)} - {""}:
+            self._names.setdefault(key, []).append(idx)
+        self._fuzzy_memo.clear()
+        self._tree = None
+        return idx
+
+    def __len__(self):
+        return len(self._places)
+
+    # =====================================================
+    # FORWARD LOOKUP
+    # =====================================================
+    def lookup(self, name: str, state: str = "", country: str = "", fuzzy: bool = True) -> Optional[Dict]:
+        """Best place for a name, preferring `state`/`country` when given"""
+        key = normalize_name(name)
+        if not key:
+            return None
+
+        with self._lock:
+            candidates = self._names.get(key)
+            kind = "exact_hits"
+            if candidates is None and fuzzy:
+                match = self._fuzzy_match(key)
+                candidates = self._names.get(match) if match else None
+                kind = "fuzzy_hits"
+
+            place = self._pick(candidates, state, country) if candidates else None
+            self._counts[kind if place else "misses"] += 1
+            return dict(place) if place else None
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        if key in self._fuzzy_memo:
+            self._fuzzy_memo.move_to_end(key)
+            return self._fuzzy_memo[key]
+
+        close = difflib.get_close_matches(key, self._names.keys(), n=1, cutoff=self.fuzzy_cutoff)
+        self._fuzzy_memo[key] = close[0] if close else None
+        if len(self._fuzzy_memo) > self.fuzzy_memo_size:
+            self._fuzzy_memo.popitem(last=False)
+        return self._fuzzy_memo[key]
+
+    def _pick(self, candidates: List[int], state: str, country: str) -> Optional[Dict]:
+        places = [self._places[i] for i in candidates]
+        if country:
+            places = [p for p in places if not p["country"] or p["country"].upper() == country.upper()]
+        if state:
+            wanted = normalize_name(state)
+            same_state = [p for p in places if normalize_name(p["state"]) == wanted]
+            places = same_state or places
+        return places[0] if places else None
+
+    # =====================================================
+    # REVERSE LOOKUP
+    # =====================================================
+    def nearest(self, lat: float, lon: float, max_km: Optional[float] = None) -> Optional[Tuple[Dict, float]]:
+        """(closest place, great-circle km) or None when the index is empty / too far"""
+        with self._lock:
+            if not self._places:
+                return None
+            if self._tree is None:
+                coords = np.array([(p["lat"], p["lon"]) for p in self._places])
+                self._tree = cKDTree(_unit_vectors(coords))
+            chord, idx = self._tree.query(_unit_vectors(np.array([[lat, lon]]))[0])
+            place = dict(self._places[idx])
+
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(min(1.0, chord / 2))
+        if max_km is not None and km > max_km:
+            return None
+        return place, round(float(km), 2)
+
+    # =====================================================
+    # UPSTREAM MISSES
+    # =====================================================
+    def _miss_key(self, name: str, state: str, country: str) -> Tuple[str, str, str]:
+        return normalize_name(name), normalize_name(state), (country or "").upper()
+
+    def known_miss(self, name: str, state: str = "", country: str = "") -> bool:
+        """True if upstream recently found nothing for this query"""
+        key = self._miss_key(name, state, country)
+        with self._lock:
+            expires = self._upstream_misses.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._upstream_misses[key]
+                return False
+            self._counts["upstream_misses_skipped"] += 1
+            return True
+
+    def remember_miss(self, name: str, state: str = "", country: str = ""):
+        """Record that upstream has no place for this query"""
+        key = self._miss_key(name, state, country)
+        with self._lock:
+            self._upstream_misses[key] = time.monotonic() + self.miss_ttl_seconds
+            self._upstream_misses.move_to_end(key)
+            if len(self._upstream_misses) > self.miss_cache_size:
+                self._upstream_misses.popitem(last=False)
+
+    # =====================================================
+    # BACKFILL
+    # =====================================================
+    def add(self, place: Dict, aliases: Tuple[str, ...] = ()) -> Dict:
+        """
+        Index a place resolved upstream, plus the names it was asked for,
+        and append it to the backfill file
+        """
+        with self._lock:
+            self._insert(place["name"], place["lat"], place["lon"],
+                         place.get("state", ""), place.get("country", ""), aliases)
+            self._counts["backfilled"] += 1
+
+            if self.backfill_path:
+                record = {k: place.get(k, "") for k in ("name", "state", "country", "lat", "lon")}
+                record["aliases"] = list(aliases)
+                try:
+                    with open(self.backfill_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not persist geocoding backfill: {e}")
+        return place
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = sum(self._counts[k] for k in ("exact_hits", "fuzzy_hits", "misses"))
+            hits = self._counts["exact_hits"] + self._counts["fuzzy_hits"]
+            return {
+                "places": len(self._places),
+                "names": len(self._names),
+                "fuzzy_memo": len(self._fuzzy_memo),
+                "upstream_misses": len(self._upstream_misses),
+                **self._counts,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index() -> GeoIndex:
+    """Process-wide GeoIndex, loaded on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = GeoIndex()
+    return _index
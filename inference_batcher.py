@@ -0,0 +1,188 @@
+"""
+Micro-batching Inference Queue
+Collects requests arriving from many Flask threads into one batched model call
+"""
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing more work than the server can drain"""
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class MicroBatcher:
+    """
+    Dynamic batching layer in front of a model pipeline.
+
+    Items submitted within `max_wait_ms` of the first queued item (or until
+    `max_batch_size` items are queued) are handed to `batch_fn` together.
+    Every caller gets a Future resolved with its own entry of the result list.
+
+    Args:
+        batch_fn: Callable taking a list of items and returning a list of
+            results in the same order
+        max_batch_size: Upper bound on items per batch
+        max_wait_ms: How long the first queued item waits for more company
+        name: Used for the worker thread name and log lines
+        max_queue: Submitting beyond this many queued items raises
+            Overloaded (0 means unbounded)
+        retry_after: Seconds suggested to rejected callers
+        workers: Worker threads, i.e. batches that may be in flight at once
+            (size it to the slots of whatever runs batch_fn)
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0,
+                 name: str = "batcher", max_queue: int = 0, retry_after: float = 1.0,
+                 workers: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after = retry_after
+        self.workers = max(1, int(workers))
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    # ---------------- public API ----------------
+    def submit(self, item: Any) -> Future:
+        """Queue one item and return a Future for its result"""
+        future = Future()
+        with self._cond:
+            full = self.max_queue and len(self._queue) >= self.max_queue
+            if not full:
+                self._ensure_started()
+                self._queue.append((item, future, time.monotonic()))
+                depth = len(self._queue)
+                self._cond.notify()
+
+        # Never take _stats_lock while holding _cond, stats() nests them the other way
+        if full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise Overloaded(self.retry_after)
+
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Submit one item and block until its result is ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self) -> Dict:
+        """Queue-depth and batch-size metrics for tuning the batching window"""
+        queue_depth = self.queue_depth()
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "workers": self.workers,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "max_queue": self.max_queue,
+                "queue_depth": queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "submitted": self._submitted,
+                "batches": batches,
+                "items": self._items,
+                "errors": self._errors,
+                "rejected": self._rejected,
+                "avg_batch_size": round(self._items / batches, 2) if batches else 0.0,
+                "avg_queue_wait_ms": round(self._wait_total * 1000 / self._items, 2) if self._items else 0.0,
+                "avg_batch_ms": round(self._run_total * 1000 / batches, 2) if batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._histogram.items())}
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
+
+    # ---------------- internals ----------------
+    def _reset_stats(self):
+        self._submitted = 0
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._rejected = 0
+        self._max_queue_depth = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._histogram = {}
+
+    def _ensure_started(self):
+        # Started lazily so a pre-forking server spawns the threads per worker
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._run, name=f"{self.name}-worker-{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                while not self._queue:
+                    self._cond.wait()
+
+                deadline = self._queue[0][2] + self.max_wait
+                while 0 < len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                # Another worker may have taken the queue while this one waited
+                if self._queue:
+                    size = min(self.max_batch_size, len(self._queue))
+                    return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            items = [entry[0] for entry in batch]
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+            except Exception as e:
+                logger.exception(f"{self.name}: batch of {len(items)} failed")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+
+            finished = time.monotonic()
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._errors += int(failed)
+                self._run_total += finished - started
+                self._wait_total += sum(started - entry[2] for entry in batch)
+                self._histogram[len(batch)] = self._histogram.get(len(batch), 0) + 1
@@ -0,0 +1,201 @@
+"""
+Inference Executor
+Runs model inference in a pool of worker processes so Flask threads only
+wait on a future, with bounded in-flight work and per-call timeouts
+"""
+import time
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from inference_batcher import Overloaded
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceTimeout(Exception):
+    """The worker did not answer within the per-call timeout"""
+
+
+class WorkerCrashed(Exception):
+    """A worker process died (OOM, segfault); the pool is rebuilt on the next call"""
+
+
+class InferenceExecutor:
+    """
+    Process pool with backpressure.
+
+    At most `max_pending` calls are in flight (queued or running); further
+    calls raise Overloaded instead of piling up. A call that times out
+    keeps its slot until the worker actually finishes, so the pool is never
+    oversubscribed. When a worker dies the broken pool is dropped and the
+    next call starts a fresh one.
+
+    Args:
+        fn: Top-level (picklable) function run in the workers
+        workers: Number of worker processes
+        max_pending: In-flight calls allowed before rejecting
+        timeout: Default seconds to wait for a result
+        warm_up_fn: Top-level function run once per worker by warm_up()
+        retry_after: Seconds suggested to rejected clients
+    """
+
+    def __init__(self, fn: Callable, workers: int = 2, max_pending: int = 4,
+                 timeout: Optional[float] = 30.0, warm_up_fn: Optional[Callable] = None,
+                 retry_after: float = 2.0):
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.timeout = timeout
+        self.warm_up_fn = warm_up_fn
+        self.retry_after = retry_after
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._failed = 0
+        self._restarts = 0
+        self._warmed = False
+        self._error = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created on first use; spawn because TensorFlow is not fork-safe
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=mp.get_context("spawn")
+                )
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool, unless another call already replaced it"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self._restarts += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.error("💥 Inference worker died, starting a new process pool on the next call")
+
+    def _submit(self, *args):
+        """(pool, future); a pool broken by an earlier crash is replaced once"""
+        pool = self._get_pool()
+        try:
+            return pool, pool.submit(self.fn, *args)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            pool = self._get_pool()
+            return pool, pool.submit(self.fn, *args)
+
+    def run(self, *args, timeout: Optional[float] = None, wait: float = 0.0) -> Any:
+        """
+        Run `fn(*args)` in a worker and return its result.
+
+        Args:
+            timeout: Seconds to wait for the result (default self.timeout)
+            wait: Seconds to wait for a free slot before raising Overloaded
+
+        Raises:
+            Overloaded: max_pending calls are already in flight
+            InferenceTimeout: No result within the timeout
+            WorkerCrashed: The worker process died while running the call
+        """
+        acquired = self._slots.acquire(timeout=wait) if wait > 0 else self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._stats_lock:
+                self._rejected += 1
+            raise Overloaded(self.retry_after)
+
+        with self._stats_lock:
+            self._in_flight += 1
+
+        try:
+            pool, future = self._submit(*args)
+        except Exception:
+            self._release(failed=True)
+            raise
+        future.add_done_callback(lambda f: self._release(failed=f.cancelled() or f.exception() is not None))
+
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise InferenceTimeout(f"No inference result within {timeout or self.timeout}s")
+        except BrokenProcessPool as e:
+            self._discard_pool(pool)
+            raise WorkerCrashed("Inference worker process died") from e
+
+    def _release(self, failed: bool):
+        self._slots.release()
+        with self._stats_lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._failed += int(failed)
+
+    def warm_up(self):
+        """Start every worker and run warm_up_fn in it"""
+        started = time.monotonic()
+        pool = self._get_pool()
+        try:
+            if self.warm_up_fn is not None:
+                futures = [pool.submit(self.warm_up_fn) for _ in range(self.workers)]
+                for f in futures:
+                    f.result()
+        except BrokenProcessPool as e:
+            self._discard_pool(pool)
+            self._error = str(e) or "Inference worker process died"
+            raise
+        except Exception as e:
+            self._error = str(e)
+            raise
+        self._warmed = True
+        logger.info(f"🔥 {self.workers} inference workers warmed up in {time.monotonic() - started:.1f}s")
+
+    def start_warm_up(self) -> threading.Thread:
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                logger.exception("Inference worker warm-up failed")
+
+        thread = threading.Thread(target=run, name="executor-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def state(self) -> Dict:
+        if self._error:
+            state = "failed"
+        elif self._warmed:
+            state = "loaded"
+        else:
+            state = "not_loaded" if self._pool is None else "loading"
+        return {"state": state, "warmed": self._warmed, "error": self._error}
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "restarts": self._restarts
+            }
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
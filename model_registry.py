@@ -0,0 +1,549 @@
+"""
+Model Registry Module
+Versioned model directories with checksummed manifests, atomic promotion,
+background hot-swapping of in-memory models and shadow scoring of a
+candidate version on live traffic.
+
+Layout of a registry root:
+
+    <root>/versions/<version>/...          model artifacts
+    <root>/versions/<version>/manifest.json checksums, class indices, metadata
+    <root>/current.json                     version being served
+    <root>/candidate.json                   version shadow-scored (optional)
+
+Pointers are replaced with os.replace, so readers see the old or the new
+version, never a partial write.
+
+CLI:
+    python model_registry.py list plant_disease/registry
+    python model_registry.py register plant_disease/registry plant_disease --promote
+    python model_registry.py promote plant_disease/registry 20261017-101500
+    python model_registry.py candidate plant_disease/registry 20261017-101500
+"""
+import os
+import json
+import time
+import queue
+import random
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_EXTENSIONS = (".h5", ".pkl", ".json", ".tflite", ".onnx", ".npy", ".npz")
+CURRENT_POINTER = "current.json"
+CANDIDATE_POINTER = "candidate.json"
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_json_atomic(path: str, data: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+# =====================================================
+# REGISTRY
+# =====================================================
+class ModelRegistry:
+    """
+    Versioned artifacts for one model family (plant disease, rain).
+
+    Args:
+        root: Registry folder, created on first register()
+        name: Model family name recorded in manifests
+    """
+
+    def __init__(self, root: str, name: str):
+        self.root = root
+        self.name = name
+        self.versions_dir = os.path.join(root, "versions")
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            v for v in os.listdir(self.versions_dir)
+            if os.path.exists(os.path.join(self.versions_dir, v, MANIFEST_FILE))
+        )
+
+    def manifest(self, version: str) -> Dict:
+        with open(os.path.join(self.path(version), MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def _pointer(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, name)) as f:
+                version = json.load(f).get("version")
+        except (OSError, ValueError):
+            return None
+        if version and os.path.isdir(self.path(version)):
+            return version
+        return None
+
+    def current(self) -> Optional[str]:
+        """Version being served, None when nothing was promoted"""
+        return self._pointer(CURRENT_POINTER)
+
+    def candidate(self) -> Optional[str]:
+        """Version to shadow-score, None when there is none"""
+        return self._pointer(CANDIDATE_POINTER)
+
+    def register(self, files: Dict[str, str], version: Optional[str] = None,
+                 class_indices: Optional[Dict] = None, metadata: Optional[Dict] = None) -> str:
+        """
+        Add a version. Files taken from another version are hard-linked
+        (versions are never modified, so unchanged artifacts cost no disk);
+        anything else is copied, since training scripts overwrite their
+        outputs in place. The manifest is written last, so a version
+        without one is incomplete and never listed.
+
+        Args:
+            files: Artifact name in the version -> source path
+            version: Defaults to a timestamp
+            class_indices: Class name -> index mapping the model was trained with
+            metadata: Free-form training details (accuracy, data size, parent...)
+        """
+        version = version or time.strftime("%Y%m%d-%H%M%S")
+        out_dir = self.path(version)
+        os.makedirs(out_dir)
+
+        versions_dir = os.path.abspath(self.versions_dir) + os.sep
+        checksums = {}
+        for name, src in files.items():
+            dst = os.path.join(out_dir, name)
+            try:
+                if not os.path.abspath(src).startswith(versions_dir):
+                    raise OSError("not a registry file")
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            checksums[name] = {"sha256": sha256_file(dst), "size": os.path.getsize(dst)}
+
+        manifest = {
+            "name": self.name,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "parent": self.current(),
+            "files": checksums,
+            "class_indices": class_indices,
+            "metadata": metadata or {}
+        }
+        _write_json_atomic(os.path.join(out_dir, MANIFEST_FILE), manifest)
+        logger.info(f"📦 Registered {self.name} model {version} ({len(files)} files)")
+        return version
+
+    def verify(self, version: str) -> List[str]:
+        """Names of artifacts that are missing or fail their checksum"""
+        bad = []
+        for name, info in self.manifest(version)["files"].items():
+            path = os.path.join(self.path(version), name)
+            if not os.path.exists(path) or sha256_file(path) != info["sha256"]:
+                bad.append(name)
+        return bad
+
+    def promote(self, version: str):
+        """Serve `version`; running processes swap to it in the background"""
+        bad = self.verify(version)
+        if bad:
+            raise ValueError(f"{self.name} model {version} failed verification: {', '.join(bad)}")
+        _write_json_atomic(os.path.join(self.root, CURRENT_POINTER), {
+            "version": version,
+            "previous": self.current(),
+            "promoted_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+        logger.info(f"🚀 Promoted {self.name} model {version}")
+
+    def set_candidate(self, version: Optional[str]):
+        """Shadow-score `version` on live traffic, None stops shadowing"""
+        path = os.path.join(self.root, CANDIDATE_POINTER)
+        if version is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        bad = self.verify(version)
+        if bad:
+            raise ValueError(f"{self.name} model {version} failed verification: {', '.join(bad)}")
+        os.makedirs(self.root, exist_ok=True)
+        _write_json_atomic(path, {"version": version})
+
+    def resolve(self, fallback_dir: str, version: Optional[str] = None) -> Tuple[str, Optional[str], Dict]:
+        """
+        (directory, version, manifest) to load. Without a promoted version
+        this is the unversioned artifacts in `fallback_dir`.
+        """
+        version = version or self.current()
+        if version is None:
+            return fallback_dir, None, {}
+        return self.path(version), version, self.manifest(version)
+
+    def info(self) -> Dict:
+        return {"current": self.current(), "candidate": self.candidate(), "versions": self.versions()}
+
+
+# =====================================================
+# HOT-SWAPPING LOADER
+# =====================================================
+class LazyModel:
+    """
+    Loads a model on first `get()`. Concurrent callers wait for the single
+    load in progress instead of loading their own copy.
+
+    States: not_loaded -> loading -> loaded | failed
+
+    With `version_fn` and `reloader`, a loaded instance checks the
+    published version at most every `check_interval` seconds. A change is
+    loaded (and warmed) on a background thread while requests keep using
+    the current model, then swapped in with one reference assignment.
+    Loaded models must have a `version` attribute.
+
+    Args:
+        loader: Builds the model
+        reloader: Builds the published version, given the current model
+            so unchanged parts can be reused
+        version_fn: Returns the published version
+        warm_fn: Runs a dummy inference on a freshly loaded model
+        name: Used in logs and thread names
+    """
+
+    def __init__(self, loader: Callable[[], Any],
+                 reloader: Optional[Callable[[Any], Any]] = None,
+                 version_fn: Optional[Callable[[], Optional[str]]] = None,
+                 check_interval: float = 5.0,
+                 warm_fn: Optional[Callable[[Any], None]] = None,
+                 name: str = "model"):
+        self.loader = loader
+        self.reloader = reloader
+        self.version_fn = version_fn
+        self.check_interval = check_interval
+        self.warm_fn = warm_fn
+        self.name = name
+        self._models = None
+        self._lock = threading.Lock()
+        self._state = "not_loaded"
+        self._error = None
+        self._warmed = False
+
+        self._checked_at = time.monotonic()
+        self._reloading = False
+        self._reloads = 0
+        self._failed_version = None
+        self._reload_error = None
+
+    def get(self):
+        models = self._models
+        if models is not None:
+            self._maybe_reload(models)
+            return models
+
+        with self._lock:
+            if self._models is None:
+                self._state = "loading"
+                try:
+                    self._models = self.loader()
+                except Exception as e:
+                    self._state = "failed"
+                    self._error = str(e)
+                    raise
+                self._state = "loaded"
+                self._error = None
+            return self._models
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version in memory, falling back to the published one before the first load"""
+        models = self._models
+        if models is not None:
+            return models.version
+        return self.version_fn() if self.version_fn else None
+
+    def _maybe_reload(self, models):
+        if self.reloader is None or self.version_fn is None or self.check_interval <= 0:
+            return
+        now = time.monotonic()
+        if self._reloading or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        version = self.version_fn()
+        if version == models.version or version == self._failed_version:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(
+            target=self._reload, args=(models, version), name=f"{self.name}-reload", daemon=True
+        ).start()
+
+    def _reload(self, models, version: Optional[str]):
+        started = time.monotonic()
+        try:
+            new_models = self.reloader(models)
+            # Warm the new model before any request sees it
+            if self.warm_fn is not None:
+                self.warm_fn(new_models)
+            self._models = new_models
+            self._reloads += 1
+            self._reload_error = None
+            logger.info(
+                f"🔄 {self.name} model swapped {models.version or 'base'} -> "
+                f"{new_models.version or 'base'} in {time.monotonic() - started:.1f}s"
+            )
+        except Exception as e:
+            self._failed_version = version
+            self._reload_error = str(e)
+            logger.exception(f"Loading {self.name} model {version} failed, keeping {models.version or 'base'}")
+        finally:
+            self._reloading = False
+
+    def is_loaded(self) -> bool:
+        return self._models is not None
+
+    def state(self) -> Dict:
+        models = self._models
+        return {
+            "state": self._state,
+            "warmed": self._warmed,
+            "error": self._error,
+            "version": (models.version or "base") if models is not None else None,
+            "reloads": self._reloads,
+            "reload_error": self._reload_error
+        }
+
+    def warm_up(self):
+        """Load the model and run warm_fn so first requests are fast"""
+        models = self.get()
+        if self.warm_fn is not None:
+            self.warm_fn(models)
+        self._warmed = True
+        logger.info(f"🔥 {self.name} model warmed up")
+
+    def start_warm_up(self) -> threading.Thread:
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                logger.exception(f"{self.name} model warm-up failed")
+
+        thread = threading.Thread(target=run, name=f"{self.name}-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+# =====================================================
+# SHADOW SCORING
+# =====================================================
+class ShadowScorer:
+    """
+    Scores a sample of live inputs with the registry's candidate version
+    on a background thread, so live latency is unaffected. Inputs arriving
+    while `max_pending` are queued are dropped.
+
+    Args:
+        registry: Registry whose candidate pointer selects the model
+        load_fn: version -> model, same kind the primary serves
+        predict_fn: (model, inputs) -> outputs
+        compare_fn: (primary outputs, shadow outputs) -> per-item
+            (agree: bool, delta: float) pairs
+        sample_rate: Fraction of calls shadow-scored, 0 disables
+        check_interval: Seconds between candidate pointer checks
+    """
+
+    def __init__(self, registry: ModelRegistry, load_fn: Callable[[str], Any],
+                 predict_fn: Callable[[Any, Any], Any],
+                 compare_fn: Callable[[Any, Any], Iterable[Tuple[bool, float]]],
+                 sample_rate: float = 0.0, max_pending: int = 4,
+                 check_interval: float = 5.0, window: int = 1000):
+        self.registry = registry
+        self.load_fn = load_fn
+        self.predict_fn = predict_fn
+        self.compare_fn = compare_fn
+        self.sample_rate = sample_rate
+        self.check_interval = check_interval
+
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._candidate = None
+        self._candidate_version = None
+        self._target = None
+        self._checked_at = -check_interval
+        self._window = window
+        self._reset(None)
+
+    def _reset(self, version: Optional[str]):
+        self._version = version
+        self._samples = 0
+        self._items = 0
+        self._agree = 0
+        self._deltas = deque(maxlen=self._window)
+        self._primary_ms = deque(maxlen=self._window)
+        self._shadow_ms = deque(maxlen=self._window)
+        self._dropped = 0
+        self._errors = 0
+        self._last_error = None
+
+    def _target_version(self) -> Optional[str]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._target = self.registry.candidate()
+        return self._target
+
+    def offer(self, inputs, primary_outputs, primary_ms: float):
+        """Maybe queue one primary call for shadow scoring; never blocks"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        version = self._target_version()
+        if version is None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((version, inputs, primary_outputs, primary_ms))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _run(self):
+        while True:
+            version, inputs, primary_outputs, primary_ms = self._queue.get()
+            try:
+                if version != self._candidate_version:
+                    self._candidate = None
+                    self._candidate = self.load_fn(version)
+                    self._candidate_version = version
+                    with self._lock:
+                        self._reset(version)
+                    logger.info(f"👥 Shadow scoring {self.registry.name} candidate {version}")
+
+                started = time.perf_counter()
+                shadow_outputs = self.predict_fn(self._candidate, inputs)
+                shadow_ms = (time.perf_counter() - started) * 1000
+
+                pairs = list(self.compare_fn(primary_outputs, shadow_outputs))
+                with self._lock:
+                    self._samples += 1
+                    self._items += len(pairs)
+                    self._agree += sum(1 for agree, _ in pairs if agree)
+                    self._deltas.extend(delta for _, delta in pairs)
+                    self._primary_ms.append(primary_ms)
+                    self._shadow_ms.append(shadow_ms)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                    self._last_error = str(e)
+                logger.exception(f"Shadow scoring {self.registry.name} candidate {version} failed")
+
+    def stats(self) -> Dict:
+        def pct(values, q):
+            return round(float(np.percentile(values, q)), 2) if values else None
+
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "candidate": self._version,
+                "samples": self._samples,
+                "items": self._items,
+                "agreement": round(self._agree / self._items, 4) if self._items else None,
+                "mean_abs_delta": round(float(np.mean(self._deltas)), 4) if self._deltas else None,
+                "primary_ms_p50": pct(self._primary_ms, 50),
+                "primary_ms_p95": pct(self._primary_ms, 95),
+                "shadow_ms_p50": pct(self._shadow_ms, 50),
+                "shadow_ms_p95": pct(self._shadow_ms, 95),
+                "dropped": self._dropped,
+                "errors": self._errors,
+                "last_error": self._last_error
+            }
+
+
+# =====================================================
+# CLI
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="Manage a model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="Versions and pointers")
+    p.add_argument("root")
+
+    p = sub.add_parser("register", help="Register the model files in a folder as a new version")
+    p.add_argument("root")
+    p.add_argument("source", help="Folder holding the artifacts")
+    p.add_argument("--files", nargs="*",
+                   help=f"Artifact names (default: every {'/'.join(ARTIFACT_EXTENSIONS)} file in source)")
+    p.add_argument("--name", default=None, help="Model family (default: registry folder's parent)")
+    p.add_argument("--class-indices", default="class_indices.json",
+                   help="JSON file in source recorded in the manifest, if present")
+    p.add_argument("--promote", action="store_true")
+
+    for command in ("promote", "verify"):
+        p = sub.add_parser(command)
+        p.add_argument("root")
+        p.add_argument("version")
+
+    p = sub.add_parser("candidate", help="Set the shadow-scored version")
+    p.add_argument("root")
+    p.add_argument("version", nargs="?", help="Omit to stop shadow scoring")
+
+    args = parser.parse_args()
+    name = getattr(args, "name", None) or os.path.basename(os.path.dirname(os.path.abspath(args.root)))
+    registry = ModelRegistry(args.root, name)
+
+    if args.command == "list":
+        info = registry.info()
+        for v in info["versions"]:
+            marks = [key for key in ("current", "candidate") if info[key] == v]
+            print(f"{v}  {' '.join(marks)}")
+    elif args.command == "register":
+        names = args.files or sorted(
+            f for f in os.listdir(args.source)
+            if f.endswith(ARTIFACT_EXTENSIONS) and os.path.isfile(os.path.join(args.source, f))
+        )
+        class_indices = None
+        indices_path = os.path.join(args.source, args.class_indices)
+        if os.path.exists(indices_path):
+            with open(indices_path) as f:
+                class_indices = json.load(f)
+        version = registry.register(
+            {n: os.path.join(args.source, n) for n in names}, class_indices=class_indices
+        )
+        print(version)
+        if args.promote:
+            registry.promote(version)
+    elif args.command == "promote":
+        registry.promote(args.version)
+    elif args.command == "candidate":
+        registry.set_candidate(args.version)
+    elif args.command == "verify":
+        bad = registry.verify(args.version)
+        print("OK" if not bad else f"FAILED: {', '.join(bad)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
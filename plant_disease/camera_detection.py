@@ -5,12 +5,25 @@ FINAL CAMERA-BASED PLANT DISEASE DETECTION
 ✔ Fertilizer + Remedy
 ✔ Voice Output
 ✔ Automatic Leaf Detection
+✔ Multiple leaves per frame, batched inference, per-leaf tracking
+✔ Pipelined capture / inference / speech / display threads
+✔ FPS + latency overlay, headless video-file benchmark mode
+✔ Motion-gated inference: a static leaf is classified once and reused
+
+Usage:
+    python camera_detection.py                       # webcam 0
+    python camera_detection.py --source leaf.mp4 --headless --no-voice
+    python camera_detection.py --infer-every 3 --motion-threshold 0   # fixed cadence only
 """
 
 # =========================
 # IMPORTS
 # =========================
 import cv2
+import time
+import queue
+import argparse
+import threading
 import numpy as np
 import tensorflow as tf
 import json
@@ -34,6 +47,18 @@ IMG_SIZE = (224, 224)
 CONF_THRESHOLD = 0.50
 MIN_LEAF_AREA = 3000
 SMOOTH_FRAMES = 2
+MAX_LEAVES = 8             # largest leaves classified per frame
+TRACK_MAX_DISTANCE = 80    # px a leaf centre may move between frames
+TRACK_MAX_MISSED = 10      # frames a leaf may disappear before its ID is dropped
+SPEECH_QUEUE_SIZE = 8      # pending announcements before new ones are dropped
+STATS_INTERVAL = 5.0       # seconds between headless stats lines
+
+# Inference gating: the CNN only reruns when the scene changed
+INFER_EVERY = 1            # run the model at most every N processed frames
+MOTION_THRESHOLD = 4.0     # mean grey-level change (0-255) that counts as motion, 0 disables gating
+BOX_TOLERANCE = 12         # px a leaf box may shift and still count as the same view
+REFRESH_SECONDS = 5.0      # rerun the model at least this often, even on a static scene
+MOTION_SIZE = (64, 48)     # frame size used for differencing
 
 # =========================
 # LOAD MODELS
@@ -74,21 +99,152 @@ index_to_class = {v: k for k, v in class_indices.items()}
 # =========================
 # VOICE ENGINE
 # =========================
-engine = pyttsx3.init()
-engine.setProperty("rate", 160)
-
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+class Speaker:
+    """
+    Speaks queued text on its own thread so runAndWait never blocks video.
+    say() never waits: when the queue is full the announcement is dropped.
+    """
+
+    def __init__(self, enabled=True, max_pending=SPEECH_QUEUE_SIZE):
+        self.enabled = enabled
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="speaker", daemon=True)
+        if enabled:
+            self.thread.start()
+
+    def _run(self):
+        # pyttsx3 engines must be used from the thread that created them
+        engine = pyttsx3.init()
+        engine.setProperty("rate", 160)
+        while True:
+            text = self.queue.get()
+            if text is None:
+                break
+            engine.say(text)
+            engine.runAndWait()
+
+    def say(self, text):
+        if not self.enabled:
+            return
+        try:
+            self.queue.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=10.0):
+        """Let queued announcements finish, then end the thread"""
+        if not self.enabled:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
 
 # =========================
-# IMAGE PREPROCESS
+# MULTI-LEAF DETECTION
 # =========================
-def preprocess(img):
-    img = cv2.resize(img, IMG_SIZE)
-    img = preprocess_input(img)
-    img = np.expand_dims(img, axis=0)
-    return img
+def find_leaves(frame):
+    """Bounding boxes (x, y, w, h) of every green contour above MIN_LEAF_AREA"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    lower_green = np.array([25, 40, 40])
+    upper_green = np.array([85, 255, 255])
+    mask = cv2.inRange(hsv, lower_green, upper_green)
+
+    kernel = np.ones((5, 5), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    leaves = [c for c in contours if cv2.contourArea(c) > MIN_LEAF_AREA]
+    leaves.sort(key=cv2.contourArea, reverse=True)
+
+    return np.array([cv2.boundingRect(c) for c in leaves[:MAX_LEAVES]], dtype=np.int32).reshape(-1, 4)
+
+def crop_leaves(frame, boxes):
+    """
+    Crop and resize every box to IMG_SIZE in one vectorized op, then apply
+    MobileNetV2 preprocessing. Frames are BGR, the models were trained on
+    RGB. Returns a (N, 224, 224, 3) batch.
+    """
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    h, w = frame.shape[:2]
+    x, y, bw, bh = boxes.T.astype(np.float32)
+    # crop_and_resize wants normalised [y1, x1, y2, x2]
+    norm = np.stack([y / h, x / w, (y + bh) / h, (x + bw) / w], axis=1)
+
+    crops = tf.image.crop_and_resize(
+        rgb[None].astype(np.float32),
+        norm,
+        box_indices=np.zeros(len(boxes), dtype=np.int32),
+        crop_size=IMG_SIZE
+    )
+    return preprocess_input(crops.numpy())
+
+def classify_leaves(batch):
+    """One extractor + SVM (+ severity) pass for all leaves in the frame"""
+    features = feature_extractor.predict(batch, batch_size=len(batch), verbose=0)
+    probs = svm.predict_proba(scaler.transform(features))
+
+    severities = [None] * len(batch)
+    if severity_model:
+        severities = severity_model.predict(features)
+    return probs, severities
+
+class LeafTracker:
+    """
+    Gives each leaf a stable ID across frames by matching box centres to
+    the nearest existing track, so prediction smoothing is per leaf.
+    """
+
+    def __init__(self, max_distance=TRACK_MAX_DISTANCE, max_missed=TRACK_MAX_MISSED):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.tracks = {}   # id -> {"centre", "missed", "probs": deque}
+        self.next_id = 0
+
+    def update(self, boxes):
+        """Returns a track ID for every box"""
+        centres = boxes[:, :2] + boxes[:, 2:] / 2.0
+        ids = [None] * len(boxes)
+
+        track_ids = list(self.tracks)
+        if track_ids and len(boxes):
+            known = np.array([self.tracks[t]["centre"] for t in track_ids])
+            dist = np.linalg.norm(centres[:, None, :] - known[None, :, :], axis=2)
+
+            # Greedy nearest-first matching
+            for flat in np.argsort(dist, axis=None):
+                i, j = np.unravel_index(flat, dist.shape)
+                if dist[i, j] > self.max_distance:
+                    break
+                if ids[i] is None and track_ids[j] not in ids:
+                    ids[i] = track_ids[j]
+
+        for i, track_id in enumerate(ids):
+            if track_id is None:
+                track_id = ids[i] = self.next_id
+                self.next_id += 1
+                self.tracks[track_id] = {"probs": deque(maxlen=SMOOTH_FRAMES)}
+            self.tracks[track_id]["centre"] = centres[i]
+            self.tracks[track_id]["missed"] = 0
+
+        for track_id in list(self.tracks):
+            if track_id not in ids:
+                self.tracks[track_id]["missed"] += 1
+                if self.tracks[track_id]["missed"] > self.max_missed:
+                    del self.tracks[track_id]
+
+        return ids
+
+    def smoothed(self, track_id, probs):
+        """Add this frame's probabilities, return the average once SMOOTH_FRAMES are seen"""
+        queue = self.tracks[track_id]["probs"]
+        queue.append(probs)
+        if len(queue) < SMOOTH_FRAMES:
+            return None
+        return np.mean(queue, axis=0)
 
 # =========================
 # SEVERITY LABEL
@@ -102,96 +258,393 @@ def severity_label(percent):
         return "Low"
 
 # =========================
-# CAMERA START
+# PIPELINE
 # =========================
-cap = cv2.VideoCapture(0)
-pred_queue = deque(maxlen=SMOOTH_FRAMES)
-last_spoken = ""
-
-speak("Smart plant disease detection started")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+class RateMeter:
+    """Events per second over a sliding window"""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.times = deque()
+        self.count = 0
+
+    def tick(self):
+        now = time.monotonic()
+        self.times.append(now)
+        self.count += 1
+        while self.times and now - self.times[0] > self.window:
+            self.times.popleft()
+
+    def rate(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0] + 1e-9)
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox. Writers overwrite, so readers always get the
+    newest frame and anything they were too slow for is dropped.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self.closed = False
+
+    def put(self, frame):
+        with self.cond:
+            self.frame = frame
+            self.seq += 1
+            self.timestamp = time.monotonic()
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def peek(self):
+        with self.cond:
+            return self.frame, self.seq, self.timestamp
+
+    def wait_newer(self, seq, timeout=1.0):
+        """Newest (frame, seq, timestamp) after `seq`, or None once closed and drained"""
+        with self.cond:
+            while self.seq <= seq and not self.closed:
+                self.cond.wait(timeout)
+            if self.seq <= seq:
+                return None
+            return self.frame, self.seq, self.timestamp
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames into a LatestFrame. Video files are paced at their own
+    FPS (like a live camera) unless pace=False.
+    """
+
+    def __init__(self, cap, frames, pace=False, max_frames=0):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.frames = frames
+        self.max_frames = max_frames
+        self.stop_event = threading.Event()
+        self.meter = RateMeter()
+
+        fps = cap.get(cv2.CAP_PROP_FPS) if pace else 0
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+
+    def run(self):
+        next_at = time.monotonic()
+        while not self.stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames.put(frame)
+            self.meter.tick()
+
+            if self.max_frames and self.meter.count >= self.max_frames:
+                break
+            if self.interval:
+                next_at += self.interval
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        self.frames.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Classifies the newest captured frame, skipping frames that arrived
+    while the previous one was being processed. Publishes overlay
+    detections and queues voice announcements.
+    """
+
+    def __init__(self, frames, speaker, infer_every=INFER_EVERY,
+                 motion_threshold=MOTION_THRESHOLD, refresh_seconds=REFRESH_SECONDS):
+        super().__init__(name="inference", daemon=True)
+        self.frames = frames
+        self.speaker = speaker
+        self.infer_every = max(1, infer_every)
+        self.motion_threshold = motion_threshold
+        self.refresh_seconds = refresh_seconds
+        self.tracker = LeafTracker()
+        self.last_spoken = ""
+        self.meter = RateMeter()
+        self.lock = threading.Lock()
+
+        self.detections = []          # [(box, label)] for the overlay
+        self.latency_ms = 0.0         # capture -> result, newest frame
+        self.infer_ms = 0.0           # model time, newest frame
+        self.processed = 0
+        self.stale = 0                # frames dropped because a newer one existed
+        self.latencies = []
+
+        # Gating state, from the last frame the model actually ran on
+        self.inferences = 0
+        self.skipped = 0              # frames answered from the previous result
+        self.model_seconds = 0.0      # wall time spent in the model
+        self.model_cpu_seconds = 0.0  # process CPU time spent in the model
+        self.last_small = None
+        self.last_boxes = None
+        self.last_track_ids = []
+        self.last_detections = []
+        self.last_infer_at = 0.0
+        self.since_infer = 0
+
+    def run(self):
+        seq = 0
+        while True:
+            item = self.frames.wait_newer(seq)
+            if item is None:
+                break
+            frame, new_seq, captured_at = item
+            self.stale += new_seq - seq - 1
+            seq = new_seq
+
+            started = time.monotonic()
+            detections = self.process(frame)
+            finished = time.monotonic()
+
+            with self.lock:
+                self.detections = detections
+                self.infer_ms = (finished - started) * 1000
+                self.latency_ms = (finished - captured_at) * 1000
+                self.latencies.append(self.latency_ms)
+                self.processed += 1
+            self.meter.tick()
+
+    def scene_changed(self, small, boxes):
+        """True when the frame or the leaf boxes moved since the last inference"""
+        if self.last_boxes is None or len(boxes) != len(self.last_boxes):
+            return True
+        if np.abs(boxes - self.last_boxes).max() > BOX_TOLERANCE:
+            return True
+        motion = float(cv2.absdiff(small, self.last_small).mean())
+        return motion > self.motion_threshold
+
+    def should_infer(self, small, boxes):
+        # Smoothing needs SMOOTH_FRAMES results per leaf before it has a label
+        warming = any(len(self.tracker.tracks.get(t, {}).get("probs", ())) < SMOOTH_FRAMES
+                      for t in self.last_track_ids)
+        if self.last_boxes is None or warming:
+            return True
+        if self.since_infer < self.infer_every:
+            return False
+        if time.monotonic() - self.last_infer_at > self.refresh_seconds:
+            return True
+        if self.motion_threshold <= 0:
+            return True
+        return self.scene_changed(small, boxes)
+
+    def process(self, frame):
+        boxes = find_leaves(frame)
+        if not len(boxes):
+            self.tracker.update(boxes)
+            self.last_boxes = None
+            self.last_track_ids = []
+            return []
+
+        small = cv2.GaussianBlur(
+            cv2.cvtColor(cv2.resize(frame, MOTION_SIZE), cv2.COLOR_BGR2GRAY), (5, 5), 0
+        )
+        self.since_infer += 1
+        if not self.should_infer(small, boxes):
+            self.skipped += 1
+            return self.last_detections
+
+        # =========================
+        # PREDICTION (all leaves in one batch)
+        # =========================
+        wall, cpu = time.monotonic(), time.process_time()
+        probs_batch, severities = classify_leaves(crop_leaves(frame, boxes))
+        self.model_seconds += time.monotonic() - wall
+        self.model_cpu_seconds += time.process_time() - cpu
+        self.inferences += 1
+
+        track_ids = self.tracker.update(boxes)
+        self.last_small = small
+        self.last_boxes = boxes
+        self.last_track_ids = track_ids
+        self.last_infer_at = time.monotonic()
+        self.since_infer = 0
+
+        detections = []
+        for box, track_id, probs, severity in zip(boxes, track_ids, probs_batch, severities):
+            label = None
+            avg_probs = self.tracker.smoothed(track_id, probs)
+            if avg_probs is not None:
+                label = self.describe(track_id, avg_probs, severity)
+            detections.append((tuple(int(v) for v in box), label))
+
+        self.last_detections = detections
+        return detections
+
+    def describe(self, track_id, avg_probs, severity):
+        """Overlay label for one smoothed leaf, announcing new diseases"""
+        class_id = int(np.argmax(avg_probs))
+        confidence = float(avg_probs[class_id])
+
+        if confidence < CONF_THRESHOLD:
+            return None
+
+        disease = index_to_class[class_id]
+        remedy = agri_knowledge[disease]["remedy"]
+        fertilizer = agri_knowledge[disease]["fertilizer"]
+
+        # Severity %
+        sev_percent = confidence * 100
+        if severity is not None:
+            sev_percent = float(severity)
+
+        sev_label = severity_label(sev_percent)
+
+        if disease != self.last_spoken:
+            print(f"\n🌿 Leaf #{track_id} Disease:", disease)
+            print("Severity:", sev_label, f"({round(sev_percent,1)}%)")
+            print("Remedy:", remedy)
+            print("Fertilizer:", fertilizer)
+
+            self.speaker.say(f"Disease detected is {disease.replace('___',' ')}")
+            self.speaker.say(f"Severity level is {sev_label}")
+            self.speaker.say(remedy)
+            self.speaker.say(fertilizer)
+
+            self.last_spoken = disease
+
+        return f"#{track_id} {disease.replace('___',' - ')} | {round(sev_percent,1)}%"
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "detections": list(self.detections),
+                "latency_ms": self.latency_ms,
+                "infer_ms": self.infer_ms,
+                "processed": self.processed,
+                "stale": self.stale,
+                "inferences": self.inferences,
+                "skipped": self.skipped,
+                "cpu_saved_s": self.cpu_saved()
+            }
+
+    def cpu_saved(self):
+        """Estimated model CPU seconds avoided by reusing results"""
+        if not self.inferences:
+            return 0.0
+        return self.skipped * self.model_cpu_seconds / self.inferences
+
+    def gating_summary(self):
+        result = self.snapshot()
+        total = result["inferences"] + result["skipped"]
+        percent = 100.0 * result["skipped"] / total if total else 0.0
+        return f"skipped {result['skipped']}/{total} ({percent:.0f}%) | cpu saved ~{result['cpu_saved_s']:.1f} s"
+
+
+def draw_overlay(display, result, capture, worker, display_meter):
+    for (x, y, w, h), label in result["detections"]:
+        cv2.rectangle(display, (x, y), (x+w, y+h), (0, 255, 0), 2)
+        if label:
+            cv2.putText(display, label, (x, y-10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
+
+    lines = [
+        f"capture {capture.meter.rate():.1f} fps | infer {worker.meter.rate():.1f} fps | display {display_meter.rate():.1f} fps",
+        f"latency {result['latency_ms']:.0f} ms | model {result['infer_ms']:.0f} ms | dropped {result['stale']}",
+        worker.gating_summary()
+    ]
+    for i, line in enumerate(lines):
+        cv2.putText(display, line, (10, 20 + 20*i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,0), 1)
+
+
+def print_summary(capture, worker, elapsed, speaker):
+    result = worker.snapshot()
+    latencies = worker.latencies or [0.0]
+    print("\n📊 Pipeline summary")
+    print(f"Frames captured: {capture.meter.count} ({capture.meter.count / elapsed:.1f} fps)")
+    print(f"Frames inferred: {result['processed']} ({result['processed'] / elapsed:.1f} fps)")
+    print(f"Stale frames dropped: {result['stale']}")
+    print(f"Model runs: {result['inferences']}, reused results: {worker.gating_summary()}")
+    if worker.inferences:
+        print(f"Model time: {worker.model_seconds:.1f} s wall, {worker.model_cpu_seconds:.1f} s CPU")
+    print(f"Latency p50 / p95: {np.percentile(latencies, 50):.0f} / {np.percentile(latencies, 95):.0f} ms")
+    print(f"Announcements dropped: {speaker.dropped}")
 
-    display = frame.copy()
 
-    # =========================
-    # LEAF DETECTION (HSV)
-    # =========================
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    lower_green = np.array([25, 40, 40])
-    upper_green = np.array([85, 255, 255])
-    mask = cv2.inRange(hsv, lower_green, upper_green)
-
-    kernel = np.ones((5, 5), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    if contours:
-        cnt = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(cnt)
-
-        if area > MIN_LEAF_AREA:
-            x, y, w, h = cv2.boundingRect(cnt)
-            leaf = frame[y:y+h, x:x+w]
-
-            cv2.rectangle(display, (x, y), (x+w, y+h), (0, 255, 0), 2)
-
-            # =========================
-            # PREDICTION
-            # =========================
-            img_input = preprocess(leaf)
-            features = feature_extractor.predict(img_input, verbose=0)
-            features_scaled = scaler.transform(features)
-
-            probs = svm.predict_proba(features_scaled)[0]
-            pred_queue.append(probs)
-
-            if len(pred_queue) == SMOOTH_FRAMES:
-                avg_probs = np.mean(pred_queue, axis=0)
-                class_id = int(np.argmax(avg_probs))
-                confidence = float(avg_probs[class_id])
-
-                if confidence >= CONF_THRESHOLD:
-                    disease = index_to_class[class_id]
-                    remedy = agri_knowledge[disease]["remedy"]
-                    fertilizer = agri_knowledge[disease]["fertilizer"]
-
-                    # Severity %
-                    sev_percent = confidence * 100
-                    if severity_model:
-                        sev_percent = float(
-                            severity_model.predict(features)[0]
-                        )
-
-                    sev_label = severity_label(sev_percent)
-
-                    label = f"{disease.replace('___',' - ')} | {round(sev_percent,1)}%"
-                    cv2.putText(display, label, (x, y-10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
-
-                    if disease != last_spoken:
-                        print("\n🌿 Disease:", disease)
-                        print("Severity:", sev_label, f"({round(sev_percent,1)}%)")
-                        print("Remedy:", remedy)
-                        print("Fertilizer:", fertilizer)
-
-                        speak(f"Disease detected is {disease.replace('___',' ')}")
-                        speak(f"Severity level is {sev_label}")
-                        speak(remedy)
-                        speak(fertilizer)
-
-                        last_spoken = disease
-
-    cv2.imshow("Smart Plant Disease Detection", display)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
-speak("Detection stopped")
+# =========================
+# CAMERA START
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Live plant disease detection")
+    parser.add_argument("--source", default="0", help="Camera index or video file path")
+    parser.add_argument("--headless", action="store_true", help="No window, print stats instead")
+    parser.add_argument("--no-voice", action="store_true", help="Disable spoken announcements")
+    parser.add_argument("--no-pace", action="store_true",
+                        help="Read video files as fast as possible instead of at their FPS")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after this many frames")
+    parser.add_argument("--infer-every", type=int, default=INFER_EVERY,
+                        help="Run the model at most every N processed frames")
+    parser.add_argument("--motion-threshold", type=float, default=MOTION_THRESHOLD,
+                        help="Mean grey-level change that triggers inference, 0 disables motion gating")
+    parser.add_argument("--refresh", type=float, default=REFRESH_SECONDS,
+                        help="Rerun the model at least every N seconds on a static scene")
+    args = parser.parse_args()
+
+    is_camera = args.source.isdigit()
+    cap = cv2.VideoCapture(int(args.source) if is_camera else args.source)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video source: {args.source}")
+
+    speaker = Speaker(enabled=not args.no_voice)
+    frames = LatestFrame()
+    capture = CaptureThread(cap, frames, pace=not is_camera and not args.no_pace,
+                            max_frames=args.max_frames)
+    worker = InferenceWorker(frames, speaker, infer_every=args.infer_every,
+                             motion_threshold=args.motion_threshold, refresh_seconds=args.refresh)
+    display_meter = RateMeter()
+
+    speaker.say("Smart plant disease detection started")
+    started = time.monotonic()
+    capture.start()
+    worker.start()
+
+    try:
+        if args.headless:
+            while worker.is_alive():
+                worker.join(STATS_INTERVAL)
+                result = worker.snapshot()
+                print(f"capture {capture.meter.rate():.1f} fps | infer {worker.meter.rate():.1f} fps | "
+                      f"latency {result['latency_ms']:.0f} ms | dropped {result['stale']} | "
+                      f"{worker.gating_summary()}")
+        else:
+            last_seq = 0
+            while worker.is_alive():
+                frame, seq, _ = frames.peek()
+                if frame is not None and seq != last_seq:
+                    last_seq = seq
+                    display = frame.copy()
+                    draw_overlay(display, worker.snapshot(), capture, worker, display_meter)
+                    cv2.imshow("Smart Plant Disease Detection", display)
+                    display_meter.tick()
+
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    finally:
+        capture.stop()
+        capture.join()
+        worker.join()
+        cap.release()
+        if not args.headless:
+            cv2.destroyAllWindows()
+
+    print_summary(capture, worker, time.monotonic() - started, speaker)
+    speaker.say("Detection stopped")
+    speaker.stop()
+
+
+if __name__ == "__main__":
+    main()
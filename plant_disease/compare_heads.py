@@ -0,0 +1,131 @@
+"""
+SERVING HEAD COMPARISON
+✔ Accuracy on a labeled image folder
+✔ Agreement / drift against the current svm_classifier.pkl
+✔ Per-request and batch latency for every head
+
+Usage:
+    python compare_heads.py --data path/to/plant_datas --per-class 50
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, sys, json, time, argparse
+
+import cv2
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from plant_heads import HEADS, load_head
+
+# =========================
+# CONFIG
+# =========================
+CNN_MODEL_PATH = os.path.join(BASE_DIR, "plant_disease_classifier.h5")
+CLASS_INDICES_PATH = os.path.join(BASE_DIR, "class_indices.json")
+
+IMG_SIZE = (224, 224)
+EXTRACT_BATCH = 32
+LATENCY_ROWS = 200
+
+
+def collect_images(data_dir, class_indices, per_class):
+    paths, labels = [], []
+    for cls, idx in class_indices.items():
+        cls_dir = os.path.join(data_dir, cls)
+        if not os.path.isdir(cls_dir):
+            continue
+        names = sorted(os.listdir(cls_dir))[:per_class]
+        paths += [os.path.join(cls_dir, n) for n in names]
+        labels += [idx] * len(names)
+    return paths, np.array(labels)
+
+
+def extract_features(feature_extractor, paths):
+    feats, keep = [], []
+    for start in range(0, len(paths), EXTRACT_BATCH):
+        batch = []
+        for i, p in enumerate(paths[start:start + EXTRACT_BATCH], start):
+            img = cv2.imread(p)
+            if img is None:
+                continue
+            batch.append(preprocess_input(cv2.resize(img, IMG_SIZE).astype(np.float32)))
+            keep.append(i)
+        if batch:
+            feats.append(feature_extractor.predict(np.stack(batch), verbose=0))
+    return np.vstack(feats), np.array(keep)
+
+
+def time_head(head, X):
+    # Warm-up so lazy initialisation does not count
+    head.predict_proba(X[:1])
+
+    rows = X[:LATENCY_ROWS]
+    single = []
+    for i in range(len(rows)):
+        t0 = time.perf_counter()
+        head.predict_proba(rows[i:i + 1])
+        single.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    head.predict_proba(X)
+    batch_s = time.perf_counter() - t0
+
+    return np.median(single), np.percentile(single, 95), len(X) / batch_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare plant disease serving heads")
+    parser.add_argument("--data", required=True, help="Folder with one sub-folder per class")
+    parser.add_argument("--per-class", type=int, default=50, help="Images per class to score")
+    args = parser.parse_args()
+
+    with open(CLASS_INDICES_PATH) as f:
+        class_indices = json.load(f)
+
+    paths, labels = collect_images(args.data, class_indices, args.per_class)
+    if not paths:
+        raise SystemExit(f"No labeled images found under {args.data}")
+
+    cnn_model = tf.keras.models.load_model(CNN_MODEL_PATH, compile=False)
+    feature_extractor = tf.keras.Model(
+        cnn_model.input,
+        cnn_model.get_layer("feature_layer").output
+    )
+
+    print(f"🔍 Extracting features for {len(paths)} images...")
+    X, keep = extract_features(feature_extractor, paths)
+    y = labels[keep]
+
+    heads = {}
+    for name in HEADS:
+        try:
+            heads[name] = load_head(name, BASE_DIR, cnn_model=cnn_model)
+        except (FileNotFoundError, OSError) as e:
+            print(f"⚠️ Skipping {name} head: {e}")
+
+    if "svm" not in heads:
+        raise SystemExit("svm_classifier.pkl is required as the reference head")
+
+    ref_probs = heads["svm"].predict_proba(X)
+    ref_pred = ref_probs.argmax(axis=1)
+
+    print(f"\n{'head':<8} {'acc':>7} {'agree':>7} {'|Δconf|':>8} {'p50 ms':>8} {'p95 ms':>8} {'rows/s':>10}")
+    for name, head in heads.items():
+        probs = head.predict_proba(X)
+        pred = probs.argmax(axis=1)
+
+        acc = float((pred == y).mean())
+        agree = float((pred == ref_pred).mean())
+        conf_drift = float(np.abs(probs.max(axis=1) - ref_probs.max(axis=1)).mean())
+        p50, p95, throughput = time_head(head, X)
+
+        print(f"{name:<8} {acc:>7.4f} {agree:>7.4f} {conf_drift:>8.4f} {p50:>8.3f} {p95:>8.3f} {throughput:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
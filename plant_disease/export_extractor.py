@@ -0,0 +1,208 @@
+"""
+FEATURE EXTRACTOR EXPORT
+✔ TFLite (float32 / float16 / dynamic-range / full int8)
+✔ ONNX (optionally dynamic-quantized)
+✔ Accuracy parity check against the .h5 model
+✔ Load time, latency and RSS report per backend
+
+Usage:
+    python export_extractor.py --format tflite --quantize float16 --check --data plant_datas
+    python export_extractor.py --format onnx --check
+
+Serve the result with PLANT_FEATURE_BACKEND=tflite (or onnx).
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, sys, json, time, argparse, resource, subprocess
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from feature_backends import BACKENDS, CNN_FILE, TFLITE_FILE, ONNX_FILE, load_backend
+from plant_heads import SOFTMAX_FILE, SoftmaxHead, load_head
+
+# =========================
+# CONFIG
+# =========================
+IMG_SIZE = (224, 224)
+CALIB_IMAGES = 200
+PARITY_IMAGES = 64
+BENCH_RUNS = 50
+
+
+def preprocess(img):
+    img = cv2.resize(img, IMG_SIZE)
+    return img.astype(np.float32) / 127.5 - 1.0
+
+
+def sample_images(data_dir, limit):
+    """Preprocessed images from a class-per-folder dataset, random noise without one"""
+    images = []
+    if data_dir and os.path.isdir(data_dir):
+        for root, _, files in os.walk(data_dir):
+            for name in sorted(files):
+                img = cv2.imread(os.path.join(root, name))
+                if img is not None:
+                    images.append(preprocess(img))
+                if len(images) >= limit:
+                    return np.stack(images)
+    if images:
+        return np.stack(images)
+
+    print("⚠️ No dataset images found, using random inputs")
+    rng = np.random.default_rng(42)
+    return rng.uniform(-1, 1, size=(limit, *IMG_SIZE, 3)).astype(np.float32)
+
+
+# =========================
+# EXPORTERS
+# =========================
+def export_tflite(feature_model, quantize, calib):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(feature_model)
+
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == "int8":
+        # Int8 weights and activations, float32 input/output so serving
+        # code stays the same
+        def representative_dataset():
+            for img in calib:
+                yield [img[None].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+
+    path = os.path.join(BASE_DIR, TFLITE_FILE)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    print(f"✅ TFLite extractor saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB, {quantize})")
+
+
+def export_onnx(feature_model, quantize):
+    import tensorflow as tf
+    import tf2onnx
+
+    path = os.path.join(BASE_DIR, ONNX_FILE)
+    spec = (tf.TensorSpec((None, *IMG_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(feature_model, input_signature=spec, opset=13, output_path=path)
+
+    if quantize == "dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp = path + ".fp32"
+        os.replace(path, tmp)
+        quantize_dynamic(tmp, path, weight_type=QuantType.QInt8)
+        os.remove(tmp)
+
+    print(f"✅ ONNX extractor saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB, {quantize})")
+
+
+# =========================
+# PARITY + BENCHMARK
+# =========================
+def check_parity(reference, samples, names):
+    """Feature error and SVM top-1 agreement of each backend against keras"""
+    ref_feats = reference.predict(samples)
+    svm_head = load_head("svm", BASE_DIR)
+    ref_pred = svm_head.predict_proba(ref_feats).argmax(axis=1)
+
+    print(f"\n{'backend':<8} {'max|Δ|':>10} {'cosine':>8} {'top-1 agree':>12}")
+    for name in names:
+        feats = load_backend(name, BASE_DIR).predict(samples)
+        cos = np.sum(feats * ref_feats, axis=1) / (
+            np.linalg.norm(feats, axis=1) * np.linalg.norm(ref_feats, axis=1) + 1e-12
+        )
+        agree = float((svm_head.predict_proba(feats).argmax(axis=1) == ref_pred).mean())
+        print(f"{name:<8} {np.abs(feats - ref_feats).max():>10.5f} {cos.mean():>8.5f} {agree:>12.4f}")
+
+
+def bench_backend(name):
+    """Runs in a fresh process so RSS only reflects this backend"""
+    t0 = time.perf_counter()
+    backend = load_backend(name, BASE_DIR)
+    load_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(0)
+    single = rng.uniform(-1, 1, size=(1, *IMG_SIZE, 3)).astype(np.float32)
+    batch = rng.uniform(-1, 1, size=(16, *IMG_SIZE, 3)).astype(np.float32)
+    backend.predict(single)
+
+    timings = []
+    for _ in range(BENCH_RUNS):
+        t0 = time.perf_counter()
+        backend.predict(single)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    backend.predict(batch)
+    batch_s = time.perf_counter() - t0
+
+    print(json.dumps({
+        "backend": name,
+        "load_s": round(load_s, 2),
+        "p50_ms": round(float(np.median(timings)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "batch16_img_per_s": round(16 / batch_s, 1),
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }))
+
+
+def report_benchmarks(names):
+    print(f"\n{'backend':<8} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'img/s@16':>9} {'RSS MB':>8}")
+    for name in names:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--bench-backend", name],
+            capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            print(f"{name:<8} failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<8} {r['load_s']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['batch16_img_per_s']:>9} {r['rss_mb']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the plant disease feature extractor")
+    parser.add_argument("--format", choices=["tflite", "onnx", "all"], default="tflite")
+    parser.add_argument("--quantize", choices=["none", "float16", "dynamic", "int8"], default="none",
+                        help="float16/int8 are TFLite only, dynamic works for both")
+    parser.add_argument("--data", help="Dataset folder for int8 calibration and parity images")
+    parser.add_argument("--check", action="store_true", help="Run parity check and benchmarks")
+    parser.add_argument("--bench-backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_backend:
+        bench_backend(args.bench_backend)
+        return
+
+    reference = load_backend("keras", BASE_DIR)
+    print(f"🌿 Loaded {CNN_FILE}")
+
+    # Lets PLANT_HEAD=softmax run without TensorFlow next to the new backend
+    SoftmaxHead.from_keras(reference.cnn_model).save(os.path.join(BASE_DIR, SOFTMAX_FILE))
+
+    exported = []
+    if args.format in ("tflite", "all"):
+        calib = sample_images(args.data, CALIB_IMAGES) if args.quantize == "int8" else None
+        export_tflite(reference.model, args.quantize, calib)
+        exported.append("tflite")
+    if args.format in ("onnx", "all"):
+        export_onnx(reference.model, "dynamic" if args.quantize == "dynamic" else "none")
+        exported.append("onnx")
+
+    if args.check:
+        check_parity(reference, sample_images(args.data, PARITY_IMAGES), exported)
+        report_benchmarks(["keras"] + exported)
+
+
+if __name__ == "__main__":
+    main()
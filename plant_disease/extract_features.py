@@ -0,0 +1,131 @@
+"""
+FEATURE EXTRACTION JOB
+✔ Embeds the whole dataset (and severity_labels.csv) in large batches
+✔ Parallel image decoding
+✔ Memory-mapped feature store keyed by image path + CNN version
+✔ Re-runs only embed new or changed images
+✔ Parity check: a sample is re-embedded the way the server preprocesses uploads
+
+Usage:
+    python extract_features.py --data plant_datas
+    PLANT_FEATURE_BACKEND=tflite python extract_features.py --backend tflite
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, sys, time, argparse
+
+import cv2
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from feature_backends import BACKENDS, CNN_FILE, load_backend
+from feature_store import FeatureStore, model_version
+
+# =========================
+# CONFIG
+# =========================
+DATASET_DIR = r"D:\final_project\backend\plant_disease\plant_datas"
+SEVERITY_CSV = os.path.join(BASE_DIR, "severity_labels.csv")
+FEATURE_STORE_DIR = os.path.join(BASE_DIR, "feature_store")
+
+BATCH_SIZE = 128
+DECODE_WORKERS = os.cpu_count() or 4
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+PARITY_SAMPLE = 16
+PARITY_ATOL = 1e-3
+
+
+def dataset_images(data_dir):
+    """(paths, labels, class_names) for a class-per-folder dataset, classes sorted"""
+    class_names = sorted(
+        d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))
+    )
+    paths, labels = [], []
+    for label, cls in enumerate(class_names):
+        folder = os.path.join(data_dir, cls)
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(folder, name))
+                labels.append(label)
+    return paths, labels, class_names
+
+
+def severity_images(csv_path):
+    """(paths, severities) of the rows in severity_labels.csv whose image exists"""
+    if not os.path.exists(csv_path):
+        return [], []
+    df = pd.read_csv(csv_path)
+    df = df[df["image_path"].map(os.path.exists)]
+    return df["image_path"].tolist(), df["severity"].astype(float).tolist()
+
+
+def open_store(store_dir=FEATURE_STORE_DIR, cnn_path=os.path.join(BASE_DIR, CNN_FILE)):
+    return FeatureStore(store_dir, model_version(cnn_path))
+
+
+def check_parity(store, predict_fn, paths, sample=PARITY_SAMPLE):
+    """
+    Re-embed a spread of stored images through the serving preprocessing
+    (cv2 decode + plant_models.preprocess_image) and return the largest
+    absolute difference to their stored embeddings
+    """
+    from plant_models import preprocess_image
+
+    stored = [p for p in paths if p in store]
+    picked = stored[::max(1, len(stored) // sample)][:sample]
+    images, kept = [], []
+    for path in picked:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(preprocess_image(img)[0])
+            kept.append(path)
+    if not kept:
+        return 0.0
+    return float(np.abs(predict_fn(np.stack(images)) - store.get(kept)).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the plant dataset into the feature store")
+    parser.add_argument("--data", default=DATASET_DIR, help="Class-per-folder dataset")
+    parser.add_argument("--severity-csv", default=SEVERITY_CSV)
+    parser.add_argument("--store", default=FEATURE_STORE_DIR)
+    parser.add_argument("--backend", choices=BACKENDS, default="keras",
+                        help="Runtime for the extractor, the store is versioned by the .h5 either way")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS)
+    parser.add_argument("--skip-parity", action="store_true",
+                        help="Do not compare stored embeddings with the serving preprocessing")
+    args = parser.parse_args()
+
+    store = open_store(args.store)
+    backend = load_backend(args.backend, BASE_DIR)
+
+    paths = []
+    if os.path.isdir(args.data):
+        paths, _, class_names = dataset_images(args.data)
+        print(f"🌿 {len(paths)} dataset images in {len(class_names)} classes")
+    sev_paths, _ = severity_images(args.severity_csv)
+    seen = set(paths)
+    paths += [p for p in sev_paths if p not in seen]
+
+    todo = len(store.missing(paths))
+    started = time.perf_counter()
+    _, features = store.extract(paths, backend.predict, batch_size=args.batch_size, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {features.shape[0]} embeddings in store {store.version} "
+          f"({todo} new in {elapsed:.1f}s" + (f", {todo / elapsed:.1f} img/s)" if todo else ")"))
+
+    if not args.skip_parity:
+        diff = check_parity(store, backend.predict, paths)
+        if diff > PARITY_ATOL:
+            sys.exit(f"❌ Stored embeddings differ from serving preprocessing (max |diff| {diff:.4f})")
+        print(f"✅ Serving preprocessing matches the store (max |diff| {diff:.2e})")
+
+
+if __name__ == "__main__":
+    main()
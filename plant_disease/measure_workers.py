@@ -0,0 +1,72 @@
+"""
+WORKER MEMORY MEASUREMENT
+✔ Starts N worker processes that each load the plant disease pipeline
+✔ Reports RSS, PSS and private memory per worker from /proc (Linux)
+✔ Compares the default loader with PLANT_MMAP=1 shared weights
+
+Usage:
+    PLANT_FEATURE_BACKEND=tflite python measure_workers.py --workers 4
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, sys, argparse
+import multiprocessing as mp
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+
+def worker(ready, done):
+    from plant_models import plant_models
+    plant_models.warm_up()
+    ready.put(os.getpid())
+    done.wait()
+
+
+def memory_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    fields["Private"] = fields.pop("Private_Clean", 0) + fields.pop("Private_Dirty", 0)
+    return fields
+
+
+def measure(n_workers, mmap_enabled):
+    os.environ["PLANT_MMAP"] = "1" if mmap_enabled else "0"
+    ctx = mp.get_context("spawn")
+    ready, done = ctx.Queue(), ctx.Event()
+
+    procs = [ctx.Process(target=worker, args=(ready, done)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    pids = [ready.get(timeout=600) for _ in procs]
+
+    stats = [memory_kb(pid) for pid in pids]
+    done.set()
+    for p in procs:
+        p.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker memory of the plant pipeline")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'workers':>7} {'RSS MB/worker':>14} {'PSS MB total':>13} {'private MB/worker':>18}")
+    for mmap_enabled in (False, True):
+        stats = measure(args.workers, mmap_enabled)
+        rss = sum(s["Rss"] for s in stats) / len(stats) / 1024
+        pss = sum(s["Pss"] for s in stats) / 1024
+        private = sum(s["Private"] for s in stats) / len(stats) / 1024
+        mode = "mmap" if mmap_enabled else "default"
+        print(f"{mode:<8} {args.workers:>7} {rss:>14.1f} {pss:>13.1f} {private:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
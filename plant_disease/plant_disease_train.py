@@ -3,12 +3,20 @@ UPGRADED HYBRID PLANT DISEASE DETECTION
 ✔ High accuracy
 ✔ Laptop safe
 ✔ CNN + SVM + Severity Regression
+✔ Parallel tf.data pipeline, optional pre-sharded TFRecords
+✔ Per-epoch throughput (images/sec)
+✔ SVM + severity trained from batched, stored embeddings (feature_store/)
+
+Usage:
+    python plant_disease_train.py                          # decode DATASET_DIR directly
+    python prepare_dataset.py --data plant_datas           # once
+    python plant_disease_train.py --prepared prepared      # train from TFRecords
 """
 
 # =========================
 # IMPORTS
 # =========================
-import os, json, warnings
+import os, sys, json, time, argparse, warnings
 warnings.filterwarnings("ignore")
 
 import tensorflow as tf
@@ -17,13 +25,16 @@ from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
 
 import numpy as np
-import pandas as pd
-import cv2
 import joblib
 
 from sklearn.svm import SVC
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plant_heads import SoftmaxHead
+from feature_store import FeatureStore, model_version
+from extract_features import FEATURE_STORE_DIR, DECODE_WORKERS, severity_images
 
 # =========================
 # CONFIG
@@ -41,34 +52,131 @@ SEED = 42
 
 AUTOTUNE = tf.data.AUTOTUNE
 
+CACHE_DIR = os.path.join(BASE_DIR, "tf_cache")
+SHUFFLE_BUFFER = 1000
+
+parser = argparse.ArgumentParser(description="Train the plant disease models")
+parser.add_argument("--prepared", help="Output folder of prepare_dataset.py (sharded TFRecords)")
+parser.add_argument("--cache", choices=["memory", "disk", "none"], default="disk",
+                    help="Cache decoded 224x224 images after the first epoch "
+                         "(delete tf_cache/ after changing the dataset)")
+args = parser.parse_args()
+
 # =========================
 # SAFETY CHECK
 # =========================
-if not os.path.exists(DATASET_DIR):
-    raise FileNotFoundError(f"Dataset not found: {DATASET_DIR}")
+data_dir = args.prepared or DATASET_DIR
+if not os.path.exists(data_dir):
+    raise FileNotFoundError(f"Dataset not found: {data_dir}")
+
+def cache(ds, name):
+    """Cache decoded uint8 images so later epochs skip decoding and resizing"""
+    if args.cache == "memory":
+        return ds.cache()
+    if args.cache == "disk":
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Older raw caches held float32 images, a new name keeps TF off them
+        source = "tfrecord" if args.prepared else "raw_uint8"
+        return ds.cache(os.path.join(CACHE_DIR, f"{source}_{name}"))
+    return ds
 
 # =========================
 # LOAD DATA
 # =========================
-train_ds = tf.keras.utils.image_dataset_from_directory(
-    DATASET_DIR,
-    validation_split=VAL_SPLIT,
-    subset="training",
-    seed=SEED,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE
-)
+if args.prepared:
+    with open(os.path.join(args.prepared, "dataset_meta.json")) as f:
+        meta = json.load(f)
+
+    class_names = meta["class_names"]
+
+    def split_files(split):
+        """Original image paths and labels of a prepared split"""
+        spec = {
+            "path": tf.io.FixedLenFeature([], tf.string),
+            "label": tf.io.FixedLenFeature([], tf.int64),
+        }
+        files = sorted(tf.io.gfile.glob(os.path.join(args.prepared, f"{split}-*.tfrecord")))
+        records = tf.data.TFRecordDataset(files).map(
+            lambda r: tf.io.parse_single_example(r, spec), num_parallel_calls=AUTOTUNE
+        )
+        paths, labels = [], []
+        for r in records.as_numpy_iterator():
+            paths.append(r["path"].decode())
+            labels.append(int(r["label"]))
+        return paths, labels
+
+    train_paths, train_labels = split_files("train")
+    class_counts = meta["splits"]["train"]["class_counts"]
+    n_train = meta["splits"]["train"]["images"]
+
+    feature_spec = {
+        "image": tf.io.FixedLenFeature([], tf.string),
+        "label": tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def parse_example(record):
+        example = tf.io.parse_single_example(record, feature_spec)
+        image = tf.reshape(tf.io.decode_raw(example["image"], tf.uint8), (*IMG_SIZE, 3))
+        return image, tf.cast(example["label"], tf.int32)
+
+    def load_split(split, training):
+        files = tf.data.Dataset.list_files(
+            os.path.join(args.prepared, f"{split}-*.tfrecord"), shuffle=training, seed=SEED
+        )
+        ds = files.interleave(
+            tf.data.TFRecordDataset,
+            cycle_length=AUTOTUNE,
+            num_parallel_calls=AUTOTUNE,
+            deterministic=not training
+        )
+        ds = cache(ds.map(parse_example, num_parallel_calls=AUTOTUNE), split)
+        if training:
+            ds = ds.shuffle(SHUFFLE_BUFFER, seed=SEED)
+        return ds.batch(BATCH_SIZE, num_parallel_calls=AUTOTUNE)
+
+    train_ds = load_split("train", training=True)
+    val_ds = load_split("val", training=False)
+else:
+    train_ds = tf.keras.utils.image_dataset_from_directory(
+        DATASET_DIR,
+        validation_split=VAL_SPLIT,
+        subset="training",
+        seed=SEED,
+        image_size=IMG_SIZE,
+        batch_size=BATCH_SIZE
+    )
+
+    val_ds = tf.keras.utils.image_dataset_from_directory(
+        DATASET_DIR,
+        validation_split=VAL_SPLIT,
+        subset="validation",
+        seed=SEED,
+        image_size=IMG_SIZE,
+        batch_size=BATCH_SIZE
+    )
+
+    class_names = train_ds.class_names
+    n_train = len(train_ds.file_paths)
+    train_paths = list(train_ds.file_paths)
+    train_labels = [class_names.index(os.path.basename(os.path.dirname(p))) for p in train_paths]
+
+    # image_dataset_from_directory yields float32 (4x the bytes of the
+    # pixels), so images are rounded back to uint8 before they are cached
+    def to_uint8(x, y):
+        return tf.saturate_cast(tf.round(x), tf.uint8), y
+
+    # Cache the decoded + resized images, the raw pipeline re-decodes every
+    # JPEG otherwise; reshuffle after the cache so epochs don't repeat order
+    train_ds = train_ds.unbatch().map(to_uint8, num_parallel_calls=AUTOTUNE)
+    train_ds = cache(train_ds, "train").shuffle(SHUFFLE_BUFFER, seed=SEED)
+    train_ds = train_ds.batch(BATCH_SIZE, num_parallel_calls=AUTOTUNE)
+    val_ds = cache(val_ds.map(to_uint8, num_parallel_calls=AUTOTUNE), "val")
+
+    class_counts = {
+        cls: len(os.listdir(os.path.join(DATASET_DIR, cls)))
+        for cls in class_names
+    }
 
-val_ds = tf.keras.utils.image_dataset_from_directory(
-    DATASET_DIR,
-    validation_split=VAL_SPLIT,
-    subset="validation",
-    seed=SEED,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE
-)
-
-class_names = train_ds.class_names
 num_classes = len(class_names)
 
 # Save class mapping
@@ -85,18 +193,18 @@ data_augmentation = tf.keras.Sequential([
     layers.RandomContrast(0.15),
 ])
 
-train_ds = train_ds.map(lambda x, y: (data_augmentation(x, training=True), y))
-train_ds = train_ds.map(lambda x, y: (preprocess_input(x), y)).prefetch(AUTOTUNE)
-val_ds = val_ds.map(lambda x, y: (preprocess_input(x), y)).prefetch(AUTOTUNE)
+train_ds = train_ds.map(
+    lambda x, y: (preprocess_input(data_augmentation(tf.cast(x, tf.float32), training=True)), y),
+    num_parallel_calls=AUTOTUNE
+).prefetch(AUTOTUNE)
+val_ds = val_ds.map(
+    lambda x, y: (preprocess_input(tf.cast(x, tf.float32)), y),
+    num_parallel_calls=AUTOTUNE
+).prefetch(AUTOTUNE)
 
 # =========================
 # CLASS WEIGHTS
 # =========================
-class_counts = {
-    cls: len(os.listdir(os.path.join(DATASET_DIR, cls)))
-    for cls in class_names
-}
-
 total = sum(class_counts.values())
 class_weights = {
     i: total / (class_counts[class_names[i]] + 1e-6)
@@ -105,6 +213,36 @@ class_weights = {
 
 print("✅ Class weights ready")
 
+# =========================
+# THROUGHPUT
+# =========================
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Training images/sec per epoch, excluding the validation pass"""
+
+    def __init__(self, n_images, stage):
+        super().__init__()
+        self.n_images = n_images
+        self.stage = stage
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.perf_counter()
+        self.last_batch_end = self.started
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.last_batch_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = self.last_batch_end - self.started
+        rate = self.n_images / seconds if seconds > 0 else 0.0
+        self.history.append(rate)
+        print(f"\n⏱️ {self.stage} epoch {epoch + 1}: {seconds:.1f}s, {rate:.1f} images/sec")
+
+    def summary(self):
+        if self.history:
+            print(f"⏱️ {self.stage}: first epoch {self.history[0]:.1f} images/sec, "
+                  f"mean of later epochs {np.mean(self.history[1:] or self.history):.1f} images/sec")
+
 # =========================
 # CNN MODEL
 # =========================
@@ -135,12 +273,15 @@ cnn_model.compile(
 # STAGE 1 TRAINING
 # =========================
 print("\n🔹 Stage 1: Training classifier head")
+stage1_speed = ThroughputCallback(n_train, "Stage 1")
 cnn_model.fit(
     train_ds,
     validation_data=val_ds,
     epochs=EPOCHS_STAGE1,
-    class_weight=class_weights
+    class_weight=class_weights,
+    callbacks=[stage1_speed]
 )
+stage1_speed.summary()
 
 # =========================
 # FINE-TUNING
@@ -156,11 +297,14 @@ cnn_model.compile(
 )
 
 print("\n🔹 Stage 2: Fine-tuning CNN")
+stage2_speed = ThroughputCallback(n_train, "Stage 2")
 cnn_model.fit(
     train_ds,
     validation_data=val_ds,
-    epochs=EPOCHS_STAGE2
+    epochs=EPOCHS_STAGE2,
+    callbacks=[stage2_speed]
 )
+stage2_speed.summary()
 
 # =========================
 # SAVE CNN
@@ -177,19 +321,23 @@ feature_extractor = models.Model(
 )
 
 # =========================
-# SVM TRAINING
+# FEATURE STORE
 # =========================
-X_feat, y_lab = [], []
+# Embeddings keyed by image path + CNN version; retraining the heads
+# later reuses them without running the CNN again
+feature_store = FeatureStore(FEATURE_STORE_DIR, model_version("plant_disease_classifier.h5"))
 
-for i, (images, labels) in enumerate(train_ds):
-    feats = feature_extractor.predict(images, verbose=0)
-    X_feat.append(feats)
-    y_lab.append(labels.numpy())
-    if i >= 150:
-        break
+def embed(batch):
+    return feature_extractor.predict(batch, batch_size=len(batch), verbose=0)
 
-X_feat = np.vstack(X_feat)
-y_lab = np.concatenate(y_lab)
+# =========================
+# SVM TRAINING
+# =========================
+# Whole training split, un-augmented, in large batches
+label_of = dict(zip(train_paths, train_labels))
+svm_paths, X_feat = feature_store.extract(train_paths, embed, batch_size=128, workers=DECODE_WORKERS)
+y_lab = np.array([label_of[p] for p in svm_paths])
+print(f"✅ {len(svm_paths)} training embeddings ready")
 
 scaler = StandardScaler()
 X_scaled = scaler.fit_transform(X_feat)
@@ -202,29 +350,27 @@ joblib.dump(scaler, "svm_scaler.pkl")
 print("✅ SVM MODEL SAVED")
 
 # =========================
-# SEVERITY REGRESSION
+# FAST SERVING HEADS
 # =========================
-if os.path.exists(SEVERITY_CSV):
-    df = pd.read_csv(SEVERITY_CSV)
-
-    X_reg, y_reg = [], []
-
-    for _, r in df.iterrows():
-        img_path = r["image_path"]
-        if not os.path.exists(img_path):
-            continue
+# Multinomial logistic regression gives calibrated probabilities from one
+# dot product per class, independent of the number of support vectors
+linear_head = LogisticRegression(max_iter=2000, C=1.0)
+linear_head.fit(X_scaled, y_lab)
+joblib.dump(linear_head, "linear_head.pkl")
 
-        img = cv2.imread(img_path)
-        img = cv2.resize(img, IMG_SIZE)
-        img = preprocess_input(img)
-        img = np.expand_dims(img, axis=0)
+# The CNN's own softmax head, BatchNorm folded in, for PLANT_HEAD=softmax
+SoftmaxHead.from_keras(cnn_model).save("softmax_head.npz")
+print("✅ LINEAR + SOFTMAX HEADS SAVED")
 
-        feat = feature_extractor.predict(img, verbose=0)[0]
-        X_reg.append(feat)
-        y_reg.append(float(r["severity"]))
+# =========================
+# SEVERITY REGRESSION
+# =========================
+sev_paths, sev_values = severity_images(SEVERITY_CSV)
 
-        if len(X_reg) >= 200:
-            break
+if sev_paths:
+    severity_of = dict(zip(sev_paths, sev_values))
+    sev_paths, X_reg = feature_store.extract(sev_paths, embed, batch_size=128, workers=DECODE_WORKERS)
+    y_reg = [severity_of[p] for p in sev_paths]
 
     if len(X_reg) >= 10:
         reg = LinearRegression()
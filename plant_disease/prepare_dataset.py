@@ -0,0 +1,142 @@
+"""
+DATASET PREPARATION
+✔ Decodes + resizes every image once (224x224 RGB uint8)
+✔ Parallel decoding with OpenCV threads
+✔ Sharded TFRecords split into train / val
+✔ dataset_meta.json with class names and counts for the training script
+
+Usage:
+    python prepare_dataset.py --data plant_datas --out prepared
+    python plant_disease_train.py --prepared prepared
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, json, time, random, argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = r"D:\final_project\backend\plant_disease\plant_datas"
+OUT_DIR = os.path.join(BASE_DIR, "prepared")
+META_FILE = "dataset_meta.json"
+
+IMG_SIZE = (224, 224)
+VAL_SPLIT = 0.2
+SEED = 42
+SHARD_SIZE = 1000
+DECODE_WORKERS = os.cpu_count() or 4
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def list_images(data_dir):
+    """(path, label) for a class-per-folder dataset, classes in sorted order"""
+    class_names = sorted(
+        d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))
+    )
+    items = []
+    for label, cls in enumerate(class_names):
+        folder = os.path.join(data_dir, cls)
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.join(folder, name), label))
+    return class_names, items
+
+
+def load_image(path):
+    """224x224 RGB uint8, or None if the file cannot be decoded"""
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    img = cv2.resize(img, IMG_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def serialize(img, label, path):
+    feature = {
+        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[img.tobytes()])),
+        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+        "path": tf.train.Feature(bytes_list=tf.train.BytesList(value=[path.encode()])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+
+def write_split(name, items, out_dir, pool):
+    """Write one split as <name>-NNNNN-of-NNNNN.tfrecord shards"""
+    n_shards = max(1, -(-len(items) // SHARD_SIZE))
+    written, skipped = 0, 0
+
+    for shard in range(n_shards):
+        chunk = items[shard * SHARD_SIZE:(shard + 1) * SHARD_SIZE]
+        path = os.path.join(out_dir, f"{name}-{shard:05d}-of-{n_shards:05d}.tfrecord")
+
+        with tf.io.TFRecordWriter(path) as writer:
+            images = pool.map(load_image, [p for p, _ in chunk])
+            for (img_path, label), img in zip(chunk, images):
+                if img is None:
+                    skipped += 1
+                    continue
+                writer.write(serialize(img, label, img_path))
+                written += 1
+
+        print(f"  {name}: shard {shard + 1}/{n_shards} ({written} images)")
+
+    return written, skipped, n_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the plant dataset to sharded TFRecords")
+    parser.add_argument("--data", default=DATASET_DIR, help="Class-per-folder dataset")
+    parser.add_argument("--out", default=OUT_DIR, help="Output folder")
+    parser.add_argument("--val-split", type=float, default=VAL_SPLIT)
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        raise FileNotFoundError(f"Dataset not found: {args.data}")
+    os.makedirs(args.out, exist_ok=True)
+
+    class_names, items = list_images(args.data)
+
+    # Shuffle once so every shard mixes classes, then split
+    random.Random(SEED).shuffle(items)
+    n_val = int(len(items) * args.val_split)
+    splits = {"train": items[n_val:], "val": items[:n_val]}
+
+    started = time.perf_counter()
+    meta = {
+        "class_names": class_names,
+        "img_size": list(IMG_SIZE),
+        "seed": SEED,
+        "splits": {}
+    }
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for name, split_items in splits.items():
+            written, skipped, n_shards = write_split(name, split_items, args.out, pool)
+            counts = np.bincount([l for _, l in split_items], minlength=len(class_names))
+            meta["splits"][name] = {
+                "images": written,
+                "skipped": skipped,
+                "shards": n_shards,
+                "class_counts": {c: int(n) for c, n in zip(class_names, counts)}
+            }
+
+    with open(os.path.join(args.out, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    elapsed = time.perf_counter() - started
+    total = sum(s["images"] for s in meta["splits"].values())
+    print(f"✅ {total} images prepared in {elapsed:.1f}s ({total / elapsed:.1f} img/s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+INCREMENTAL HEAD RETRAINING
+✔ Frozen CNN: only new or changed images are embedded (feature store)
+✔ Refits StandardScaler + SVM, the linear head and the severity regressor
+✔ Registered as a new plant registry version (registry/versions/<version>/),
+  CNN files carried over from the served version
+✔ Promoting switches registry/current.json, running servers hot-swap it
+
+Usage:
+    python retrain_heads.py --data plant_datas               # retrain + promote
+    python retrain_heads.py --data plant_datas --candidate   # retrain + shadow-score
+    python retrain_heads.py --data plant_datas --no-publish  # retrain only
+    python retrain_heads.py --publish 20261017-101500        # roll back / forward
+"""
+
+# =========================
+# IMPORTS
+# =========================
+import os, sys, json, time, argparse, tempfile, warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import joblib
+
+from sklearn.svm import SVC
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.model_selection import train_test_split
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+from feature_backends import CNN_FILE, TFLITE_FILE, ONNX_FILE, load_backend
+from plant_heads import SVM_FILE, SCALER_FILE, LINEAR_FILE, SOFTMAX_FILE, SEVERITY_FILE
+from plant_models import plant_registry
+from extract_features import (
+    DATASET_DIR, SEVERITY_CSV, FEATURE_STORE_DIR, BATCH_SIZE, DECODE_WORKERS,
+    dataset_images, severity_images, open_store
+)
+
+# =========================
+# CONFIG
+# =========================
+CLASS_INDICES_FILE = "class_indices.json"
+VAL_SPLIT = 0.2
+SEED = 42
+
+# Belong to the frozen CNN, carried over unchanged from the served version
+CARRIED_FILES = (CNN_FILE, TFLITE_FILE, ONNX_FILE, SOFTMAX_FILE, CLASS_INDICES_FILE)
+
+
+class LazyExtractor:
+    """Loads the CNN only if the store is missing some embeddings"""
+
+    def __init__(self, backend, model_dir):
+        self.backend_name = backend
+        self.model_dir = model_dir
+        self.backend = None
+
+    def __call__(self, batch):
+        if self.backend is None:
+            self.backend = load_backend(self.backend_name, self.model_dir)
+        return self.backend.predict(batch)
+
+
+def check_classes(class_names, model_dir):
+    """The CNN and knowledge base are fixed, so the class list must be too"""
+    with open(os.path.join(model_dir, CLASS_INDICES_FILE)) as f:
+        class_indices = json.load(f)
+    expected = sorted(class_indices, key=class_indices.get)
+    if class_names != expected:
+        added = sorted(set(class_names) - set(expected))
+        removed = sorted(set(expected) - set(class_names))
+        raise SystemExit(
+            f"Dataset classes differ from class_indices.json (added {added}, removed {removed}); "
+            "run plant_disease_train.py for a full retrain"
+        )
+
+
+def retrain(args):
+    # The served version's CNN embeds the images and is carried over
+    parent_dir, parent, _ = plant_registry.resolve(BASE_DIR)
+    print(f"🌿 Retraining heads on top of plant model {parent or 'base'}")
+
+    paths, labels, class_names = dataset_images(args.data)
+    check_classes(class_names, parent_dir)
+
+    store = open_store(args.store, cnn_path=os.path.join(parent_dir, CNN_FILE))
+    new = len(store.missing(paths))
+    extractor = LazyExtractor(args.backend, parent_dir)
+
+    started = time.perf_counter()
+    label_of = dict(zip(paths, labels))
+    paths, X = store.extract(paths, extractor, batch_size=BATCH_SIZE, workers=DECODE_WORKERS)
+    y = np.array([label_of[p] for p in paths])
+    print(f"🌿 {len(paths)} embeddings ({new} new) in {time.perf_counter() - started:.1f}s")
+
+    # =========================
+    # VALIDATION
+    # =========================
+    X_tr, X_val, y_tr, y_val = train_test_split(
+        X, y, test_size=args.val_split, random_state=SEED, stratify=y
+    )
+    scaler = StandardScaler().fit(X_tr)
+    svm = SVC(kernel="rbf", C=10, gamma="scale", probability=True)
+    svm.fit(scaler.transform(X_tr), y_tr)
+    val_acc = float((svm.predict(scaler.transform(X_val)) == y_val).mean())
+    print(f"✅ SVM validation accuracy: {val_acc:.4f}")
+
+    # =========================
+    # FINAL FIT ON ALL DATA
+    # =========================
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    svm = SVC(kernel="rbf", C=10, gamma="scale", probability=True)
+    svm.fit(X_scaled, y)
+
+    linear_head = LogisticRegression(max_iter=2000, C=1.0)
+    linear_head.fit(X_scaled, y)
+
+    reg = None
+    sev_paths, sev_values = severity_images(args.severity_csv)
+    if sev_paths:
+        severity_of = dict(zip(sev_paths, sev_values))
+        sev_paths, X_reg = store.extract(sev_paths, extractor, batch_size=BATCH_SIZE, workers=DECODE_WORKERS)
+        if len(sev_paths) >= 10:
+            reg = LinearRegression().fit(X_reg, [severity_of[p] for p in sev_paths])
+    print(f"✅ Heads refitted in {time.perf_counter() - started:.1f}s")
+
+    # =========================
+    # REGISTER VERSION
+    # =========================
+    with tempfile.TemporaryDirectory(dir=BASE_DIR) as staging:
+        heads = {SVM_FILE: svm, SCALER_FILE: scaler, LINEAR_FILE: linear_head}
+        if reg is not None:
+            heads[SEVERITY_FILE] = reg
+
+        files = {}
+        for name, model in heads.items():
+            files[name] = os.path.join(staging, name)
+            joblib.dump(model, files[name])
+        for name in CARRIED_FILES:
+            if os.path.exists(os.path.join(parent_dir, name)):
+                files[name] = os.path.join(parent_dir, name)
+
+        with open(os.path.join(parent_dir, CLASS_INDICES_FILE)) as f:
+            class_indices = json.load(f)
+
+        version = plant_registry.register(files, class_indices=class_indices, metadata={
+            "kind": "incremental_heads",
+            "feature_store": store.version,
+            "images": len(paths),
+            "new_images": new,
+            "severity_images": len(sev_paths) if reg is not None else 0,
+            "val_accuracy": round(val_acc, 4)
+        })
+
+    print(f"✅ Registered plant model {version}: {plant_registry.path(version)}")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally retrain the plant disease heads")
+    parser.add_argument("--data", default=DATASET_DIR, help="Class-per-folder dataset")
+    parser.add_argument("--severity-csv", default=SEVERITY_CSV)
+    parser.add_argument("--store", default=FEATURE_STORE_DIR)
+    parser.add_argument("--backend", default="keras", help="Feature backend for new images")
+    parser.add_argument("--val-split", type=float, default=VAL_SPLIT)
+    parser.add_argument("--no-publish", action="store_true", help="Register the version without serving it")
+    parser.add_argument("--candidate", action="store_true",
+                        help="Shadow-score the new version on live traffic instead of promoting it")
+    parser.add_argument("--publish", metavar="VERSION", help="Only promote an existing version")
+    args = parser.parse_args()
+
+    if args.publish:
+        version = args.publish
+    else:
+        if not os.path.exists(args.data):
+            raise FileNotFoundError(f"Dataset not found: {args.data}")
+        version = retrain(args)
+        if args.no_publish:
+            return
+        if args.candidate:
+            plant_registry.set_candidate(version)
+            print(f"👥 Shadow-scoring {version} at PLANT_SHADOW_RATE, see /api/plant/stats")
+            return
+
+    plant_registry.promote(version)
+    print(f"🚀 Promoted plant model {version}, servers swap within PLANT_MODELS_CHECK_INTERVAL seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Plant Disease Serving Heads
+Classifiers that turn 256-d `feature_layer` embeddings into class
+probabilities. Every head takes the raw (unscaled) features.
+
+    svm      StandardScaler + SVC(rbf, probability=True)  (svm_classifier.pkl)
+    linear   StandardScaler + multinomial LogisticRegression  (linear_head.pkl)
+    softmax  The CNN's own BatchNorm + Dense softmax head, folded into one
+             NumPy matmul  (softmax_head.npz)
+"""
+import os
+import joblib
+import numpy as np
+from typing import Optional
+
+HEADS = ("svm", "linear", "softmax")
+
+SVM_FILE = "svm_classifier.pkl"
+SCALER_FILE = "svm_scaler.pkl"
+LINEAR_FILE = "linear_head.pkl"
+SOFTMAX_FILE = "softmax_head.npz"
+SEVERITY_FILE = "severity_regressor.pkl"
+
+
+class SvmHead:
+    name = "svm"
+
+    def __init__(self, scaler, svm):
+        self.scaler = scaler
+        self.svm = svm
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return self.svm.predict_proba(self.scaler.transform(features))
+
+
+class LinearHead(SvmHead):
+    """Same contract as SvmHead, the cost is one dot product per class"""
+    name = "linear"
+
+
+class SoftmaxHead:
+    """
+    Dense softmax over the features. BatchNorm is folded into the dense
+    weights at export time so serving is a single affine map.
+    """
+    name = "softmax"
+
+    def __init__(self, kernel: np.ndarray, bias: np.ndarray):
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        logits = np.asarray(features, dtype=np.float32) @ self.kernel + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    @classmethod
+    def from_keras(cls, cnn_model, feature_layer: str = "feature_layer") -> "SoftmaxHead":
+        """Fold the layers that follow `feature_layer` into one kernel/bias"""
+        names = [layer.name for layer in cnn_model.layers]
+        start = names.index(feature_layer) + 1
+
+        dim = cnn_model.get_layer(feature_layer).output.shape[-1]
+        kernel = np.eye(dim, dtype=np.float64)
+        bias = np.zeros(dim, dtype=np.float64)
+
+        for layer in cnn_model.layers[start:]:
+            kind = type(layer).__name__
+            if kind == "BatchNormalization":
+                gamma, beta, mean, var = [w.astype(np.float64) for w in layer.get_weights()]
+                scale = gamma / np.sqrt(var + layer.epsilon)
+                kernel = kernel * scale
+                bias = (bias - mean) * scale + beta
+            elif kind == "Dense":
+                w, b = [w.astype(np.float64) for w in layer.get_weights()]
+                kernel = kernel @ w
+                bias = bias @ w + b
+            elif kind == "Dropout":
+                continue
+            else:
+                raise ValueError(f"Cannot fold layer {layer.name} ({kind}) into a softmax head")
+
+        return cls(kernel, bias)
+
+    def save(self, path: str):
+        np.savez(path, kernel=self.kernel, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "SoftmaxHead":
+        with np.load(path) as data:
+            return cls(data["kernel"], data["bias"])
+
+
+def load_head(name: str, model_dir: str, cnn_model=None, mmap_mode: Optional[str] = None):
+    """
+    Load a serving head by name.
+
+    Args:
+        name: One of HEADS
+        model_dir: Directory holding the head artifacts
+        cnn_model: Keras model, used to build the softmax head when
+            softmax_head.npz has not been exported
+        mmap_mode: Passed to joblib.load so the sklearn arrays (support
+            vectors, coefficients, scaler stats) are memory-mapped from
+            the .pkl and shared between worker processes
+    """
+    if name == "svm":
+        return SvmHead(
+            joblib.load(os.path.join(model_dir, SCALER_FILE), mmap_mode=mmap_mode),
+            joblib.load(os.path.join(model_dir, SVM_FILE), mmap_mode=mmap_mode)
+        )
+
+    if name == "linear":
+        return LinearHead(
+            joblib.load(os.path.join(model_dir, SCALER_FILE), mmap_mode=mmap_mode),
+            joblib.load(os.path.join(model_dir, LINEAR_FILE), mmap_mode=mmap_mode)
+        )
+
+    if name == "softmax":
+        path = os.path.join(model_dir, SOFTMAX_FILE)
+        if os.path.exists(path):
+            return SoftmaxHead.load(path)
+        if cnn_model is None:
+            raise FileNotFoundError(f"{path} not found and no CNN model to build it from")
+        return SoftmaxHead.from_keras(cnn_model)
+
+    raise ValueError(f"Unknown plant head: {name} (expected one of {', '.join(HEADS)})")
@@ -0,0 +1,275 @@
+"""
+Plant Disease Models
+Lazy, thread-safe loading of the plant disease pipeline (feature extractor,
+serving head, severity regressor, knowledge base). Nothing heavy is loaded
+until the first detection request or the warm-up hook asks for it.
+
+Models are served from the plant model registry (plant_disease/registry,
+see model_registry.py) when a version has been promoted, otherwise from the
+unversioned files in plant_disease/. Every process polls the registry
+pointer, loads a newly promoted version in the background (reusing the
+running feature extractor when its checksum is unchanged) and swaps it in.
+"""
+import os
+import json
+import time
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from plant_heads import SEVERITY_FILE, load_head
+from feature_store import preprocess_bgr
+from feature_backends import CNN_FILE, TFLITE_FILE, ONNX_FILE, load_backend
+from model_registry import LazyModel, ModelRegistry, ShadowScorer
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# PLANT DISEASE MODEL PATHS
+# =====================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "plant_disease")
+
+CNN_MODEL_PATH = os.path.join(MODEL_DIR, "plant_disease_classifier.h5")
+SVM_MODEL_PATH = os.path.join(MODEL_DIR, "svm_classifier.pkl")
+SCALER_PATH = os.path.join(MODEL_DIR, "svm_scaler.pkl")
+SEVERITY_MODEL_PATH = os.path.join(MODEL_DIR, SEVERITY_FILE)
+
+AGRI_KNOWLEDGE_PATH = os.path.join(MODEL_DIR, "agri_knowledge.json")
+CLASS_INDICES_PATH = os.path.join(MODEL_DIR, "class_indices.json")
+REGISTRY_DIR = os.path.join(MODEL_DIR, "registry")
+
+IMG_SIZE = (224, 224)
+CONF_THRESHOLD = 0.5
+
+# Classifier on top of feature_layer: svm | linear | softmax (see plant_heads.py)
+PLANT_HEAD = os.environ.get("PLANT_HEAD", "svm")
+
+# Runtime for the CNN feature extractor: keras | tflite | onnx (see feature_backends.py)
+FEATURE_BACKEND = os.environ.get("PLANT_FEATURE_BACKEND", "keras")
+FEATURE_THREADS = int(os.environ.get("PLANT_FEATURE_THREADS", 0)) or None
+
+# Shared-weights serving mode: sklearn arrays are memory-mapped from the
+# joblib files and the TFLite interpreter maps its model file, so every
+# worker process reads the same page-cache pages. Copy-on-write ("c")
+# rather than "r" because libsvm rejects read-only buffers; nothing writes
+# to them, so the pages stay shared.
+PLANT_MMAP = os.environ.get("PLANT_MMAP", "0") == "1"
+MMAP_MODE = "c" if PLANT_MMAP else None
+
+# Seconds between checks for a newly promoted version, 0 disables hot-swap
+MODELS_CHECK_INTERVAL = float(os.environ.get("PLANT_MODELS_CHECK_INTERVAL", 5))
+# Fraction of detections also scored by the registry's candidate version
+SHADOW_RATE = float(os.environ.get("PLANT_SHADOW_RATE", 0))
+
+BACKEND_FILES = {"keras": CNN_FILE, "tflite": TFLITE_FILE, "onnx": ONNX_FILE}
+
+# =====================================================
+# UTIL FUNCTIONS
+# =====================================================
+def preprocess_image(img):
+    # Decoded uploads are BGR; the CNN and the heads were trained on RGB
+    img = preprocess_bgr(img)
+    img = np.expand_dims(img, axis=0)
+    return img
+
+def severity_label(percent):
+    if percent >= 80:
+        return "High"
+    elif percent >= 60:
+        return "Moderate"
+    return "Low"
+
+@lru_cache(maxsize=1)
+def load_knowledge():
+    """Remedy/fertilizer knowledge base and class id -> name mapping"""
+    with open(AGRI_KNOWLEDGE_PATH) as f:
+        agri_knowledge = json.load(f)
+
+    with open(CLASS_INDICES_PATH) as f:
+        class_indices = json.load(f)
+
+    index_to_class = {v: k for k, v in class_indices.items()}
+    return agri_knowledge, index_to_class
+
+def build_result(probs, severity) -> Optional[Dict]:
+    """
+    Turn one image's class probabilities into the detection response.
+    Returns None when the confidence is below CONF_THRESHOLD.
+    """
+    agri_knowledge, index_to_class = load_knowledge()
+
+    class_id = int(np.argmax(probs))
+    confidence = float(probs[class_id])
+
+    if confidence < CONF_THRESHOLD:
+        return None
+
+    disease = index_to_class[class_id]
+    remedy = agri_knowledge[disease]["remedy"]
+    fertilizer = agri_knowledge[disease]["fertilizer"]
+
+    severity_percent = confidence * 100
+    if severity is not None:
+        severity_percent = severity
+
+    return {
+        "disease": disease.replace("___", " - "),
+        "severity": round(severity_percent, 1),
+        "severity_level": severity_label(severity_percent),
+        "fertilizer": fertilizer,
+        "remedy": remedy,
+        "confidence": round(confidence * 100, 2)
+    }
+
+# =====================================================
+# PIPELINE
+# =====================================================
+class PlantModels:
+    """The model half of a detection, loaded and swapped together"""
+
+    def __init__(self, feature_backend, head, severity_model, version=None, backend_checksum=None):
+        self.feature_backend = feature_backend
+        self.head = head
+        self.severity_model = severity_model
+        self.version = version  # registry version, None for the unversioned files
+        self.backend_checksum = backend_checksum
+
+    def predict_batch(self, images: List[np.ndarray]) -> List:
+        """
+        Run a list of preprocessed (224, 224, 3) images through the CNN and
+        the configured head in one forward pass. Returns one
+        (probs, severity_percent) per image, severity_percent is None when
+        no severity model is loaded.
+        """
+        batch = np.stack(images)
+
+        features = self.feature_backend.predict(batch)
+        probs = self.head.predict_proba(features)
+
+        severities = [None] * len(images)
+        if self.severity_model:
+            severities = [float(s) for s in self.severity_model.predict(features)]
+
+        return list(zip(probs, severities))
+
+
+plant_registry = ModelRegistry(REGISTRY_DIR, "plant")
+
+
+def check_class_indices(manifest: Dict):
+    """Responses are built from class_indices.json, so a version must match it"""
+    indices = manifest.get("class_indices")
+    if indices is None:
+        return
+    _, index_to_class = load_knowledge()
+    if indices != {name: i for i, name in index_to_class.items()}:
+        raise ValueError(
+            f"Plant model {manifest.get('version')} was trained with different class "
+            "indices than class_indices.json"
+        )
+
+
+def load_version(version: Optional[str] = None, previous: Optional[PlantModels] = None) -> PlantModels:
+    """
+    Load a registry version (default: the promoted one, or the unversioned
+    files). The feature extractor of `previous` is reused when the
+    manifest shows the same extractor file.
+    """
+    model_dir, version, manifest = plant_registry.resolve(MODEL_DIR, version)
+    check_class_indices(manifest)
+
+    backend_file = BACKEND_FILES.get(FEATURE_BACKEND)
+    checksum = manifest.get("files", {}).get(backend_file, {}).get("sha256")
+
+    if previous is not None and checksum is not None and checksum == previous.backend_checksum:
+        feature_backend = previous.feature_backend
+    else:
+        feature_backend = load_backend(FEATURE_BACKEND, model_dir, num_threads=FEATURE_THREADS)
+
+    head = load_head(
+        PLANT_HEAD, model_dir,
+        cnn_model=getattr(feature_backend, "cnn_model", None),
+        mmap_mode=MMAP_MODE
+    )
+
+    severity_model = None
+    severity_path = os.path.join(model_dir, SEVERITY_FILE)
+    if os.path.exists(severity_path):
+        severity_model = joblib.load(severity_path, mmap_mode=MMAP_MODE)
+
+    return PlantModels(feature_backend, head, severity_model, version, checksum)
+
+
+def load_plant_models() -> PlantModels:
+    logger.info("🌿 Loading plant disease models...")
+    started = time.monotonic()
+
+    if PLANT_MMAP and FEATURE_BACKEND == "keras":
+        logger.warning(
+            "PLANT_MMAP=1 with the keras backend: CNN weights are copied into "
+            "TensorFlow variables per worker, use PLANT_FEATURE_BACKEND=tflite to share them"
+        )
+
+    models = load_version()
+
+    logger.info(
+        f"✅ Plant disease models {models.version or 'base'} loaded "
+        f"({models.feature_backend.name} + {models.head.name}) in {time.monotonic() - started:.1f}s"
+    )
+    return models
+
+
+def reload_plant_models(models: PlantModels) -> PlantModels:
+    return load_version(previous=models)
+
+
+def warm_plant_models(models: PlantModels):
+    dummy = np.zeros((*IMG_SIZE, 3), dtype=np.float32)
+    models.predict_batch([dummy])
+
+
+plant_models = LazyModel(
+    load_plant_models,
+    reloader=reload_plant_models,
+    version_fn=plant_registry.current,
+    check_interval=MODELS_CHECK_INTERVAL,
+    warm_fn=warm_plant_models,
+    name="plant"
+)
+
+# =====================================================
+# SHADOW SCORING
+# =====================================================
+def load_candidate(version: str) -> PlantModels:
+    previous = plant_models.get() if plant_models.is_loaded() else None
+    return load_version(version, previous=previous)
+
+
+def compare_predictions(primary, shadow):
+    """Top-1 agreement and top-1 confidence difference per image"""
+    for (p_probs, _), (s_probs, _) in zip(primary, shadow):
+        yield int(np.argmax(p_probs)) == int(np.argmax(s_probs)), abs(float(np.max(p_probs)) - float(np.max(s_probs)))
+
+
+plant_shadow = ShadowScorer(
+    plant_registry,
+    load_fn=load_candidate,
+    predict_fn=lambda models, images: models.predict_batch(images),
+    compare_fn=compare_predictions,
+    sample_rate=SHADOW_RATE
+)
+
+# =====================================================
+# INFERENCE WORKER ENTRY POINTS
+# =====================================================
+def predict_batch_worker(images):
+    """Runs inside an InferenceExecutor process, which holds its own models"""
+    return plant_models.get().predict_batch(images)
+
+def warm_up_worker():
+    plant_models.warm_up()
+    return os.getpid()
@@ -0,0 +1,384 @@
+"""
+Plant Disease Routes
+Single and bulk leaf-image detection plus serving metrics. Models are
+loaded lazily through plant_models on the first request.
+"""
+import io
+import os
+import math
+import json
+import time
+import zipfile
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import cv2
+import numpy as np
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from inference_batcher import MicroBatcher, Overloaded
+from inference_executor import InferenceExecutor, InferenceTimeout, WorkerCrashed
+from upload_retention import UploadRetention
+from cache_store import make_store
+from prediction_cache import PredictionCache
+from feature_store import PREPROCESS_VERSION
+from plant_models import (
+    BASE_DIR, MODEL_DIR, PLANT_HEAD, FEATURE_BACKEND,
+    plant_models, plant_registry, plant_shadow,
+    preprocess_image, build_result, predict_batch_worker, warm_up_worker
+)
+
+logger = logging.getLogger(__name__)
+
+plant_bp = Blueprint("plant", __name__)
+
+# =====================================================
+# CONFIG
+# =====================================================
+UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
+
+# Optional retention of sampled uploads for retraining (off by default)
+RETAIN_SAMPLE_RATE = float(os.environ.get("PLANT_RETAIN_SAMPLE_RATE", 0))
+RETAIN_MAX_FILES = int(os.environ.get("PLANT_RETAIN_MAX_FILES", 1000))
+RETAIN_MAX_BYTES = int(float(os.environ.get("PLANT_RETAIN_MAX_MB", 500)) * 1024 * 1024)
+RETAIN_TTL_SECONDS = float(os.environ.get("PLANT_RETAIN_TTL_HOURS", 72)) * 3600
+
+# Micro-batching window for /api/plant/detect
+BATCH_MAX_SIZE = int(os.environ.get("PLANT_BATCH_MAX_SIZE", 16))
+BATCH_MAX_WAIT_MS = float(os.environ.get("PLANT_BATCH_MAX_WAIT_MS", 10))
+
+# Where inference runs: inline (batcher thread) | process (worker pool)
+EXECUTOR_MODE = os.environ.get("PLANT_EXECUTOR", "inline")
+EXECUTOR_WORKERS = int(os.environ.get("PLANT_EXECUTOR_WORKERS", 2))
+EXECUTOR_MAX_PENDING = int(os.environ.get("PLANT_EXECUTOR_MAX_PENDING", 4))
+
+# Backpressure: queued detections before answering 503, and per-request timeout
+MAX_QUEUE = int(os.environ.get("PLANT_MAX_QUEUE", 64))
+INFER_TIMEOUT = float(os.environ.get("PLANT_INFER_TIMEOUT", 30))
+RETRY_AFTER = float(os.environ.get("PLANT_RETRY_AFTER", 2))
+
+# Bulk uploads on /api/plant/detect/batch
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+MAX_BATCH_IMAGES = int(os.environ.get("PLANT_MAX_BATCH_IMAGES", 500))
+# Declared (uncompressed) size limit per zip member, guards against zip bombs
+MAX_ARCHIVE_MEMBER_BYTES = int(float(os.environ.get("PLANT_MAX_ARCHIVE_MEMBER_MB", 20)) * 1024 * 1024)
+BATCH_CHUNK_SIZE = int(os.environ.get("PLANT_BATCH_CHUNK_SIZE", 32))
+DECODE_WORKERS = int(os.environ.get("PLANT_DECODE_WORKERS", 4))
+
+# Prediction cache keyed by image content: memory | disk | off
+CACHE_BACKEND = os.environ.get("PLANT_CACHE", "memory")
+CACHE_KEY_MODE = os.environ.get("PLANT_CACHE_KEY", "exact")
+CACHE_MAX_ENTRIES = int(os.environ.get("PLANT_CACHE_MAX_ENTRIES", 2048))
+CACHE_TTL_SECONDS = float(os.environ.get("PLANT_CACHE_TTL_SECONDS", 24 * 3600))
+CACHE_PATH = os.environ.get("PLANT_CACHE_PATH", os.path.join(BASE_DIR, "plant_cache.sqlite3"))
+
+# =====================================================
+# UTIL FUNCTIONS
+# =====================================================
+def decode_image_bytes(data):
+    """Decode an encoded image held in memory, None if it is not an image"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+def detach_stream(storage):
+    """Take over an upload's (possibly disk-spooled) stream from the request"""
+    stream = storage.stream
+    storage.stream = io.BytesIO()
+    return stream
+
+def read_stream(stream):
+    stream.seek(0)
+    return stream.read()
+
+def close_streams(streams):
+    for stream in streams:
+        stream.close()
+
+def cache_lookup(img):
+    """Returns (cache_key, (probs, severity) or None)"""
+    if prediction_cache is None:
+        return None, None
+
+    key = prediction_cache.key_for(img)
+    cached = prediction_cache.get(key)
+    if cached is None:
+        return key, None
+    return key, (np.asarray(cached["probs"]), cached["severity"])
+
+def cache_store_result(key, probs, severity):
+    if prediction_cache is not None and key is not None:
+        prediction_cache.set(key, {
+            "probs": [float(p) for p in probs],
+            "severity": severity
+        })
+
+def load_batch_item(name, loader):
+    """
+    Decode one batch item. Returns None for invalid images, otherwise
+    (cache_key, cached_output, preprocessed) where exactly one of the last
+    two is set.
+    """
+    data = loader()
+    img = decode_image_bytes(data)
+    if img is None:
+        return None
+    upload_retention.maybe_keep(data, name)
+
+    key, cached = cache_lookup(img)
+    if cached is not None:
+        return key, cached, None
+    return key, None, preprocess_image(img)[0]
+
+def run_plant_batch(images):
+    started = time.perf_counter()
+    if plant_executor is not None:
+        # Waiting for a free worker slot pushes backpressure onto the batcher queue
+        results = plant_executor.run(images, wait=INFER_TIMEOUT)
+    else:
+        results = plant_models.get().predict_batch(images)
+
+    # Candidate version scores a sample in the background, never on this
+    # thread; in process mode it would load TensorFlow in the server process
+    if plant_executor is None:
+        plant_shadow.offer(images, results, (time.perf_counter() - started) * 1000)
+    return results
+
+def inference_state():
+    """Model readiness of whichever side runs inference"""
+    if plant_executor is not None:
+        return plant_executor.state()
+    return plant_models.state()
+
+def start_warm_up():
+    if plant_executor is not None:
+        return plant_executor.start_warm_up()
+    return plant_models.start_warm_up()
+
+def unavailable(message, retry_after=RETRY_AFTER):
+    response = jsonify({"error": message})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+upload_retention = UploadRetention(
+    UPLOAD_FOLDER,
+    sample_rate=RETAIN_SAMPLE_RATE,
+    max_files=RETAIN_MAX_FILES,
+    max_bytes=RETAIN_MAX_BYTES,
+    ttl_seconds=RETAIN_TTL_SECONDS
+)
+
+prediction_cache = None
+if CACHE_BACKEND != "off":
+    prediction_cache = PredictionCache(
+        make_store(CACHE_BACKEND, CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS),
+        MODEL_DIR,
+        key_mode=CACHE_KEY_MODE,
+        namespace=f"{PLANT_HEAD}-{PREPROCESS_VERSION}",
+        version_fn=lambda: plant_models.version
+    )
+
+decode_pool = ThreadPoolExecutor(
+    max_workers=DECODE_WORKERS,
+    thread_name_prefix="plant-decode"
+)
+
+plant_executor = None
+if EXECUTOR_MODE == "process":
+    plant_executor = InferenceExecutor(
+        predict_batch_worker,
+        workers=EXECUTOR_WORKERS,
+        max_pending=EXECUTOR_MAX_PENDING,
+        timeout=INFER_TIMEOUT,
+        warm_up_fn=warm_up_worker,
+        retry_after=RETRY_AFTER
+    )
+    if plant_shadow.sample_rate > 0:
+        logger.warning("⚠️ PLANT_SHADOW_RATE is ignored with PLANT_EXECUTOR=process")
+
+plant_batcher = MicroBatcher(
+    run_plant_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    name="plant-detect",
+    max_queue=MAX_QUEUE,
+    retry_after=RETRY_AFTER,
+    # One batch in flight per pool slot keeps every worker process busy
+    workers=EXECUTOR_MAX_PENDING if plant_executor is not None else 1
+)
+
+# =====================================================
+# PLANT DISEASE DETECTION API
+# =====================================================
+@plant_bp.route("/plant/detect", methods=["POST"])
+def detect_plant_disease():
+    try:
+        if "image" not in request.files:
+            return jsonify({"error": "No image uploaded"}), 400
+
+        file = request.files["image"]
+        data = file.read()
+
+        img = decode_image_bytes(data)
+        if img is None:
+            return jsonify({"error": "Invalid image"}), 400
+
+        upload_retention.maybe_keep(data, file.filename)
+
+        key, cached = cache_lookup(img)
+        if cached is not None:
+            probs, severity = cached
+        else:
+            img_input = preprocess_image(img)
+
+            # Feature extraction + SVM, batched with concurrent requests
+            probs, severity = plant_batcher.predict(img_input[0], timeout=INFER_TIMEOUT)
+            cache_store_result(key, probs, severity)
+
+        response = build_result(probs, severity)
+        if response is None:
+            return jsonify({"error": "Leaf not detected clearly"}), 400
+
+        return jsonify(response)
+
+    except Overloaded as e:
+        logger.warning("Plant disease detection rejected, inference queue full")
+        return unavailable("Server busy, please retry", e.retry_after)
+
+    except (FutureTimeout, InferenceTimeout):
+        logger.warning("Plant disease detection timed out")
+        return unavailable("Detection timed out, please retry")
+
+    except WorkerCrashed:
+        logger.warning("Plant disease detection lost its inference worker")
+        return unavailable("Inference worker restarted, please retry")
+
+    except Exception as e:
+        logger.exception("Plant disease detection error")
+        return jsonify({"error": str(e)}), 500
+
+# =====================================================
+# PLANT DISEASE BATCH DETECTION API
+# =====================================================
+@plant_bp.route("/plant/detect/batch", methods=["POST"])
+def detect_plant_disease_batch():
+    """
+    Accepts many images as multipart `images` fields or one zip `archive`.
+    Results are streamed back as NDJSON, one line per image in upload
+    order, followed by a summary line.
+    """
+    uploads = request.files.getlist("images")
+    archive = request.files.get("archive")
+
+    if not uploads and archive is None:
+        return jsonify({"error": "No images uploaded"}), 400
+
+    # The response is streamed after the request context is torn down, which
+    # closes request.files, so the upload streams are detached first
+    streams = [detach_stream(f) for f in uploads]
+
+    # (filename, loader) pairs, the bytes are only read when the chunk is decoded
+    items = [(f.filename, partial(read_stream, st)) for f, st in zip(uploads, streams)]
+
+    zf = None
+    if archive is not None:
+        streams.append(detach_stream(archive))
+        try:
+            zf = zipfile.ZipFile(streams[-1])
+        except zipfile.BadZipFile:
+            close_streams(streams)
+            return jsonify({"error": "Invalid zip archive"}), 400
+
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            # zf.read never inflates past the declared size, so checking it is enough
+            if info.file_size > MAX_ARCHIVE_MEMBER_BYTES:
+                zf.close()
+                close_streams(streams)
+                return jsonify({
+                    "error": f"{info.filename} is larger than {MAX_ARCHIVE_MEMBER_BYTES // (1024 * 1024)} MB uncompressed"
+                }), 400
+            items.append((info.filename, partial(zf.read, info.filename)))
+
+    if len(items) > MAX_BATCH_IMAGES:
+        if zf is not None:
+            zf.close()
+        close_streams(streams)
+        return jsonify({"error": f"At most {MAX_BATCH_IMAGES} images per batch"}), 400
+
+    def generate():
+        succeeded = 0
+
+        def fill(line, probs, severity):
+            nonlocal succeeded
+            result = build_result(probs, severity)
+            if result is None:
+                line["error"] = "Leaf not detected clearly"
+            else:
+                line.update(result)
+                succeeded += 1
+
+        try:
+            for start in range(0, len(items), BATCH_CHUNK_SIZE):
+                chunk = items[start:start + BATCH_CHUNK_SIZE]
+                futures = [decode_pool.submit(load_batch_item, name, loader) for name, loader in chunk]
+
+                pending, lines = [], []
+                for offset, ((name, _), future) in enumerate(zip(chunk, futures)):
+                    line = {"index": start + offset, "filename": name}
+                    try:
+                        loaded = future.result()
+                    except Exception as e:
+                        loaded = None
+                        logger.warning(f"Batch item {name} failed to load: {e}")
+
+                    if loaded is None:
+                        line["error"] = "Invalid image"
+                    elif loaded[1] is not None:
+                        fill(line, *loaded[1])
+                    else:
+                        pending.append((line, loaded[0], loaded[2]))
+                    lines.append(line)
+
+                if pending:
+                    outputs = run_plant_batch([img for _, _, img in pending])
+                    for (line, key, _), (probs, severity) in zip(pending, outputs):
+                        cache_store_result(key, probs, severity)
+                        fill(line, probs, severity)
+
+                for line in lines:
+                    yield json.dumps(line) + "\n"
+
+            yield json.dumps({"done": True, "total": len(items), "succeeded": succeeded}) + "\n"
+
+        except Exception as e:
+            logger.exception("Plant disease batch detection error")
+            yield json.dumps({"done": False, "error": str(e)}) + "\n"
+        finally:
+            if zf is not None:
+                zf.close()
+            close_streams(streams)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# =====================================================
+# PLANT INFERENCE METRICS
+# =====================================================
+@plant_bp.route("/plant/stats", methods=["GET"])
+def plant_stats():
+    return jsonify({
+        "feature_backend": FEATURE_BACKEND,
+        "head": PLANT_HEAD,
+        "executor": EXECUTOR_MODE,
+        "models": inference_state(),
+        "registry": plant_registry.info(),
+        "shadow": plant_shadow.stats(),
+        "batcher": plant_batcher.stats(),
+        "workers": plant_executor.stats() if plant_executor else None,
+        "retention": upload_retention.stats(),
+        "cache": prediction_cache.stats() if prediction_cache else None
+    })
@@ -1,9 +1,14 @@
 import os
+import time
 import numpy as np
 import joblib
-import requests
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from model_registry import LazyModel, ModelRegistry, ShadowScorer
+from weather_api import get_current_weather, get_weather_forecast, fetch_forecast
+from forecast_stats import aggregate_daily
+from weather_cache import daily_cache, rain_cache
+from compiled_forest import CompiledForest, compiled_prefix
 
 # ==================================================
 # 📁 PATH CONFIG
@@ -11,41 +16,184 @@ from flask import Blueprint, request, jsonify
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, "models")
 
-RF_MODEL_PATH = os.path.join(MODEL_DIR, "rain_rf.pkl")
+# rf (random forest) or hgb (histogram gradient boosting), see train.py --model
+RAIN_MODEL = os.environ.get("RAIN_MODEL", "rf")
+RF_MODEL_PATH = os.path.join(MODEL_DIR, f"rain_{RAIN_MODEL}.pkl")
 SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
 CITY_ENCODER_PATH = os.path.join(MODEL_DIR, "city_encoder.pkl")
 
-# ==================================================
-# 🔑 API KEY
-# ==================================================
-API_KEY = "1b09d0bfc92c612b9635e2482831ddc9"
+# Serve the memory-mapped NumPy export of the forest when one sits next to
+# the pickle (python compiled_forest.py models/rain_rf.pkl --check)
+USE_COMPILED = os.environ.get("RAIN_COMPILED", "1") == "1"
+
+# Promoted versions in models/registry replace the files above (see model_registry.py)
+REGISTRY_DIR = os.path.join(MODEL_DIR, "registry")
+MODELS_CHECK_INTERVAL = float(os.environ.get("RAIN_MODELS_CHECK_INTERVAL", 5))
+SHADOW_RATE = float(os.environ.get("RAIN_SHADOW_RATE", 0))
+
+# Bulk predictions: concurrent upstream weather fetches, one model call
+BULK_MAX_ITEMS = int(os.environ.get("RAIN_BULK_MAX_ITEMS", 100))
+BULK_WORKERS = int(os.environ.get("RAIN_BULK_WORKERS", 16))
 
 # ==================================================
-# 🌐 BLUEPRINT
+# 🤖 LOAD ML MODELS
 # ==================================================
-weather_bp = Blueprint("weather", __name__)
+class RainModels:
+    """Rain classifier, scaler and city encoder of one model version"""
+
+    def __init__(self, classifier, scaler, city_encoder, version=None):
+        self.classifier = classifier
+        self.scaler = scaler
+        self.city_encoder = city_encoder
+        self.version = version
+
+    def predict_proba(self, X):
+        """Rain probability (0-1) per feature row"""
+        return self.classifier.predict_proba(self.scaler.transform(X))[:, 1]
+
+
+rain_registry = ModelRegistry(REGISTRY_DIR, "rain")
+
+def load_classifier(model_dir):
+    model_path = os.path.join(model_dir, os.path.basename(RF_MODEL_PATH))
+    prefix = compiled_prefix(model_path)
+    if USE_COMPILED and CompiledForest.exists(prefix):
+        return CompiledForest.load(prefix)
+    return joblib.load(model_path)
+
+def load_rain_models(version=None):
+    model_dir, version, _ = rain_registry.resolve(MODEL_DIR, version)
+    try:
+        models = RainModels(
+            load_classifier(model_dir),
+            joblib.load(os.path.join(model_dir, os.path.basename(SCALER_PATH))),
+            joblib.load(os.path.join(model_dir, os.path.basename(CITY_ENCODER_PATH))),
+            version
+        )
+    except Exception as e:
+        print("❌ Failed to load ML models:", e)
+        raise
+    kind = "compiled" if isinstance(models.classifier, CompiledForest) else "pickled"
+    print(f"✅ Rainfall ML models {version or 'base'} loaded successfully ({kind} {RAIN_MODEL})")
+    return models
+
+def compare_rain(primary, shadow):
+    """Same rain / no-rain call at 0.5, and probability difference"""
+    for p, s in zip(primary, shadow):
+        yield (p >= 0.5) == (s >= 0.5), abs(float(p) - float(s))
+
+# Loaded on first prediction, hot-swapped when a new version is promoted
+rain_models = LazyModel(
+    load_rain_models,
+    reloader=lambda models: load_rain_models(),
+    version_fn=rain_registry.current,
+    check_interval=MODELS_CHECK_INTERVAL,
+    name="rain"
+)
+
+rain_shadow = ShadowScorer(
+    rain_registry,
+    load_fn=load_rain_models,
+    predict_fn=lambda models, X: models.predict_proba(X),
+    compare_fn=compare_rain,
+    sample_rate=SHADOW_RATE
+)
 
 # ==================================================
-# 🤖 LOAD ML MODELS
+# 🧮 FEATURES (same columns and order as train.py)
 # ==================================================
-rf_model = None
-scaler = None
-city_encoder = None
-
-try:
-    rf_model = joblib.load(RF_MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    city_encoder = joblib.load(CITY_ENCODER_PATH)
-    print("✅ Rainfall ML models loaded successfully")
-except Exception as e:
-    print("❌ Failed to load ML models:", e)
+FEATURES = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "dew_point_2m",
+    "precipitation",
+    "rain",
+    "surface_pressure",
+    "cloud_cover",
+    "cloud_cover_low",
+    "wind_speed_10m",
+    "wind_direction_10m",
+    "rain_intensity",
+    "hour",
+    "day",
+    "month",
+    "dayofweek",
+    "is_weekend",
+    "city"
+]
+
+def build_features(weather_data, city_encoder=None):
+    """One feature row per get_current_weather() dict, as a (n, 17) matrix"""
+    rows = weather_data if isinstance(weather_data, list) else [weather_data]
+    if city_encoder is None:
+        city_encoder = rain_models.get().city_encoder
+    city_codes = {c: i for i, c in enumerate(city_encoder.classes_)}
+
+    X = np.empty((len(rows), len(FEATURES)), dtype=np.float32)
+    for i, w in enumerate(rows):
+        # Local time at the location, as in the training data
+        local = datetime.fromtimestamp(w["timestamp"], timezone.utc) + timedelta(seconds=w.get("timezone", 0))
+        precipitation = w.get("precipitation", 0.0)
+        X[i] = (
+            w["temperature_2m"],
+            w["relative_humidity_2m"],
+            w["dew_point_2m"],
+            precipitation,
+            w.get("rain", 0.0),
+            w["surface_pressure"],
+            w["cloud_cover"],
+            w["cloud_cover_low"],
+            w["wind_speed_10m"],
+            w["wind_direction_10m"],
+            precipitation * w["cloud_cover"] * (w["relative_humidity_2m"] / 100),
+            local.hour,
+            local.day,
+            local.month,
+            local.weekday(),
+            int(local.weekday() >= 5),
+            # Cities outside the training set share the first code
+            city_codes.get(w.get("city"), 0)
+        )
+    return X
+
+def rain_alert(prob):
+    return (
+        "🌧 Heavy Rain Expected" if prob > 70 else
+        "🌦 Moderate Rain Possible" if prob > 40 else
+        "🌤 No Rain Expected"
+    )
+
+def predict_weather_batch(weather_rows):
+    """Rain result per get_current_weather() dict, all rows in one model call"""
+    models = rain_models.get()
+    X = build_features(weather_rows, models.city_encoder)
+
+    started = time.perf_counter()
+    probs = models.predict_proba(X)
+    rain_shadow.offer(X, probs, (time.perf_counter() - started) * 1000)
+
+    results = []
+    for weather_data, p in zip(weather_rows, probs):
+        prob = float(p) * 100
+        results.append({
+            "success": True,
+            "city": weather_data["city"],
+            "rain_probability": round(prob, 1),
+            "alert": rain_alert(prob)
+        })
+    return results
 
 # ==================================================
 # 🌧 WEATHER PREDICTION API
 # ==================================================
-@weather_bp.route("/api/weather/predict", methods=["POST"])
 def predict_rainfall(lat, lon):
     try:
+        # --- precomputed by the pre-warm job for this grid cell ---
+        if rain_cache is not None:
+            cached = rain_cache.peek(lat, lon)
+            if cached and cached["model_version"] == rain_models.version:
+                return cached["result"]
+
         # --- weather API call ---
         weather_data = get_current_weather(lat=lat, lon=lon)
         if not weather_data:
@@ -54,24 +202,7 @@ def predict_rainfall(lat, lon):
                 "error": "Weather API failed"
             }
 
-        # --- build feature vector ---
-        X = build_features(weather_data)   # your feature logic here
-        X_scaled = scaler.transform(X)
-
-        prob = model.predict(X_scaled)[0][0] * 100
-
-        alert = (
-            "🌧 Heavy Rain Expected" if prob > 70 else
-            "🌦 Moderate Rain Possible" if prob > 40 else
-            "🌤 No Rain Expected"
-        )
-
-        return {
-            "success": True,
-            "city": weather_data["city"],
-            "rain_probability": round(prob, 1),
-            "alert": alert
-        }
+        return predict_weather_batch([weather_data])[0]
 
     except Exception as e:
         return {
@@ -79,50 +210,79 @@ def predict_rainfall(lat, lon):
             "error": str(e)
         }
 
-# ==================================================
-# 📅 7-DAY FORECAST API
-# ==================================================
-@weather_bp.route("/api/weather/forecast", methods=["POST"])
-def forecast_weather():
-    try:
-        data = request.json
-        lat = data.get("lat")
-        lon = data.get("lon")
+def fetch_location_weather(item):
+    """get_current_weather() for one {"lat", "lon"} or {"city"} bulk item"""
+    if not isinstance(item, dict):
+        raise ValueError("Each location must be an object")
+    if item.get("lat") is not None and item.get("lon") is not None:
+        return get_current_weather(lat=float(item["lat"]), lon=float(item["lon"]))
+    if item.get("city"):
+        return get_current_weather(city_name=str(item["city"]))
+    raise ValueError("lat/lon or city required")
 
-        forecast_url = (
-            f"https://api.openweathermap.org/data/2.5/forecast"
-            f"?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-        )
+def fetch_location_forecast(item):
+    """Forecast payload for one bulk item, None if it could not be fetched"""
+    if item.get("lat") is not None and item.get("lon") is not None:
+        return get_weather_forecast(lat=float(item["lat"]), lon=float(item["lon"]))
+    return get_weather_forecast(city_name=str(item["city"]))
 
-        res = requests.get(forecast_url, timeout=5).json()
-        forecast_list = res["list"]
+def predict_rainfall_bulk(locations, include_forecast=False):
+    """
+    Rain predictions for many locations: weather is fetched concurrently,
+    then every row goes through scaler + model in a single call. With
+    include_forecast, each result also gets its daily forecast, all
+    payloads aggregated in one columnar pass.
 
-        daily = {}
+    Returns one result per location in input order; a failed lookup only
+    fails its own item.
+    """
+    results = [None] * len(locations)
+    fetched = []
 
-        for item in forecast_list:
-            date = item["dt_txt"].split(" ")[0]
+    def fetch(i):
+        try:
+            weather_data = fetch_location_weather(locations[i])
+            if not weather_data:
+                return i, None, None, "Weather API failed"
+            forecast = fetch_location_forecast(locations[i]) if include_forecast else None
+            return i, weather_data, forecast, None
+        except (TypeError, ValueError) as e:
+            return i, None, None, str(e)
 
-            if date not in daily:
-                daily[date] = {
-                    "temp": [],
-                    "humidity": [],
-                    "icon": item["weather"][0]["icon"]
-                }
+    workers = max(1, min(BULK_WORKERS, len(locations)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, weather_data, forecast, error in pool.map(fetch, range(len(locations))):
+            if error:
+                results[i] = {"success": False, "error": error}
+            else:
+                fetched.append((i, weather_data, forecast))
 
-            daily[date]["temp"].append(item["main"]["temp"])
-            daily[date]["humidity"].append(item["main"]["humidity"])
+    if fetched:
+        predictions = predict_weather_batch([w for _, w, _ in fetched])
+        for (i, _, _), result in zip(fetched, predictions):
+            results[i] = result
 
-        forecast = []
-        for date, values in list(daily.items())[:7]:
-            forecast.append({
-                "day": datetime.strptime(date, "%Y-%m-%d").strftime("%A"),
-                "temp": round(sum(values["temp"]) / len(values["temp"]), 1),
-                "humidity": int(sum(values["humidity"]) / len(values["humidity"])),
-                "icon": f"https://openweathermap.org/img/wn/{values['icon']}@2x.png"
-            })
+    if include_forecast:
+        with_forecast = [(i, f) for i, _, f in fetched if f]
+        for (i, _), daily in zip(with_forecast, aggregate_daily([f for _, f in with_forecast])):
+            results[i]["forecast"] = daily
+        for i, _, f in fetched:
+            results[i].setdefault("forecast", None)
 
-        return jsonify(forecast)
+    for item, result in zip(locations, results):
+        if isinstance(item, dict):
+            result["input"] = {k: item[k] for k in ("lat", "lon", "city") if k in item}
+    return results
 
-    except Exception as e:
-        print("❌ Forecast error:", e)
-        return jsonify({"error": "Forecast failed"}), 500
+# ==================================================
+# 📅 7-DAY FORECAST API
+# ==================================================
+def daily_forecast(payload, days=7):
+    """Daily min/max/mean temperature, humidity, rain total and chance of one forecast payload"""
+    return aggregate_daily([payload], days)[0]
+
+def daily_forecast_for(lat, lon):
+    """Aggregated daily forecast, cached per grid cell (and pre-warmed)"""
+    if daily_cache is None:
+        return daily_forecast(fetch_forecast(lat, lon))
+    return daily_cache.get(lat, lon, lambda la, lo: daily_forecast(fetch_forecast(la, lo)))
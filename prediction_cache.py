@@ -0,0 +1,144 @@
+"""
+Prediction Cache Module
+Caches plant disease predictions keyed by a hash of the decoded image,
+invalidated whenever the model files or the served registry version change
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_EXTENSIONS = (".h5", ".pkl", ".json", ".tflite", ".onnx", ".npy")
+
+
+def pixel_hash(img: np.ndarray) -> str:
+    """Exact hash of the decoded pixels and their shape"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(img.shape).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def perceptual_hash(img: np.ndarray) -> str:
+    """
+    64-bit difference hash (dHash). Re-encoded or resized copies of the
+    same photo usually map to the same key.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def files_fingerprint(model_dir: str, extensions: Iterable[str] = MODEL_EXTENSIONS) -> str:
+    """Hash of name, size and mtime of every model file in `model_dir`"""
+    h = hashlib.blake2b(digest_size=8)
+    if os.path.isdir(model_dir):
+        for name in sorted(os.listdir(model_dir)):
+            if not name.endswith(tuple(extensions)):
+                continue
+            st = os.stat(os.path.join(model_dir, name))
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    Prediction cache in front of the plant disease pipeline.
+
+    Args:
+        store: MemoryStore or SqliteStore from cache_store
+        model_dir: Directory whose model files version the cache
+        key_mode: 'exact' (pixel hash) or 'phash' (perceptual hash)
+        namespace: Kept apart from other namespaces, e.g. the serving head
+        check_interval: Seconds between model file fingerprint checks
+        version_fn: Returns the model version in memory, part of the fingerprint
+    """
+
+    def __init__(self, store, model_dir: str, key_mode: str = "exact", namespace: str = "",
+                 check_interval: float = 5.0, version_fn: Optional[Callable[[], Optional[str]]] = None):
+        if key_mode not in ("exact", "phash"):
+            raise ValueError(f"Unknown cache key mode: {key_mode}")
+
+        self.store = store
+        self.model_dir = model_dir
+        self.key_mode = key_mode
+        self.namespace = namespace
+        self.check_interval = check_interval
+        self.version_fn = version_fn
+
+        self._lock = threading.Lock()
+        self._fingerprint = self._compute_fingerprint()
+        self._checked_at = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def key_for(self, img: np.ndarray) -> str:
+        digest = perceptual_hash(img) if self.key_mode == "phash" else pixel_hash(img)
+        # The model fingerprint is part of the key so workers sharing a disk
+        # store never serve results from a different model version
+        return f"{self._current_fingerprint()}:{self.namespace}:{self.key_mode}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.store.get(key)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any):
+        self.store.set(key, value)
+
+    def invalidate(self):
+        self.store.clear()
+        with self._lock:
+            self._invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": type(self.store).__name__,
+                "namespace": self.namespace,
+                "key_mode": self.key_mode,
+                "entries": len(self.store),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "model_fingerprint": self._fingerprint
+            }
+
+    def _compute_fingerprint(self) -> str:
+        fingerprint = files_fingerprint(self.model_dir)
+        if self.version_fn is not None:
+            fingerprint = f"{fingerprint}-{self.version_fn() or 'base'}"
+        return fingerprint
+
+    def _current_fingerprint(self) -> str:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._fingerprint
+
+        fingerprint = self._compute_fingerprint()
+        changed = False
+        with self._lock:
+            self._checked_at = now
+            if fingerprint != self._fingerprint:
+                self._fingerprint = fingerprint
+                changed = True
+
+        if changed:
+            logger.info("Plant model files or version changed, clearing prediction cache")
+            self.invalidate()
+        return fingerprint
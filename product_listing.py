@@ -0,0 +1,362 @@
+"""
+Product Listing Module
+Paginated, filtered marketplace queries shared by the product routes.
+
+The list view never returns the base64 `image`; each item carries a
+`thumbnail` URL instead, served from a small JPEG that is generated once
+per product and stored next to the original. Pages use keyset cursors
+(last sort value + _id) rather than skip/offset, so every page is one
+index range scan however deep the buyer scrolls.
+
+Query parameters:
+    limit       page size (default PRODUCTS_PAGE_SIZE, max PRODUCTS_MAX_PAGE_SIZE)
+    cursor      `next_cursor` of the previous page
+    q           name search, every term must start a word of the name
+    category, location, farmerId    exact matches
+    min_price, max_price            inclusive price range
+    sort        newest (default), price_asc or price_desc
+"""
+import os
+import re
+import json
+import base64
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from flask import Response, jsonify
+from bson.binary import Binary
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = int(os.environ.get("PRODUCTS_PAGE_SIZE", 24))
+MAX_PAGE_SIZE = int(os.environ.get("PRODUCTS_MAX_PAGE_SIZE", 100))
+THUMBNAIL_SIZE = int(os.environ.get("PRODUCTS_THUMBNAIL_SIZE", 320))
+THUMBNAIL_QUALITY = int(os.environ.get("PRODUCTS_THUMBNAIL_QUALITY", 80))
+THUMBNAIL_MAX_AGE = int(os.environ.get("PRODUCTS_THUMBNAIL_MAX_AGE", 86400))
+MAX_SEARCH_TERMS = 5
+
+# Heavy fields the list view leaves out
+LIST_PROJECTION = {"image": 0, "thumbnail": 0}
+
+# sort name -> (field, direction); _id breaks ties in the same direction
+SORTS = {
+    "newest": ("_id", DESCENDING),
+    "price_asc": ("price", ASCENDING),
+    "price_desc": ("price", DESCENDING),
+}
+
+FILTER_FIELDS = ("category", "location", "farmerId")
+
+# BSON sort order of the price types a product can hold; MongoDB compares
+# only within one type, so a cursor has to step across them explicitly
+TYPE_BRACKETS = ("null", "number", "string")
+
+
+class ListingError(ValueError):
+    """Bad query parameters, reported to the client as a 400"""
+
+
+# =====================================================
+# PARAMETERS
+# =====================================================
+def parse_price(value, required: bool = False) -> Optional[float]:
+    """'45' / '45.5' / 45 -> float, None when empty and not required"""
+    if value is None or value == "":
+        if required:
+            raise ListingError("price is required")
+        return None
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ListingError(f"Invalid price: {value!r}")
+    if required and not (price >= 0 and price != float("inf")):
+        raise ListingError(f"Invalid price: {value!r}")
+    return price
+
+
+def name_keywords(name) -> List[str]:
+    """Lowercased words of a product name, indexed for the `q` search"""
+    return str(name or "").lower().split()
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        # Older documents keep the farmer as a plain string
+        return value
+
+
+def build_filter(args) -> Dict:
+    """Mongo filter from the request query string"""
+    query = {}
+    terms = name_keywords(args.get("q"))[:MAX_SEARCH_TERMS]
+    if terms:
+        # Anchored, case-sensitive prefixes on lowercased words use the index
+        query["$and"] = [{"name_keywords": re.compile("^" + re.escape(t))} for t in terms]
+
+    for field in FILTER_FIELDS:
+        value = (args.get(field) or "").strip()
+        if value:
+            query[field] = _object_id(value) if field == "farmerId" else value
+
+    min_price = parse_price(args.get("min_price"))
+    max_price = parse_price(args.get("max_price"))
+    if min_price is not None or max_price is not None:
+        price = {}
+        if min_price is not None:
+            price["$gte"] = min_price
+        if max_price is not None:
+            price["$lte"] = max_price
+        query["price"] = price
+    return query
+
+
+def page_size(value) -> int:
+    if value is None or value == "":
+        return PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ListingError(f"Invalid limit: {value!r}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+# =====================================================
+# CURSORS
+# =====================================================
+def encode_cursor(sort: str, doc: Dict) -> str:
+    field = SORTS[sort][0]
+    payload = [sort, str(doc["_id"]), doc.get(field) if field != "_id" else None]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[ObjectId, object]:
+    """(last _id, last sort value) of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, last_id, last_value = json.loads(raw)
+        last_id = ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId):
+        raise ListingError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ListingError("Cursor was issued for a different sort")
+    return last_id, last_value
+
+
+def _bracket(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return 2
+    raise ListingError("Invalid cursor")
+
+
+def _bracket_filter(field: str, bracket: int) -> Dict:
+    # {field: None} also matches documents without the field, which sort as null
+    return {field: None} if bracket == 0 else {field: {"$type": TYPE_BRACKETS[bracket]}}
+
+
+def after_cursor(sort: str, last_id: ObjectId, last_value) -> Dict:
+    """Filter for the documents that follow (last_value, last_id)"""
+    field, direction = SORTS[sort]
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if field == "_id":
+        return {"_id": {op: last_id}}
+
+    bracket = _bracket(last_value)
+    conditions = [{field: last_value, "_id": {op: last_id}}]
+    if bracket:
+        conditions.append({field: {op: last_value}})
+    # Older prices that are missing or not numeric sort before / after the numbers
+    later = range(bracket + 1, len(TYPE_BRACKETS)) if direction == ASCENDING else range(bracket)
+    conditions.extend(_bracket_filter(field, b) for b in later)
+    return {"$or": conditions}
+
+
+# =====================================================
+# LIST
+# =====================================================
+def serialize(doc: Dict, thumbnail_url: str) -> Dict:
+    doc["_id"] = str(doc["_id"])
+    if doc.get("farmerId") is not None:
+        doc["farmerId"] = str(doc["farmerId"])
+    doc.pop("name_keywords", None)
+    doc["thumbnail"] = thumbnail_url.format(id=doc["_id"])
+    return doc
+
+
+def list_products(collection, args, thumbnail_url: str = "/api/products/{id}/thumbnail") -> Dict:
+    """
+    One page of products for the marketplace.
+
+    Args:
+        collection: Products collection
+        args: Request query string (request.args)
+        thumbnail_url: Thumbnail route of the calling blueprint, `{id}` is
+            replaced by the product id
+
+    Returns:
+        {"items": [...], "next_cursor": str or None, "limit": n}
+    """
+    sort = args.get("sort") or "newest"
+    if sort not in SORTS:
+        raise ListingError(f"Unknown sort: {sort!r}, expected one of {', '.join(SORTS)}")
+    limit = page_size(args.get("limit"))
+
+    query = build_filter(args)
+    if args.get("cursor"):
+        query = {"$and": [query, after_cursor(sort, *decode_cursor(args["cursor"], sort))]}
+
+    field, direction = SORTS[sort]
+    order = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    # One extra document tells whether another page exists
+    docs = list(collection.find(query, LIST_PROJECTION).sort(order).limit(limit + 1))
+
+    next_cursor = encode_cursor(sort, docs[limit - 1]) if len(docs) > limit else None
+    return {
+        "items": [serialize(doc, thumbnail_url) for doc in docs[:limit]],
+        "next_cursor": next_cursor,
+        "limit": limit
+    }
+
+
+# =====================================================
+# THUMBNAILS
+# =====================================================
+def decode_image(image: str) -> Optional[np.ndarray]:
+    """Base64 image or data URL -> BGR array, None when undecodable"""
+    if not image:
+        return None
+    if image.startswith("data:"):
+        image = image.split(",", 1)[-1]
+    try:
+        raw = base64.b64decode(image)
+    except (ValueError, TypeError):
+        return None
+    return cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def make_thumbnail(image: str, size: int = THUMBNAIL_SIZE, quality: int = THUMBNAIL_QUALITY) -> Optional[bytes]:
+    """JPEG no larger than size x size, None when the image is undecodable"""
+    img = decode_image(image)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    scale = size / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
+
+
+def thumbnail_fields(image: str) -> Dict:
+    """Extra fields to store with a new or re-uploaded image"""
+    thumb = make_thumbnail(image)
+    return {"thumbnail": Binary(thumb)} if thumb else {}
+
+
+def get_thumbnail(collection, product_id: str) -> Optional[Tuple[bytes, str]]:
+    """
+    (JPEG bytes, ETag) of a product thumbnail, generated and stored on
+    first request for products added before thumbnails existed. None when
+    the product or its image is missing.
+    """
+    try:
+        oid = ObjectId(product_id)
+    except (InvalidId, TypeError):
+        return None
+
+    doc = collection.find_one({"_id": oid}, {"thumbnail": 1})
+    if doc is None:
+        return None
+    thumb = doc.get("thumbnail")
+
+    if thumb is None:
+        doc = collection.find_one({"_id": oid}, {"image": 1})
+        thumb = make_thumbnail(doc.get("image")) if doc else None
+        if thumb is None:
+            return None
+        collection.update_one({"_id": oid}, {"$set": {"thumbnail": Binary(thumb)}})
+
+    thumb = bytes(thumb)
+    return thumb, hashlib.md5(thumb).hexdigest()
+
+
+def thumbnail_response(collection, product_id: str, request):
+    """JPEG response with an ETag, 304 when the browser's copy is current"""
+    thumb = get_thumbnail(collection, product_id)
+    if thumb is None:
+        return jsonify({"error": "Thumbnail not found"}), 404
+
+    body, etag = thumb
+    response = Response(body, mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    return response.make_conditional(request)
+
+
+# =====================================================
+# INDEXES
+# =====================================================
+def ensure_product_indexes(collection) -> List[str]:
+    """
+    Indexes for list_products: both sorts alone, under an equality filter
+    on category, location or farmerId, and under category + location, plus
+    name search. Other combinations (e.g. farmerId + category) use the
+    closest index and filter the rest. Also a one-off conversion of prices
+    stored as strings to numbers and of missing name keywords. Safe to run
+    on every start.
+    """
+    try:
+        collection.update_many(
+            {"price": {"$type": "string"}},
+            [{"$set": {"price": {"$convert": {
+                "input": "$price", "to": "double", "onError": "$price", "onNull": "$price"
+            }}}}]
+        )
+        collection.update_many(
+            {"name_keywords": {"$exists": False}, "name": {"$type": "string"}},
+            [{"$set": {"name_keywords": {"$filter": {
+                "input": {"$split": [{"$toLower": "$name"}, " "]},
+                "cond": {"$ne": ["$$this", ""]}
+            }}}}]
+        )
+
+        by_id, by_price = ("_id", DESCENDING), [("price", ASCENDING), ("_id", ASCENDING)]
+        names = [
+            collection.create_index(by_price),
+            collection.create_index([("name_keywords", ASCENDING), by_id]),
+        ]
+        for fields in (["category"], ["location"], ["farmerId"], ["category", "location"]):
+            keys = [(f, ASCENDING) for f in fields]
+            names.append(collection.create_index(keys + [by_id]))
+            names.append(collection.create_index(keys + by_price))
+        logger.info(f"🗂️ Product indexes ready on {collection.full_name}: {', '.join(names)}")
+        return names
+    except PyMongoError as e:
+        # Serve without indexes rather than fail to start when Mongo is down
+        logger.warning(f"⚠️ Could not create product indexes on {collection.full_name}: {e}")
+        return []
+
+
+def start_index_build(*collections) -> threading.Thread:
+    """ensure_product_indexes in the background, so startup never waits on Mongo"""
+    def build():
+        for collection in collections:
+            ensure_product_indexes(collection)
+
+    thread = threading.Thread(target=build, name="product-indexes", daemon=True)
+    thread.start()
+    return thread
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from pymongo import MongoClient
 from bson.objectid import ObjectId
+from product_listing import (
+    ListingError, list_products, thumbnail_response, thumbnail_fields, parse_price, name_keywords
+)
 
 # ================= DB CONNECTION =================
 client = MongoClient("mongodb://localhost:27017/")
@@ -17,14 +20,21 @@ products_bp = Blueprint("products", __name__)
 def add_product():
     data = request.json
 
+    try:
+        price = parse_price(data.get("price"), required=True)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     product = {
         "name": data.get("name"),
-        "price": data.get("price"),
+        "name_keywords": name_keywords(data.get("name")),
+        "price": price,
         "quantity": data.get("quantity"),
         "category": data.get("category"),
         "location": data.get("location"),
         "image": data.get("image"),
-        "farmerId": ObjectId(data.get("farmerId"))  # 🔑 LOGIN BASED
+        "farmerId": ObjectId(data.get("farmerId")),  # 🔑 LOGIN BASED
+        **thumbnail_fields(data.get("image"))
     }
 
     products_col.insert_one(product)
@@ -36,14 +46,20 @@ def add_product():
 # =================================================
 @products_bp.route("/api/products", methods=["GET"])
 def get_all_products():
-    products = []
+    # ?limit=&cursor=&q=&category=&location=&min_price=&max_price=&farmerId=&sort=
+    try:
+        page = list_products(products_col, request.args, thumbnail_url=request.path + "/{id}/thumbnail")
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page), 200
 
-    for p in products_col.find():
-        p["_id"] = str(p["_id"])
-        p["farmerId"] = str(p["farmerId"])
-        products.append(p)
 
-    return jsonify(products), 200
+# =================================================
+# 🖼️ PRODUCT THUMBNAIL (list view images)
+# =================================================
+@products_bp.route("/api/products/<product_id>/thumbnail", methods=["GET"])
+def get_product_thumbnail(product_id):
+    return thumbnail_response(products_col, product_id, request)
 
 
 # =================================================
@@ -53,7 +69,8 @@ def get_all_products():
 def get_farmer_products(farmer_id):
     products = list(
         products_col.find(
-            {"farmerId": ObjectId(farmer_id)}
+            {"farmerId": ObjectId(farmer_id)},
+            {"thumbnail": 0, "name_keywords": 0}
         )
     )
 
@@ -71,11 +88,17 @@ def get_farmer_products(farmer_id):
 def update_product(product_id):
     data = request.json
 
+    try:
+        price = parse_price(data.get("price"), required=True)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     products_col.update_one(
         {"_id": ObjectId(product_id)},
         {"$set": {
             "name": data.get("name"),
-            "price": data.get("price"),
+            "name_keywords": name_keywords(data.get("name")),
+            "price": price,
             "quantity": data.get("quantity"),
             "category": data.get("category"),
             "location": data.get("location"),
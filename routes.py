@@ -1,11 +1,32 @@
+import threading
 from flask import Blueprint, request, jsonify
-from weather.predict import predict_rainfall
+from weather.predict import (
+    predict_rainfall, predict_rainfall_bulk, BULK_MAX_ITEMS,
+    rain_models, rain_registry, rain_shadow, predict_weather_batch, daily_forecast_for
+)
+from forecast_stats import aggregate_daily
+from weather_client import get_client
+from weather_cache import cache_stats
+from weather_api import get_coordinates
+from geocoder import get_index
+from weather_prewarm import PREWARM_ENABLED, PrewarmScheduler
 import logging
 
 weather_bp = Blueprint("weather", __name__)
 logger = logging.getLogger(__name__)
 
-@weather_bp.route("/api/weather/predict", methods=["POST"])
+prewarm_scheduler = PrewarmScheduler(
+    predict_fn=predict_weather_batch,
+    aggregate_fn=aggregate_daily,
+    version_fn=lambda: rain_models.version
+)
+
+def start_prewarm(enabled=None):
+    """Start the dawn pre-warm scheduler (default WEATHER_PREWARM)"""
+    if PREWARM_ENABLED if enabled is None else enabled:
+        prewarm_scheduler.start()
+
+@weather_bp.route("/weather/predict", methods=["POST"])
 def weather_predict():
     try:
         data = request.get_json(silent=True)
@@ -29,9 +50,130 @@ def weather_predict():
         # ✅ result is a dict → safe
         return jsonify(result), 200
 
-    except Exception as e:
+    except Exception:
         logger.exception("Weather route error")
         return jsonify({
             "success": False,
             "error": "Internal server error"
         }), 200
+
+@weather_bp.route("/weather/forecast", methods=["POST"])
+def weather_forecast():
+    """Body: {"lat": 11.0, "lon": 76.9}; daily forecast from the grid-cell cache"""
+    try:
+        data = request.get_json(silent=True) or {}
+        lat, lon = data.get("lat"), data.get("lon")
+        if lat is None or lon is None:
+            return jsonify({
+                "success": False,
+                "error": "lat and lon are required"
+            }), 400
+
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "lat and lon must be numbers"
+            }), 400
+
+        forecast = daily_forecast_for(lat, lon)
+        return jsonify({"success": True, "forecast": forecast}), 200
+
+    except Exception:
+        logger.exception("Forecast route error")
+        return jsonify({
+            "success": False,
+            "error": "Forecast failed"
+        }), 500
+
+@weather_bp.route("/weather/predict/bulk", methods=["POST"])
+def weather_predict_bulk():
+    """
+    Body: {"locations": [{"lat": 11.0, "lon": 76.9}, {"city": "Madurai"}, ...],
+           "forecast": true}   (optional, adds the daily forecast per location)
+    Results come back in the same order, each with its own success flag.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        locations = data.get("locations")
+
+        if not isinstance(locations, list) or not locations:
+            return jsonify({
+                "success": False,
+                "error": "locations must be a non-empty list"
+            }), 400
+
+        if len(locations) > BULK_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {BULK_MAX_ITEMS} locations per request"
+            }), 400
+
+        results = predict_rainfall_bulk(locations, include_forecast=bool(data.get("forecast")))
+        failed = sum(1 for r in results if not r["success"])
+
+        return jsonify({
+            "success": failed < len(results),
+            "count": len(results),
+            "failed": failed,
+            "model_version": rain_models.version,
+            "results": results
+        }), 200
+
+    except Exception:
+        logger.exception("Bulk weather route error")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 200
+
+@weather_bp.route("/weather/geocode", methods=["GET"])
+def weather_geocode():
+    """?q=Madurai[&state=Tamil Nadu] for coordinates, ?lat=..&lon=.. for the nearest known place"""
+    try:
+        name = request.args.get("q")
+        if name:
+            place = get_coordinates(name, request.args.get("state", ""))
+            if not place:
+                return jsonify({"success": False, "error": "Place not found"}), 404
+            return jsonify({"success": True, "place": place}), 200
+
+        lat, lon = request.args.get("lat", type=float), request.args.get("lon", type=float)
+        if lat is None or lon is None:
+            return jsonify({
+                "success": False,
+                "error": "q or lat/lon required"
+            }), 400
+
+        found = get_index().nearest(lat, lon)
+        if not found:
+            return jsonify({"success": False, "error": "Place not found"}), 404
+        place, distance_km = found
+        return jsonify({"success": True, "place": place, "distance_km": distance_km}), 200
+
+    except Exception:
+        logger.exception("Geocode route error")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+@weather_bp.route("/weather/prewarm", methods=["GET", "POST"])
+def weather_prewarm():
+    """GET: schedule and last run. POST: pre-warm now, in the background"""
+    if request.method == "POST":
+        threading.Thread(target=prewarm_scheduler.run_once, name="weather-prewarm-now", daemon=True).start()
+        return jsonify({"success": True, "started": True}), 202
+    return jsonify(prewarm_scheduler.stats())
+
+@weather_bp.route("/weather/models", methods=["GET"])
+def weather_models():
+    return jsonify({
+        "models": rain_models.state(),
+        "registry": rain_registry.info(),
+        "shadow": rain_shadow.stats(),
+        "upstream": get_client().stats(),
+        "cache": cache_stats(),
+        "geocoder": get_index().stats()
+    })
@@ -1,7 +1,9 @@
 import "./Marketplace.css";
 import { useCart } from "../context/CartContext";
 import { useNavigate } from "react-router-dom";
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
+
+const API = "http://localhost:5000";
 
 // ---------- COMPONENT ----------
 const Marketplace = () => {
@@ -9,31 +11,48 @@ const Marketplace = () => {
   const navigate = useNavigate();
 
   const [products, setProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [search, setSearch] = useState("");
   const [category, setCategory] = useState("All");
   const [sort, setSort] = useState("");
+  const [query, setQuery] = useState("");
+  // Bumped whenever the filters change so a late page for old filters is dropped
+  const requestId = useRef(0);
 
-  // ---------- FETCH PRODUCTS ----------
-  useEffect(() => {
-    fetch("http://localhost:5000/api/products")
+  // ---------- FETCH PRODUCTS (one page, filtered & sorted by the server) ----------
+  const fetchProducts = (cursor = null) => {
+    const params = new URLSearchParams();
+    if (query) params.set("q", query);
+    if (category !== "All") params.set("category", category);
+    if (sort === "low") params.set("sort", "price_asc");
+    if (sort === "high") params.set("sort", "price_desc");
+    if (cursor) params.set("cursor", cursor);
+    const id = requestId.current;
+
+    fetch(`${API}/api/products?${params}`)
       .then(res => res.json())
-      .then(data => setProducts(data))
+      .then(data => {
+        if (id !== requestId.current) return;
+        // List items carry a thumbnail URL instead of the full image
+        const page = data.items.map(p => ({ ...p, image: API + p.thumbnail }));
+        setProducts(prev => (cursor ? [...prev, ...page] : page));
+        setNextCursor(data.next_cursor);
+      })
       .catch(err => console.error(err));
-  }, []);
+  };
+
+  // ---------- SEARCH (debounced, matched by the server across the catalog) ----------
+  useEffect(() => {
+    const timer = setTimeout(() => setQuery(search.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [search]);
 
-  // ---------- FILTER LOGIC ----------
-  const filteredProducts = products
-    .filter(p =>
-      p.name.toLowerCase().includes(search.toLowerCase())
-    )
-    .filter(p =>
-      category === "All" || p.category === category
-    )
-    .sort((a, b) => {
-      if (sort === "low") return a.price - b.price;
-      if (sort === "high") return b.price - a.price;
-      return 0;
-    });
+  useEffect(() => {
+    requestId.current += 1;
+    setProducts([]);
+    setNextCursor(null);
+    fetchProducts();
+  }, [query, category, sort]);
 
   return (
     <div className="marketplace-page">
@@ -71,7 +90,7 @@ const Marketplace = () => {
 
       {/* PRODUCT GRID */}
       <div className="product-grid">
-        {filteredProducts.map(item => (
+        {products.map(item => (
           <div key={item._id} className="product-card">
             <img src={item.image} alt={item.name} />
             <div className="product-info">
@@ -95,6 +114,14 @@ const Marketplace = () => {
           </div>
         ))}
       </div>
+
+      {nextCursor && (
+        <div className="product-actions">
+          <button onClick={() => fetchProducts(nextCursor)}>
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -2,18 +2,36 @@
 ADVANCED WEATHER RAIN PREDICTION – HIGH ACCURACY
 Target: rain_tomorrow
 Model: Optimized Random Forest (Rain-focused)
+       or Histogram Gradient Boosting (small + fast)
+
+Usage:
+    python train.py                                   # random forest, as before
+    python train.py --compact --model both            # float32/category load, compare RF vs HGB
+    python train.py --compact --chunksize 200000 --model hgb
+
+Serve the HGB model with RAIN_MODEL=hgb (predict.py loads rain_<model>.pkl).
+The random forest is also exported as rain_rf_compiled.* (see compiled_forest.py),
+which predict.py serves instead of the pickle unless RAIN_COMPILED=0.
 """
 
 import os
+import io
+import time
+import json
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 import joblib
 
 from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compiled_forest import CompiledForest, compiled_prefix
+
 # =============================
 # PATH CONFIG
 # =============================
@@ -24,17 +42,81 @@ DATASET_PATH = os.path.join(BASE_DIR, "dataset", "tamilnadu_weather.csv")
 MODEL_DIR = os.path.join(BASE_DIR, "models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# =============================
+# OPTIONS
+# =============================
+parser = argparse.ArgumentParser(description="Train the rain_tomorrow model")
+parser.add_argument("--model", choices=["rf", "hgb", "both"], default="rf",
+                    help="rf: random forest, hgb: histogram gradient boosting")
+parser.add_argument("--compact", action="store_true",
+                    help="Read the CSV with float32 / category dtypes")
+parser.add_argument("--chunksize", type=int, default=0,
+                    help="Read the CSV in chunks of this many rows (implies --compact)")
+parser.add_argument("--rf-trees", type=int, default=500)
+parser.add_argument("--rf-depth", type=int, default=25)
+parser.add_argument("--latency-rows", type=int, default=200,
+                    help="Single-row predictions timed per model")
+args = parser.parse_args()
+
 # =============================
 # LOAD DATA
 # =============================
-df = pd.read_csv(DATASET_PATH)
-print("✅ Dataset Loaded:", df.shape)
+# Raw columns; everything except time/city is numeric
+NUMERIC_COLUMNS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "dew_point_2m",
+    "precipitation",
+    "rain",
+    "surface_pressure",
+    "cloud_cover",
+    "cloud_cover_low",
+    "wind_speed_10m",
+    "wind_direction_10m",
+]
+
+
+def compact_dtypes(columns):
+    dtypes = {c: "float32" for c in NUMERIC_COLUMNS if c in columns}
+    if "city" in columns:
+        dtypes["city"] = "category"
+    if "rain_tomorrow" in columns:
+        # Nullable, so missing targets survive read_csv and reach the ffill
+        dtypes["rain_tomorrow"] = "Int8"
+    return dtypes
+
+
+def read_dataset(path):
+    if not (args.compact or args.chunksize):
+        return pd.read_csv(path)
+
+    dtypes = compact_dtypes(pd.read_csv(path, nrows=0).columns)
+    if not args.chunksize:
+        return pd.read_csv(path, dtype=dtypes)
+
+    chunks = []
+    for chunk in pd.read_csv(path, dtype=dtypes, chunksize=args.chunksize):
+        chunks.append(chunk)
+        print(f"  read {sum(len(c) for c in chunks)} rows")
+    # Chunks carry different city categories; unify them on concat
+    df = pd.concat(chunks, ignore_index=True)
+    if "city" in df:
+        df["city"] = df["city"].astype(str).astype("category")
+    return df
+
+
+started = time.perf_counter()
+df = read_dataset(DATASET_PATH)
+print("✅ Dataset Loaded:", df.shape,
+      f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s)")
 
 # =============================
 # CLEANING
 # =============================
 df.drop_duplicates(inplace=True)
 df.ffill(inplace=True)
+if df["rain_tomorrow"].dtype == "Int8":
+    df["rain_tomorrow"] = df["rain_tomorrow"].astype("int8")
 
 # =============================
 # TIME FEATURE ENGINEERING
@@ -60,7 +142,7 @@ df["rain_intensity"] = (
 # CITY ENCODING
 # =============================
 city_encoder = LabelEncoder()
-df["city"] = city_encoder.fit_transform(df["city"])
+df["city"] = city_encoder.fit_transform(df["city"].astype(str))
 
 joblib.dump(city_encoder, os.path.join(MODEL_DIR, "city_encoder.pkl"))
 
@@ -92,8 +174,12 @@ TARGET = "rain_tomorrow"
 X = df[FEATURES]
 y = df[TARGET]
 
+if args.compact or args.chunksize:
+    X = X.to_numpy(dtype=np.float32)
+    y = y.to_numpy()
+
 print("\n☔ Rain Tomorrow Distribution")
-print(y.value_counts(normalize=True))
+print(pd.Series(y).value_counts(normalize=True))
 
 # =============================
 # TRAIN TEST SPLIT
@@ -115,36 +201,125 @@ X_test = scaler.transform(X_test)
 joblib.dump(scaler, os.path.join(MODEL_DIR, "scaler.pkl"))
 
 # =============================
-# RANDOM FOREST (RAIN-FOCUSED)
+# MODELS
 # =============================
-rf_model = RandomForestClassifier(
-    n_estimators=500,
-    max_depth=25,
-    min_samples_split=4,
-    min_samples_leaf=2,
-    max_features="sqrt",
-    class_weight={0: 1, 1: 3},   # 🔥 prioritize rain detection
-    random_state=42,
-    n_jobs=-1
-)
+def build_rf():
+    # RANDOM FOREST (RAIN-FOCUSED)
+    return RandomForestClassifier(
+        n_estimators=args.rf_trees,
+        max_depth=args.rf_depth,
+        min_samples_split=4,
+        min_samples_leaf=2,
+        max_features="sqrt",
+        class_weight={0: 1, 1: 3},   # 🔥 prioritize rain detection
+        random_state=42,
+        n_jobs=-1
+    )
 
-rf_model.fit(X_train, y_train)
 
-# =============================
-# EVALUATION
-# =============================
-probs = rf_model.predict_proba(X_test)[:, 1]
+def build_hgb():
+    # Binned features + shallow boosted trees: a fraction of the forest's
+    # size and per-row cost
+    return HistGradientBoostingClassifier(
+        max_iter=300,
+        learning_rate=0.08,
+        max_leaf_nodes=31,
+        min_samples_leaf=40,
+        l2_regularization=1.0,
+        class_weight={0: 1, 1: 3},
+        early_stopping=True,
+        random_state=42
+    )
+
+
+MODELS = {"rf": build_rf, "hgb": build_hgb}
+selected = ["rf", "hgb"] if args.model == "both" else [args.model]
 
 # Lower threshold → detect rain better
 THRESHOLD = 0.45
-preds = (probs >= THRESHOLD).astype(int)
 
-print("\n🌧️ RANDOM FOREST PERFORMANCE (RAIN-OPTIMIZED)")
-print("Accuracy:", accuracy_score(y_test, preds))
-print("ROC AUC:", roc_auc_score(y_test, probs))
-print(classification_report(y_test, preds))
 
-joblib.dump(rf_model, os.path.join(MODEL_DIR, "rain_rf.pkl"))
+def serving_report(name, model):
+    """Pickle size, load time and single-row latency as predict.py would see them"""
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    size_mb = buf.tell() / 1e6
+
+    load_times = []
+    for _ in range(3):
+        buf.seek(0)
+        t0 = time.perf_counter()
+        joblib.load(buf)
+        load_times.append(time.perf_counter() - t0)
+
+    rows = X_test[:args.latency_rows]
+    row_ms = []
+    for row in rows:
+        t0 = time.perf_counter()
+        model.predict_proba(row[None])
+        row_ms.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    model.predict_proba(X_test)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "model": name,
+        "size_mb": round(size_mb, 2),
+        "load_s": round(min(load_times), 3),
+        "row_ms_p50": round(float(np.median(row_ms)), 3),
+        "row_ms_p95": round(float(np.percentile(row_ms, 95)), 3),
+        "batch_rows_per_s": round(len(X_test) / batch_s, 1)
+    }
+
+
+report = []
+for name in selected:
+    model = MODELS[name]()
+
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+
+    # =============================
+    # EVALUATION
+    # =============================
+    probs = model.predict_proba(X_test)[:, 1]
+    preds = (probs >= THRESHOLD).astype(int)
+
+    print(f"\n🌧️ {name.upper()} PERFORMANCE (RAIN-OPTIMIZED)")
+    print("Accuracy:", accuracy_score(y_test, preds))
+    print("ROC AUC:", roc_auc_score(y_test, probs))
+    print(classification_report(y_test, preds))
+
+    model_path = os.path.join(MODEL_DIR, f"rain_{name}.pkl")
+    joblib.dump(model, model_path)
+
+    # Re-export so a stale compiled forest never shadows the new pickle
+    if isinstance(model, RandomForestClassifier):
+        compiled = CompiledForest.from_sklearn(model)
+        compiled.save(compiled_prefix(model_path))
+        diff = np.abs(compiled.predict_proba(X_test)[:, 1] - probs).max()
+        print(f"⚡ Compiled forest exported ({compiled.nbytes() / 1e6:.1f} MB, max |Δ| vs sklearn {diff:.1e})")
+
+    row = serving_report(name, model)
+    row.update({
+        "roc_auc": round(float(roc_auc_score(y_test, probs)), 4),
+        "accuracy": round(float(accuracy_score(y_test, preds)), 4),
+        "fit_s": round(fit_s, 1)
+    })
+    report.append(row)
+
+# =============================
+# MODEL COMPARISON
+# =============================
+print(f"\n{'model':<6} {'ROC AUC':>8} {'size MB':>8} {'load s':>7} {'row p50 ms':>11} {'row p95 ms':>11} {'rows/s':>10}")
+for r in report:
+    print(f"{r['model']:<6} {r['roc_auc']:>8} {r['size_mb']:>8} {r['load_s']:>7} "
+          f"{r['row_ms_p50']:>11} {r['row_ms_p95']:>11} {r['batch_rows_per_s']:>10}")
+
+with open(os.path.join(MODEL_DIR, "rain_model_report.json"), "w") as f:
+    json.dump(report, f, indent=2)
 
 print("\n✅ HIGH ACCURACY WEATHER MODEL TRAINED")
 print("📁 Saved in backend/models/")
@@ -0,0 +1,140 @@
+"""
+Upload Retention Module
+Keeps a sampled subset of uploaded leaf images on disk for retraining,
+bounded by file count, total size and age
+"""
+import os
+import time
+import uuid
+import random
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+class UploadRetention:
+    """
+    Sampled, size-bounded store for raw uploads.
+
+    Args:
+        folder: Directory the retained uploads are written to
+        sample_rate: Fraction of uploads to keep (0 disables retention)
+        max_files: Keep at most this many files
+        max_bytes: Keep at most this many bytes in total
+        ttl_seconds: Files older than this are removed by the sweeper
+        sweep_interval: Seconds between sweeper runs
+    """
+
+    def __init__(self, folder: str, sample_rate: float = 0.0, max_files: int = 1000,
+                 max_bytes: int = 500 * 1024 * 1024, ttl_seconds: float = 72 * 3600,
+                 sweep_interval: float = 600):
+        self.folder = folder
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.max_files = int(max_files)
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.sweep_interval = float(sweep_interval)
+
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._kept = 0
+        self._evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def maybe_keep(self, data: bytes, filename: str = "") -> Optional[str]:
+        """
+        Write the upload to disk if it is sampled.
+
+        Returns:
+            Path of the retained file, or None if it was not kept
+        """
+        if not self.enabled or not data or random.random() >= self.sample_rate:
+            return None
+
+        ext = os.path.splitext(filename or "")[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            ext = ".jpg"
+
+        # Never trust the client filename as a path
+        name = f"{int(time.time())}_{uuid.uuid4().hex}{ext}"
+        path = os.path.join(self.folder, name)
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Could not retain upload {filename}: {e}")
+            return None
+
+        with self._lock:
+            self._kept += 1
+            self._ensure_sweeper()
+        return path
+
+    def sweep(self) -> int:
+        """Remove expired files, then the oldest files until within bounds"""
+        if not os.path.isdir(self.folder):
+            return 0
+
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+
+        now = time.time()
+        total_bytes = sum(size for _, size, _ in entries)
+        remaining = len(entries)
+        removed = 0
+
+        for mtime, size, path in entries:
+            expired = now - mtime > self.ttl_seconds
+            over_limit = remaining > self.max_files or total_bytes > self.max_bytes
+            if not expired and not over_limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            remaining -= 1
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Upload retention sweep removed {removed} files")
+            with self._lock:
+                self._evicted += removed
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "kept": self._kept,
+                "evicted": self._evicted
+            }
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="upload-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Upload retention sweep failed")
+            time.sleep(self.sweep_interval)
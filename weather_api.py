@@ -2,21 +2,58 @@
 Weather API Integration Module
 Fetches real-time weather data from OpenWeatherMap API
 """
-import os
-import requests
 import logging
 from typing import Dict, Optional
 
+from weather_client import API_KEY, UpstreamError, get_client
+from weather_cache import current_cache, forecast_cache
+from geocoder import get_index
+
 logger = logging.getLogger(__name__)
 
-# OpenWeatherMap API configuration
-API_KEY = "1b09d0bfc92c612b9635e2482831ddc9"
-BASE_URL = "http://api.openweathermap.org/data/2.5"
-GEOCODING_URL = "http://api.openweathermap.org/geo/1.0"
+# Forecast payloads are cached whole and cut to the requested length
+FORECAST_MAX_STEPS = 40
+
+def fetch_current(lat: float, lon: float) -> Dict:
+    """Raw current-weather payload, through the grid cache when enabled"""
+    if current_cache is None:
+        return get_client().current(lat, lon, units='metric')
+    return current_cache.get(lat, lon, lambda la, lo: get_client().current(la, lo, units='metric'))
+
+def fetch_forecast(lat: float, lon: float) -> Dict:
+    """Raw 5-day / 3-hour forecast payload, through the grid cache when enabled"""
+    if forecast_cache is None:
+        return get_client().forecast(lat, lon, cnt=FORECAST_MAX_STEPS, units='metric')
+    return forecast_cache.get(
+        lat, lon, lambda la, lo: get_client().forecast(la, lo, cnt=FORECAST_MAX_STEPS, units='metric')
+    )
+
+def format_current_weather(data: Dict, city_name: str = None) -> Dict:
+    """Current-weather payload in the format compatible with the prediction model"""
+    return {
+        'city': data.get('name', city_name or 'Unknown'),
+        'temperature_2m': data['main']['temp'],
+        'relative_humidity_2m': data['main']['humidity'],
+        'dew_point_2m': data['main']['temp'] - ((100 - data['main']['humidity']) / 5),  # Approximate dew point
+        'surface_pressure': data['main']['pressure'],  # hPa
+        'cloud_cover': data['clouds']['all'],  # Percentage
+        'cloud_cover_low': data['clouds']['all'],  # Using same value (API doesn't provide separate)
+        'wind_speed_10m': data['wind']['speed'] * 3.6,  # Convert m/s to km/h
+        'wind_direction_10m': data['wind'].get('deg', 0),
+        'precipitation': data.get('rain', {}).get('1h', 0.0) + data.get('snow', {}).get('1h', 0.0),  # mm, last hour
+        'rain': data.get('rain', {}).get('1h', 0.0),
+        'condition': data['weather'][0]['main'],
+        'description': data['weather'][0]['description'],
+        'visibility': data.get('visibility', 10000) / 1000,  # Convert to km
+        'timestamp': data['dt'],
+        'timezone': data.get('timezone', 0)  # Seconds from UTC
+    }
 
 def get_coordinates(city_name: str, state_code: str = "", country_code: str = "IN") -> Optional[Dict]:
     """
-    Get latitude and longitude for a city using OpenWeatherMap Geocoding API
+    Get latitude and longitude for a city, from the local geocoding index
+    or, for places it does not know yet, the OpenWeatherMap Geocoding API
+    (the answer is then added to the index)
     
     Args:
         city_name: Name of the city
@@ -26,33 +63,34 @@ def get_coordinates(city_name: str, state_code: str = "", country_code: str = "I
     Returns:
         Dictionary with 'lat' and 'lon' or None if failed
     """
+    index = get_index()
+    place = index.lookup(city_name, state=state_code, country=country_code)
+    if place:
+        return place
+    if index.known_miss(city_name, state_code, country_code):
+        return None
+
     if not API_KEY:
         logger.warning("OpenWeatherMap API key not set. Set OPENWEATHER_API_KEY environment variable.")
         return None
     
     try:
-        url = f"{GEOCODING_URL}/direct"
-        params = {
-            'q': f"{city_name},{state_code},{country_code}".strip(','),
-            'limit': 1,
-            'appid': API_KEY
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        query = f"{city_name},{state_code},{country_code}".strip(',')
+        data = get_client().geocode(query, limit=1)
         if data and len(data) > 0:
-            return {
+            place = {
                 'lat': data[0]['lat'],
                 'lon': data[0]['lon'],
                 'name': data[0]['name'],
                 'state': data[0].get('state', ''),
                 'country': data[0].get('country', '')
             }
+            return index.add(place, aliases=(city_name,))
+        # Only a definite "no such place" is remembered, never an upstream error
+        index.remember_miss(city_name, state_code, country_code)
         return None
         
-    except requests.exceptions.RequestException as e:
+    except UpstreamError as e:
         logger.error(f"Error fetching coordinates: {e}")
         return None
     except Exception as e:
@@ -92,41 +130,15 @@ def get_current_weather(city_name: str = None, lat: float = None, lon: float = N
             logger.error("Either city_name or lat/lon must be provided")
             return None
         
-        # Fetch current weather
-        url = f"{BASE_URL}/weather"
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': API_KEY,
-            'units': 'metric'  # Get temperature in Celsius
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
+        # Fetch current weather (temperature in Celsius)
+        data = fetch_current(lat, lon)
         
-        data = response.json()
-        
-        # Extract and format data for our prediction model
-        weather_data = {
-            'city': data.get('name', city_name or 'Unknown'),
-            'temperature_2m': data['main']['temp'],
-            'relative_humidity_2m': data['main']['humidity'],
-            'dew_point_2m': data['main']['temp'] - ((100 - data['main']['humidity']) / 5),  # Approximate dew point
-            'surface_pressure': data['main']['pressure'],  # hPa
-            'cloud_cover': data['clouds']['all'],  # Percentage
-            'cloud_cover_low': data['clouds']['all'],  # Using same value (API doesn't provide separate)
-            'wind_speed_10m': data['wind']['speed'] * 3.6,  # Convert m/s to km/h
-            'wind_direction_10m': data['wind'].get('deg', 0),
-            'condition': data['weather'][0]['main'],
-            'description': data['weather'][0]['description'],
-            'visibility': data.get('visibility', 10000) / 1000,  # Convert to km
-            'timestamp': data['dt']
-        }
+        weather_data = format_current_weather(data, city_name)
         
         logger.info(f"Successfully fetched weather data for {weather_data['city']}")
         return weather_data
         
-    except requests.exceptions.RequestException as e:
+    except UpstreamError as e:
         logger.error(f"Error fetching weather data: {e}")
         return None
     except KeyError as e:
@@ -165,20 +177,10 @@ def get_weather_forecast(city_name: str = None, lat: float = None, lon: float =
         if lat is None or lon is None:
             return None
         
-        # Fetch forecast (5-day forecast available in free tier)
-        url = f"{BASE_URL}/forecast"
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': API_KEY,
-            'units': 'metric',
-            'cnt': min(days * 8, 40)  # 8 forecasts per day, max 40 for free tier
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        return response.json()
+        # Fetch forecast (5-day forecast available in free tier),
+        # 8 forecasts per day, max 40 for free tier
+        data = fetch_forecast(lat, lon)
+        return dict(data, list=data['list'][:min(days * 8, FORECAST_MAX_STEPS)])
         
     except Exception as e:
         logger.error(f"Error fetching forecast: {e}")
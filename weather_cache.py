@@ -0,0 +1,221 @@
+"""
+Weather Cache Module
+Caches upstream weather payloads per grid cell, so every farm in the same
+few kilometres shares one current-weather and one forecast entry.
+
+An entry is fresh for `fresh_seconds`, then served stale for up to
+`stale_seconds` more while a single background refresh replaces it.
+Concurrent misses on one cell are coalesced into a single upstream fetch
+(per process; workers sharing a disk store still share the results).
+"""
+import os
+import math
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache_store import make_store
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# memory, disk or off
+CACHE_BACKEND = os.environ.get("WEATHER_CACHE", "memory")
+CACHE_PATH = os.environ.get("WEATHER_CACHE_PATH", os.path.join(BASE_DIR, "weather_cache"))
+CACHE_MAX_ENTRIES = int(os.environ.get("WEATHER_CACHE_MAX_ENTRIES", 5000))
+# 0.05° is ~5.5 km, well inside one OpenWeatherMap grid point
+CELL_DEGREES = float(os.environ.get("WEATHER_CACHE_CELL_DEGREES", 0.05))
+
+# OpenWeatherMap refreshes current conditions about every 10 minutes and
+# the 3-hourly forecast a few times a day
+CURRENT_FRESH_SECONDS = float(os.environ.get("WEATHER_CURRENT_TTL_SECONDS", 600))
+CURRENT_STALE_SECONDS = float(os.environ.get("WEATHER_CURRENT_STALE_SECONDS", 1800))
+FORECAST_FRESH_SECONDS = float(os.environ.get("WEATHER_FORECAST_TTL_SECONDS", 3 * 3600))
+FORECAST_STALE_SECONDS = float(os.environ.get("WEATHER_FORECAST_STALE_SECONDS", 6 * 3600))
+
+REFRESH_WORKERS = int(os.environ.get("WEATHER_CACHE_REFRESH_WORKERS", 4))
+WAIT_TIMEOUT = float(os.environ.get("WEATHER_CACHE_WAIT_TIMEOUT", 20))
+
+
+def grid_cell(lat: float, lon: float, cell_degrees: float = CELL_DEGREES) -> Tuple[int, int]:
+    return math.floor(float(lat) / cell_degrees), math.floor(float(lon) / cell_degrees)
+
+
+def cell_center(cell: Tuple[int, int], cell_degrees: float = CELL_DEGREES) -> Tuple[float, float]:
+    return round((cell[0] + 0.5) * cell_degrees, 6), round((cell[1] + 0.5) * cell_degrees, 6)
+
+
+class WeatherCache:
+    """
+    Stale-while-revalidate cache of one kind of upstream payload.
+
+    Args:
+        store: MemoryStore or SqliteStore from cache_store, its TTL should
+            be fresh_seconds + stale_seconds
+        kind: Key prefix, e.g. 'current' or 'forecast'
+        fresh_seconds: Served without contacting upstream
+        stale_seconds: Served while a background refresh runs
+        cell_degrees: Grid cell size; upstream is asked for the cell center
+    """
+
+    def __init__(self, store, kind: str, fresh_seconds: float, stale_seconds: float,
+                 cell_degrees: float = CELL_DEGREES, refresh_workers: int = REFRESH_WORKERS,
+                 wait_timeout: float = WAIT_TIMEOUT):
+        self.store = store
+        self.kind = kind
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.cell_degrees = cell_degrees
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers,
+                                            thread_name_prefix=f"weather-{kind}-refresh")
+        self._counts = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+            "upstream_fetches": 0, "upstream_errors": 0, "refreshes": 0
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counts[name] += n
+
+    def key_for(self, lat: float, lon: float) -> Tuple[str, Tuple[float, float]]:
+        cell = grid_cell(lat, lon, self.cell_degrees)
+        return f"{self.kind}:{self.cell_degrees}:{cell[0]}:{cell[1]}", cell_center(cell, self.cell_degrees)
+
+    def get(self, lat: float, lon: float, fetch_fn: Callable[[float, float], Any]) -> Any:
+        """
+        Cached payload for the cell containing (lat, lon); on a miss,
+        fetch_fn(center_lat, center_lon) is called once per cell and its
+        exceptions propagate to every waiting caller.
+        """
+        key, (clat, clon) = self.key_for(lat, lon)
+        entry = self.store.get(key)
+
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at < self.fresh_seconds:
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._refresh_in_background(key, clat, clon, fetch_fn)
+            return value
+
+        self._count("misses")
+        return self._fetch(key, clat, clon, fetch_fn)
+
+    def peek(self, lat: float, lon: float) -> Optional[Any]:
+        """Fresh cached payload or None, never contacts upstream"""
+        entry = self.store.get(self.key_for(lat, lon)[0])
+        if entry is not None and time.time() - entry[1] < self.fresh_seconds:
+            self._count("hits")
+            return entry[0]
+        self._count("misses")
+        return None
+
+    def put(self, lat: float, lon: float, value: Any, fresh_until: Optional[float] = None):
+        """
+        Store a payload fetched elsewhere, e.g. by a pre-warm job.
+
+        Args:
+            fresh_until: Epoch seconds the entry should stay fresh until,
+                when later than the usual fresh_seconds from now. It is
+                stored as if fetched at fresh_until - fresh_seconds, so it
+                is then served stale for stale_seconds like any other entry.
+        """
+        now = time.time()
+        stored_at = now if fresh_until is None else max(now, fresh_until - self.fresh_seconds)
+        self.store.set(self.key_for(lat, lon)[0], value, stored_at=stored_at)
+
+    def _fetch(self, key, lat, lon, fetch_fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._counts["coalesced"] += 1
+
+        if not leader:
+            return future.result(timeout=self.wait_timeout)
+
+        try:
+            self._count("upstream_fetches")
+            value = fetch_fn(lat, lon)
+            if value is not None:
+                self.store.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            self._count("upstream_errors")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, lat, lon, fetch_fn):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._counts["refreshes"] += 1
+
+        def refresh():
+            try:
+                self._fetch(key, lat, lon, fetch_fn)
+            except Exception as e:
+                # The stale entry keeps being served until it expires
+                logger.warning(f"⚠️ Weather {self.kind} refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["stale_hits"] + counts["misses"]
+        return {
+            "backend": type(self.store).__name__,
+            "entries": len(self.store),
+            "cell_degrees": self.cell_degrees,
+            "fresh_seconds": self.fresh_seconds,
+            "stale_seconds": self.stale_seconds,
+            **counts,
+            "hit_rate": round((counts["hits"] + counts["stale_hits"]) / lookups, 4) if lookups else 0.0
+        }
+
+
+def make_weather_cache(kind: str, fresh_seconds: float, stale_seconds: float,
+                       backend: str = CACHE_BACKEND) -> Optional[WeatherCache]:
+    """WeatherCache from the WEATHER_CACHE* config, None when caching is off"""
+    if backend == "off":
+        return None
+    store = make_store(
+        backend,
+        path=f"{CACHE_PATH}_{kind}.sqlite3",
+        max_entries=CACHE_MAX_ENTRIES,
+        ttl_seconds=fresh_seconds + stale_seconds
+    )
+    return WeatherCache(store, kind, fresh_seconds, stale_seconds)
+
+
+current_cache = make_weather_cache("current", CURRENT_FRESH_SECONDS, CURRENT_STALE_SECONDS)
+forecast_cache = make_weather_cache("forecast", FORECAST_FRESH_SECONDS, FORECAST_STALE_SECONDS)
+# Derived from the payloads above: aggregated daily forecasts, and rain
+# predictions precomputed by the pre-warm job
+daily_cache = make_weather_cache("daily", FORECAST_FRESH_SECONDS, FORECAST_STALE_SECONDS)
+rain_cache = make_weather_cache("rain", CURRENT_FRESH_SECONDS, CURRENT_STALE_SECONDS)
+
+
+def cache_stats() -> Dict:
+    caches = {"current": current_cache, "forecast": forecast_cache, "daily": daily_cache, "rain": rain_cache}
+    return {kind: cache.stats() if cache else None for kind, cache in caches.items()}
@@ -0,0 +1,303 @@
+"""
+Weather Client Module
+Shared HTTP client for OpenWeatherMap: one pooled keep-alive session,
+short connect/read timeouts, retries with jittered exponential backoff
+inside an overall per-call deadline, and a circuit breaker that fails fast
+while the upstream is down.
+
+Fan-out jobs (bulk predictions, pre-warming) share this client from their
+thread pools; the pool size caps the requests in flight.
+
+Point OPENWEATHER_BASE_URL at a local stub server to test without the
+real API:
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8081 python app.py
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "1b09d0bfc92c612b9635e2482831ddc9")
+
+CONNECT_TIMEOUT = float(os.environ.get("WEATHER_CONNECT_TIMEOUT", 3))
+READ_TIMEOUT = float(os.environ.get("WEATHER_READ_TIMEOUT", 5))
+RETRIES = int(os.environ.get("WEATHER_RETRIES", 2))
+# Upper bound for one call including retries and backoff, below the old
+# 10 s request timeout so a stalled upstream never holds a thread longer
+DEADLINE = float(os.environ.get("WEATHER_DEADLINE_SECONDS", 8))
+BACKOFF_BASE = float(os.environ.get("WEATHER_BACKOFF_BASE", 0.25))
+BACKOFF_CAP = float(os.environ.get("WEATHER_BACKOFF_CAP", 2))
+POOL_SIZE = int(os.environ.get("WEATHER_POOL_SIZE", 32))
+
+BREAKER_FAILURES = int(os.environ.get("WEATHER_BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.environ.get("WEATHER_BREAKER_RESET_SECONDS", 30))
+
+# Worth another attempt; other 4xx are the caller's fault and returned as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Transport failures worth another attempt; other RequestExceptions fail at once
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class UpstreamError(Exception):
+    """Request failed after all retries, or got a non-retryable error status"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(UpstreamError):
+    """Upstream marked down, request not attempted"""
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff, so retrying clients spread out"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# =====================================================
+# CIRCUIT BREAKER
+# =====================================================
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls
+    fail immediately; after `reset_seconds` one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[str]:
+        """'closed' or 'trial' when the call may go ahead, None when rejected"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return "trial"
+            self.rejected += 1
+            return None
+
+    def end_trial(self):
+        """
+        Free the half-open slot of a trial call that ended without
+        recording an outcome (e.g. cancelled), so the next call can try
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.opened += 1
+                    logger.warning(f"⚠️ Weather upstream circuit open for {self.reset_seconds}s")
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {"requests": 0, "retries": 0, "failures": 0, "latency_ms_total": 0.0}
+
+    def add(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.values[k] += v
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            out = dict(self.values)
+        done = out["requests"] - out["failures"]
+        out["avg_latency_ms"] = round(out.pop("latency_ms_total") / done, 1) if done else None
+        return out
+
+
+# =====================================================
+# SYNC CLIENT
+# =====================================================
+class WeatherClient:
+    """
+    Thread-safe OpenWeatherMap client over one pooled requests.Session.
+
+    Args:
+        base_url: Scheme + host, paths like /data/2.5/weather are appended
+        api_key: Sent as `appid` on every request
+        timeout: (connect, read) seconds per attempt
+        retries: Extra attempts on connection errors, timeouts and 429/5xx
+        deadline: Seconds one get_json() call may take in total; attempts
+            get shorter timeouts and no retry starts once it is spent
+        pool_size: Keep-alive connections kept per host
+        breaker: Shared CircuitBreaker, one per client by default
+    """
+
+    def __init__(self, base_url: str = BASE_URL, api_key: str = API_KEY,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 retries: int = RETRIES, deadline: float = DEADLINE, pool_size: int = POOL_SIZE,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.deadline = deadline
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.counters = _Counters()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_json(self, path: str, params: Optional[Dict] = None):
+        """GET base_url + path with the API key, decoded JSON or UpstreamError"""
+        permit = self.breaker.allow()
+        if not permit:
+            raise CircuitOpenError("Weather upstream circuit open")
+        try:
+            return self._get_json(path, params)
+        finally:
+            if permit == "trial":
+                self.breaker.end_trial()
+
+    def _get_json(self, path: str, params: Optional[Dict]):
+        params = dict(params or {}, appid=self.api_key)
+        url = self.base_url + path
+        last_error = None
+        deadline = time.monotonic() + self.deadline
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = backoff_delay(attempt - 1)
+                # Leave room for at least a connect attempt after the pause
+                if time.monotonic() + delay + self.timeout[0] > deadline:
+                    break
+                self.counters.add(retries=1)
+                time.sleep(delay)
+
+            timeout = self._attempt_timeout(deadline)
+            if timeout is None:
+                break
+            started = time.perf_counter()
+            self.counters.add(requests=1)
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except RETRY_EXCEPTIONS as e:
+                last_error = UpstreamError(f"{type(e).__name__}: {e}")
+                self.counters.add(failures=1)
+                continue
+            except requests.RequestException as e:
+                # Not worth retrying (e.g. TooManyRedirects), but still an upstream failure
+                self.counters.add(failures=1)
+                self.breaker.record_failure()
+                raise UpstreamError(f"{type(e).__name__}: {e}")
+
+            if response.status_code in RETRY_STATUSES:
+                last_error = UpstreamError(f"HTTP {response.status_code}", response.status_code)
+                self.counters.add(failures=1)
+                continue
+
+            # Upstream is up even when it rejects this request
+            self.breaker.record_success()
+            self.counters.add(latency_ms_total=(time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise UpstreamError(f"HTTP {response.status_code}", response.status_code)
+            try:
+                return response.json()
+            except ValueError as e:
+                raise UpstreamError(f"Invalid JSON: {e}", response.status_code)
+
+        self.breaker.record_failure()
+        raise last_error or UpstreamError("Weather upstream deadline exceeded")
+
+    def _attempt_timeout(self, deadline: float) -> Optional[Tuple[float, float]]:
+        """(connect, read) for the next attempt, cut to the time left; None when spent"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        connect = min(self.timeout[0], remaining)
+        read = min(self.timeout[1], max(remaining - connect, 0.1))
+        return connect, read
+
+    # --- OpenWeatherMap endpoints ---
+    def current(self, lat: float, lon: float, units: str = "metric"):
+        return self.get_json("/data/2.5/weather", {"lat": lat, "lon": lon, "units": units})
+
+    def forecast(self, lat: float, lon: float, cnt: Optional[int] = None, units: str = "metric"):
+        params = {"lat": lat, "lon": lon, "units": units}
+        if cnt:
+            params["cnt"] = cnt
+        return self.get_json("/data/2.5/forecast", params)
+
+    def geocode(self, query: str, limit: int = 1):
+        return self.get_json("/geo/1.0/direct", {"q": query, "limit": limit})
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "pool_size": self.pool_size,
+            **self.counters.snapshot(),
+            "breaker": self.breaker.stats()
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> WeatherClient:
+    """Process-wide WeatherClient, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherClient()
+    return _client
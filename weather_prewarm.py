@@ -0,0 +1,282 @@
+"""
+Weather Pre-warm Module
+Before the dawn peak, fetches current weather and forecasts for every
+distinct farm location in the `users` / `products` collections and fills
+the weather caches with the raw payloads, the aggregated daily forecasts
+and the rain predictions, so the morning burst never waits on upstream.
+
+Locations are deduplicated by cache grid cell, and upstream calls go
+through a token bucket sized to the OpenWeatherMap quota.
+
+Config:
+    WEATHER_PREWARM=1               start the scheduler with the app
+    WEATHER_PREWARM_AT=04:30,16:30  local run times
+    WEATHER_PREWARM_RATE=0.8        upstream calls per second (free tier: 60/min)
+    WEATHER_PREWARM_HOLD_MINUTES=180  pre-warmed entries stay fresh this long
+                                    after the run starts, through the peak
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from weather_client import UpstreamError, get_client
+from weather_cache import CELL_DEGREES, cell_center, grid_cell, current_cache, forecast_cache, daily_cache, rain_cache
+from weather_api import FORECAST_MAX_STEPS, format_current_weather, get_coordinates
+from geocoder import get_index
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.environ.get("WEATHER_PREWARM", "0") == "1"
+PREWARM_AT = os.environ.get("WEATHER_PREWARM_AT", "04:30")
+PREWARM_RATE = float(os.environ.get("WEATHER_PREWARM_RATE", 0.8))
+PREWARM_BURST = int(os.environ.get("WEATHER_PREWARM_BURST", 5))
+PREWARM_MAX_LOCATIONS = int(os.environ.get("WEATHER_PREWARM_MAX_LOCATIONS", 2000))
+# Current weather and rain predictions are normally fresh for minutes; the
+# pre-warmed ones must outlast the run itself and the morning burst after it
+PREWARM_HOLD_SECONDS = float(os.environ.get("WEATHER_PREWARM_HOLD_MINUTES", 180)) * 60
+
+
+class RateLimiter:
+    """Token bucket: `rate` calls per second on average, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """Block until a call is allowed; False if `stop` was set meanwhile"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def parse_times(spec: str) -> List[Tuple[int, int]]:
+    """'04:30,16:30' -> [(4, 30), (16, 30)]"""
+    times = []
+    for part in spec.split(","):
+        if part.strip():
+            hour, minute = part.strip().split(":")
+            times.append((int(hour), int(minute)))
+    return sorted(times)
+
+
+def next_run(times: List[Tuple[int, int]], now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now()
+    for day in range(2):
+        for hour, minute in times:
+            at = (now + timedelta(days=day)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if at > now:
+                return at
+    raise ValueError("No pre-warm times configured")
+
+
+def mongo_locations() -> List:
+    """Distinct `location` values of farmers and their products"""
+    from db import user_collection, product_collection
+
+    values = []
+    for collection in (user_collection, product_collection):
+        values.extend(v for v in collection.distinct("location") if v)
+    return values
+
+
+class PrewarmScheduler:
+    """
+    Args:
+        predict_fn: get_current_weather() dicts -> rain results, one model call
+        aggregate_fn: Forecast payloads -> daily forecast list per payload,
+            all locations in one pass
+        version_fn: Rain model version the predictions are cached under
+        locations_fn: Raw location values (city names, "lat,lon" strings
+            or {"lat", "lon"} dicts)
+        times: Local (hour, minute) run times
+        rate, burst: Upstream call budget
+        hold_seconds: Cache entries written by a run stay fresh until this
+            long after it started
+    """
+
+    def __init__(self, predict_fn: Callable, aggregate_fn: Callable, version_fn: Callable[[], Optional[str]],
+                 locations_fn: Callable[[], Iterable] = mongo_locations, times: str = PREWARM_AT,
+                 rate: float = PREWARM_RATE, burst: int = PREWARM_BURST,
+                 max_locations: int = PREWARM_MAX_LOCATIONS, hold_seconds: float = PREWARM_HOLD_SECONDS):
+        self.predict_fn = predict_fn
+        self.aggregate_fn = aggregate_fn
+        self.version_fn = version_fn
+        self.locations_fn = locations_fn
+        self.times = parse_times(times)
+        self.limiter = RateLimiter(rate, burst)
+        self.max_locations = max_locations
+        self.hold_seconds = hold_seconds
+
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._next_run = None
+        self._last_run = None
+
+    # =====================================================
+    # LOCATIONS
+    # =====================================================
+    def resolve(self, value) -> Optional[Tuple[float, float]]:
+        if isinstance(value, dict):
+            if value.get("lat") is not None and value.get("lon") is not None:
+                return float(value["lat"]), float(value["lon"])
+            value = value.get("city") or value.get("name")
+            if not value:
+                return None
+
+        text = str(value).strip()
+        try:
+            lat, lon = (float(x) for x in text.split(","))
+            return lat, lon
+        except ValueError:
+            pass
+
+        place = get_index().lookup(text)
+        if place is None:
+            # Unknown names cost a geocoding call, which the index keeps
+            if not self.limiter.acquire(self._stop):
+                return None
+            place = get_coordinates(text)
+        return (place["lat"], place["lon"]) if place else None
+
+    def cells(self, values: Iterable) -> List[Tuple[float, float]]:
+        """Distinct grid cell centers of the location values"""
+        seen = set()
+        for value in values:
+            coords = self.resolve(value)
+            if coords is None:
+                continue
+            seen.add(grid_cell(*coords, CELL_DEGREES))
+            if len(seen) >= self.max_locations:
+                logger.warning(f"⚠️ Pre-warm capped at {self.max_locations} locations")
+                break
+        return [cell_center(cell, CELL_DEGREES) for cell in sorted(seen)]
+
+    # =====================================================
+    # RUN
+    # =====================================================
+    def run_once(self) -> Dict:
+        """Pre-warm every location now; returns a summary"""
+        if not self._run_lock.acquire(blocking=False):
+            return {"skipped": "already running"}
+        try:
+            return self._run()
+        finally:
+            self._run_lock.release()
+
+    def _run(self) -> Dict:
+        started = time.perf_counter()
+        fresh_until = time.time() + self.hold_seconds
+        client = get_client()
+        summary = {"locations": 0, "forecasts": 0, "current": 0, "predictions": 0, "errors": 0}
+
+        try:
+            values = list(self.locations_fn())
+        except Exception as e:
+            logger.error(f"❌ Pre-warm could not read locations: {e}")
+            summary["errors"] += 1
+            values = []
+
+        cells = self.cells(values)
+        summary["locations"] = len(cells)
+        logger.info(f"🌅 Pre-warming weather for {len(cells)} grid cells ({len(values)} locations)")
+
+        warmed, forecasts = [], []
+        for lat, lon in cells:
+            try:
+                if not self.limiter.acquire(self._stop):
+                    break
+                forecast = client.forecast(lat, lon, cnt=FORECAST_MAX_STEPS, units="metric")
+                if forecast_cache is not None:
+                    forecast_cache.put(lat, lon, forecast, fresh_until=fresh_until)
+                forecasts.append((lat, lon, forecast))
+                summary["forecasts"] += 1
+
+                if not self.limiter.acquire(self._stop):
+                    break
+                current = client.current(lat, lon, units="metric")
+                if current_cache is not None:
+                    current_cache.put(lat, lon, current, fresh_until=fresh_until)
+                warmed.append((lat, lon, format_current_weather(current)))
+                summary["current"] += 1
+            except (UpstreamError, KeyError, ValueError) as e:
+                logger.warning(f"⚠️ Pre-warm failed for ({lat}, {lon}): {e}")
+                summary["errors"] += 1
+
+        # All daily forecasts in one columnar pass
+        if forecasts and daily_cache is not None:
+            try:
+                for (lat, lon, _), daily in zip(forecasts, self.aggregate_fn([f for _, _, f in forecasts])):
+                    daily_cache.put(lat, lon, daily, fresh_until=fresh_until)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"❌ Pre-warm forecast aggregation failed: {e}")
+                summary["errors"] += 1
+
+        # All rain predictions in one model call
+        if warmed and rain_cache is not None:
+            try:
+                results = self.predict_fn([w for _, _, w in warmed])
+                version = self.version_fn()
+                for (lat, lon, _), result in zip(warmed, results):
+                    rain_cache.put(lat, lon, {"model_version": version, "result": result}, fresh_until=fresh_until)
+                summary["predictions"] = len(results)
+            except Exception as e:
+                logger.error(f"❌ Pre-warm rain predictions failed: {e}")
+                summary["errors"] += 1
+
+        summary["seconds"] = round(time.perf_counter() - started, 1)
+        summary["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        self._last_run = summary
+        logger.info(f"✅ Weather pre-warm done: {summary}")
+        return summary
+
+    # =====================================================
+    # SCHEDULER THREAD
+    # =====================================================
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="weather-prewarm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._next_run = next_run(self.times)
+            logger.info(f"🌅 Next weather pre-warm at {self._next_run:%Y-%m-%d %H:%M}")
+            if self._stop.wait((self._next_run - datetime.now()).total_seconds()):
+                return
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Weather pre-warm failed")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._thread is not None,
+            "times": [f"{h:02d}:{m:02d}" for h, m in self.times],
+            "rate_per_second": self.limiter.rate,
+            "hold_minutes": round(self.hold_seconds / 60, 1),
+            "next_run": self._next_run.isoformat(timespec="minutes") if self._next_run else None,
+            "last_run": self._last_run
+        }